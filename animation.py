@@ -0,0 +1,119 @@
+import time
+from typing import Callable, Tuple
+
+import pygame
+
+Coordinates = Tuple[float, float]
+
+X_COORD = 0
+Y_COORD = 1
+
+# How long a ped takes to move to the next cell, in seconds
+DEFAULT_STEP_DURATION = 0.25
+
+# How much faster everything is when fast forwarding
+FAST_FORWARD_SPEED = 8
+
+# The most frames drawn in a second while animating
+ANIMATION_FPS = 60
+
+
+def ease_in_out(progress: float) -> float:
+    """Return the eased progress of the given linear progress (0 to 1):
+    slow at the start and at the end, fast in the middle."""
+
+    return progress * progress * (3 - 2 * progress)
+
+
+def interpolate(start: Coordinates, end: Coordinates,
+                progress: float) -> Coordinates:
+    """Return the point at the given progress (0 to 1) between the points."""
+
+    return (start[X_COORD] + (end[X_COORD] - start[X_COORD]) * progress,
+            start[Y_COORD] + (end[Y_COORD] - start[Y_COORD]) * progress)
+
+
+class Tween:
+    """A movement from one point to another in a given time.
+    The point is found by the time passed since the start, not by the
+    number of frames drawn, so the movement takes the same time at any
+    frame rate, and slow frames are skipped rather than slowing it."""
+
+    __slots__ = ("start", "end", "duration", "_start_time")
+
+    def __init__(self, start: Coordinates, end: Coordinates,
+                 duration: float) -> None:
+        self.start = start
+        self.end = end
+        self.duration = duration
+        self._start_time = time.perf_counter()
+
+    def progress(self) -> float:
+        """Return the part of the movement done (0 to 1)."""
+
+        if self.duration <= 0:
+            return 1.0
+
+        return min((time.perf_counter() - self._start_time) / self.duration, 1.0)
+
+    def position(self) -> Coordinates:
+        """Return the point the movement is at now."""
+
+        return interpolate(self.start, self.end, ease_in_out(self.progress()))
+
+    def is_done(self) -> bool:
+        return self.progress() >= 1.0
+
+
+class Animator:
+    """Playing the movements of the peds, and pacing the game.
+    When fast forwarding, the movements and the pauses of the game are
+    FAST_FORWARD_SPEED times shorter. A disabled animator moves the peds
+    at once, and an animator that isn't paced doesn't pause the game
+    (of a game without a display)."""
+
+    def __init__(self, step_duration: float = DEFAULT_STEP_DURATION,
+                 enabled: bool = True, paced: bool = True) -> None:
+        self.step_duration = step_duration
+        self.enabled = enabled
+        self.paced = paced
+        self.fast_forward = False
+
+    def speed(self) -> int:
+        return FAST_FORWARD_SPEED if self.fast_forward else 1
+
+    def toggle_fast_forward(self) -> None:
+        self.fast_forward = not self.fast_forward
+
+    def play(self, start: Coordinates, end: Coordinates,
+             draw_frame: Callable[[Coordinates], None]) -> int:
+        """Move from the start point to the end point (in pixels), calling
+        draw_frame with the point of every frame, the last one at the end.
+        Returns the number of frames drawn."""
+
+        if not self.enabled:
+            return 0
+
+        tween = Tween(start, end, self.step_duration / self.speed())
+        clock = pygame.time.Clock()
+        frames = 0
+
+        while True:
+            done = tween.is_done()
+            draw_frame(tween.position())
+            frames += 1
+
+            if done:
+                return frames
+
+            # Keep the window responsive, without taking its events
+            pygame.event.pump()
+            clock.tick(ANIMATION_FPS)
+
+    def delay(self, milliseconds: int) -> None:
+        """Pause the game, shorter when fast forwarding."""
+
+        if not self.paced:
+            return
+
+        pygame.time.delay(milliseconds // self.speed())
@@ -0,0 +1,433 @@
+import argparse
+import struct
+from typing import List, Tuple, Optional, Iterator
+
+import numpy as np
+
+import funcs
+from board import Board
+from layout import POSSIBLE_NUM_OF_PLAYERS
+from ped import Ped
+
+Coordinates = Tuple[float, float]
+
+# An archive file starts with a header: a magic, the version, the number
+# of games, the number of moves and the offset of the index. The moves of
+# all the games follow it, as (from, to) cell pairs of a byte each, and the
+# index of the games is at the end, so an archive is written in one pass.
+HEADER = struct.Struct("<4sI QQQ")
+MAGIC = b"CCGA"
+VERSION = 1
+
+# The entry of a game in the index. The winner is the seat of the winner
+# (-1 if the game wasn't finished), and bit i of bots is set if the player
+# at seat i is a bot.
+INDEX_DTYPE = np.dtype([("offset", "<u8"), ("length", "<u4"),
+                        ("players", "u1"), ("winner", "i1"), ("bots", "u1"),
+                        ("reserved", "u1")])
+
+MOVE_DTYPE = np.dtype("u1")
+
+NO_WINNER = -1
+
+ADDITIONAL_HOP = "had an additional hop."
+
+
+class GameRecord:
+    """A game of the archive: its entry in the index and a view of its
+    moves, a (length, 2) array of the start and end cells of every turn."""
+
+    __slots__ = ("game_id", "players", "winner", "bots", "moves")
+
+    def __init__(self, game_id: int, entry: np.void, moves: np.ndarray) -> None:
+        self.game_id = game_id
+        self.players = int(entry["players"])
+        self.winner = int(entry["winner"])
+        self.bots = int(entry["bots"])
+        self.moves = moves
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+    def is_bot(self, seat: int) -> bool:
+        return bool(self.bots >> seat & 1)
+
+
+class ArchiveWriter:
+    """Writing games to a new archive file, one game after the other."""
+
+    def __init__(self, file_name: str) -> None:
+        self._file = open(file_name, "wb")
+        self._file.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+
+        self._entries: List[Tuple[int, int, int, int, int, int]] = []
+        self._num_moves = 0
+
+    def add_game(self, moves: np.ndarray, players: int, winner: int = NO_WINNER,
+                 bots: int = 0) -> None:
+        """Add a game, given the (length, 2) start and end cells of its turns."""
+
+        moves = np.ascontiguousarray(moves, dtype=MOVE_DTYPE).reshape(-1, 2)
+        self._file.write(moves.tobytes())
+
+        self._entries.append((self._num_moves, len(moves), players, winner,
+                              bots, 0))
+        self._num_moves += len(moves)
+
+    def close(self) -> None:
+        """Write the index and the header, and close the file."""
+
+        index_offset = self._file.tell()
+        self._file.write(np.array(self._entries, dtype=INDEX_DTYPE).tobytes())
+
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, len(self._entries),
+                                     self._num_moves, index_offset))
+        self._file.close()
+
+    def __enter__(self) -> 'ArchiveWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class GameArchive:
+    """A memory-mapped archive of games.
+    The moves of the games are views into the mapped file, so iterating
+    over the games doesn't copy or parse anything, and the index can be
+    filtered with NumPy without touching the moves."""
+
+    def __init__(self, file_name: str) -> None:
+
+        with open(file_name, "rb") as f:
+            magic, version, num_games, num_moves, index_offset = \
+                HEADER.unpack(f.read(HEADER.size))
+
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a game archive", file_name)
+
+        self._data = np.memmap(file_name, dtype=np.uint8, mode="r")
+
+        self.index = np.frombuffer(self._data, dtype=INDEX_DTYPE,
+                                   count=num_games, offset=index_offset)
+        self.moves = np.frombuffer(self._data, dtype=MOVE_DTYPE,
+                                   count=2 * num_moves,
+                                   offset=HEADER.size).reshape(num_moves, 2)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def game(self, game_id: int) -> GameRecord:
+        """Return the game with the given id (its position in the archive)."""
+
+        entry = self.index[game_id]
+        offset = int(entry["offset"])
+
+        return GameRecord(game_id, entry,
+                          self.moves[offset:offset + int(entry["length"])])
+
+    def filter(self, players: Optional[int] = None,
+               winner: Optional[int] = None,
+               min_length: Optional[int] = None,
+               max_length: Optional[int] = None) -> np.ndarray:
+        """Return the ids of the games with the given number of players,
+        winner seat (NO_WINNER for the unfinished games) and number of turns."""
+
+        mask = np.ones(len(self.index), dtype=bool)
+
+        if players is not None:
+            mask &= self.index["players"] == players
+
+        if winner is not None:
+            mask &= self.index["winner"] == winner
+
+        if min_length is not None:
+            mask &= self.index["length"] >= min_length
+
+        if max_length is not None:
+            mask &= self.index["length"] <= max_length
+
+        return np.nonzero(mask)[0]
+
+    def games(self, game_ids: Optional[np.ndarray] = None) -> Iterator[GameRecord]:
+        """Iterate over the given games, or over all of them."""
+
+        if game_ids is None:
+            game_ids = range(len(self.index))
+
+        for game_id in game_ids:
+            yield self.game(int(game_id))
+
+
+def position_hashes(game: GameRecord) -> List[int]:
+    """Return the Zobrist hashes of the positions of the game after every
+    turn, with the side to move, by playing it on a headless board."""
+
+    board = Board(game.players, headless=True)
+    board.place_starting_peds()
+    positions = board.get_all_positions()
+
+    hashes = []
+    for i, (start, end) in enumerate(game.moves.tolist()):
+        board.relocate_ped(board.get_ped_by_location(positions[start]),
+                           positions[end])
+        hashes.append(board.zobrist_hash((i + 1) % game.players))
+
+    return hashes
+
+
+def count_positions(archive: 'GameArchive',
+                    game_ids: Optional[np.ndarray] = None) -> Tuple[int, int]:
+    """Return the number of positions in the given games, and the number
+    of distinct positions among them."""
+
+    total = 0
+    distinct = set()
+
+    for game in archive.games(game_ids):
+        hashes = position_hashes(game)
+        total += len(hashes)
+        distinct.update(hashes)
+
+    return total, len(distinct)
+
+
+def _seat_of(player: str) -> int:
+    """Return the seat of a player by its name in the log ("Bot 2" is
+    at seat 1)."""
+
+    return int(player.split()[-1]) - 1
+
+
+def parse_location(text: str) -> Coordinates:
+    """Parse a location as written in the log ("(x, y)"). Much faster than
+    evaluating it, and the floats are read back exactly."""
+
+    x, y = text.strip().strip("()").split(",")
+    return float(x), float(y)
+
+
+def read_log_turns(log_file: str) -> Tuple[List[List[Coordinates]], List[str]]:
+    """Return the turns of the game in the log file, each as the path of
+    locations the ped went through, and the name of the player of each turn.
+    The log has a record for every hop of a turn, and the records of the
+    additional hops have the new location in "from" (and the first landing
+    location in "to"), so they are joined to the turn they belong to."""
+
+    turns: List[List[Coordinates]] = []
+    players: List[str] = []
+
+    for data in funcs.read_log_records(log_file):
+        if data.get("from", "N/A") == "N/A" or data.get("to", "N/A") == "N/A":
+            continue
+
+        start = parse_location(data["from"])
+
+        if data.get("message") == ADDITIONAL_HOP and turns:
+            turns[-1].append(start)
+        else:
+            turns.append([start, parse_location(data["to"])])
+            players.append(data["player"])
+
+    return turns, players
+
+
+def _moved_ped(board: Board, path: List[Coordinates]) -> Optional[Ped]:
+    """Return the ped the turn of the given path moves, or None if the turn
+    doesn't fit the board (a location off the board, no ped at the start,
+    or another ped at the end), like in a corrupt log."""
+
+    try:
+        ped = board.get_ped_by_location(path[0])
+        board.get_cell(path[-1])
+
+    except (KeyError, IndexError):
+        return None
+
+    try:
+        board.get_ped_by_location(path[-1])
+
+    except KeyError:
+        return ped
+
+    return None
+
+
+def replay_turns(turns: List[List[Coordinates]], num_players: int,
+                 seats: Optional[List[int]] = None) -> Optional[Tuple[np.ndarray, int]]:
+    """Play the turns on a new board of the given number of players.
+    The seats of the players of the turns are taken from the log if given,
+    since a player may have passed; otherwise the players take turns in
+    order. Returns the start and end cells of the turns and the seat of the
+    winner, or None if the turns aren't a game of that many players."""
+
+    if seats is None:
+        seats = [i % num_players for i in range(len(turns))]
+
+    board = Board(num_players, headless=True)
+    board.place_starting_peds()
+    colors = board.playable_colors()
+
+    moves = np.zeros((len(turns), 2), dtype=MOVE_DTYPE)
+    winner = NO_WINNER
+
+    for i, path in enumerate(turns):
+        ped = _moved_ped(board, path)
+
+        if ped is None or ped.get_color() != colors[seats[i]]:
+            return None
+
+        moves[i] = board.get_cell(path[0]), board.get_cell(path[-1])
+        board.relocate_ped(ped, path[-1])
+
+        if board.has_won(ped.get_color()):
+            winner = seats[i]
+
+    return moves, winner
+
+
+def log_positions(log_file: str, num_players: int) -> Iterator[List[int]]:
+    """Yield the occupancy of the board (see Board.get_occupancy) after
+    every turn of the game in the log file, up to the first turn that
+    doesn't fit the board. The turns aren't checked otherwise."""
+
+    board = Board(num_players, headless=True)
+    board.place_starting_peds()
+
+    for path in read_log_turns(log_file)[0]:
+        ped = _moved_ped(board, path)
+        if ped is None:
+            return
+
+        board.relocate_ped(ped, path[-1])
+        yield board.get_occupancy()
+
+
+def header_players(log_file: str) -> Optional[int]:
+    """Return the number of players from the header of the log,
+    or None if the log has no header."""
+
+    header = funcs.read_game_header(log_file)
+    if header is None or "players" not in header:
+        return None
+
+    return int(header["players"])
+
+
+def identify_game(turns: List[List[Coordinates]], players: List[str],
+                  num_players: Optional[int] = None) -> \
+        Optional[Tuple[np.ndarray, int, int, int]]:
+    """Return the moves, the number of players, the winner and the bots
+    mask of the game of the given turns (see read_log_turns), or None if
+    they aren't a valid game.
+    Older logs don't say how many players played (newer ones have it in
+    their header), so then it's the least number of players that the names
+    of the players and the colors of the peds they moved fit."""
+
+    if not turns:
+        return None
+
+    seats = [_seat_of(player) for player in players]
+
+    bots = 0
+    for seat, player in zip(seats, players):
+        if player.startswith("Bot"):
+            bots |= 1 << seat
+
+    candidates = [num_players] if num_players is not None else POSSIBLE_NUM_OF_PLAYERS
+
+    for candidate in candidates:
+        if candidate <= max(seats):
+            continue
+
+        replayed = replay_turns(turns, candidate, seats)
+        if replayed is not None:
+            moves, winner = replayed
+            return moves, candidate, winner, bots
+
+    return None
+
+
+def import_log(log_file: str) -> Optional[Tuple[np.ndarray, int, int, int]]:
+    """Read a game from a log file.
+    Returns the moves, the number of players, the winner and the bots mask
+    of the game, or None if the log doesn't hold a valid game."""
+
+    try:
+        turns, players = read_log_turns(log_file)
+        return identify_game(turns, players, header_players(log_file))
+
+    # A record without a field, or with a player or a location that can't
+    # be read, makes the whole log invalid
+    except (OSError, ValueError, KeyError, IndexError):
+        return None
+
+
+def import_logs(log_files: List[str], archive_file: str) -> Tuple[int, int]:
+    """Import the games in the log files into a new archive.
+    Returns the number of games imported and the number of logs skipped."""
+
+    imported = skipped = 0
+
+    with ArchiveWriter(archive_file) as writer:
+        for log_file in log_files:
+            game = import_log(log_file)
+
+            if game is None:
+                skipped += 1
+                continue
+
+            moves, num_players, winner, bots = game
+            writer.add_game(moves, num_players, winner, bots)
+            imported += 1
+
+    return imported, skipped
+
+
+def main() -> None:
+    """Import logs into an archive, or show what's in an archive."""
+
+    parser = argparse.ArgumentParser(
+        description="Pack the logs of many games into a single archive.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="import log files")
+    import_parser.add_argument("archive")
+    import_parser.add_argument("logs", nargs="+")
+
+    info_parser = subparsers.add_parser("info", help="count the games "
+                                                     "that match a filter")
+    info_parser.add_argument("archive")
+    info_parser.add_argument("-p", "--players", type=int, default=None)
+    info_parser.add_argument("-w", "--winner", type=int, default=None,
+                             help="the seat of the winner, -1 for unfinished games")
+    info_parser.add_argument("--min-length", type=int, default=None)
+    info_parser.add_argument("--max-length", type=int, default=None)
+    info_parser.add_argument("--positions", action="store_true",
+                             help="also count the distinct positions "
+                                  "(replays the games)")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        imported, skipped = import_logs(args.logs, args.archive)
+        print(f"imported {imported} games, skipped {skipped} logs")
+        return
+
+    archive = GameArchive(args.archive)
+    game_ids = archive.filter(args.players, args.winner,
+                              args.min_length, args.max_length)
+
+    lengths = archive.index["length"][game_ids]
+    mean_length = lengths.mean() if len(lengths) else 0
+
+    print(f"{len(game_ids)} of {len(archive)} games match, "
+          f"{int(lengths.sum())} turns, {mean_length:.1f} turns per game")
+
+    if args.positions:
+        total, distinct = count_positions(archive, game_ids)
+        print(f"{total} positions, {distinct} distinct")
+
+
+if __name__ == "__main__":
+    main()
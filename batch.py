@@ -0,0 +1,294 @@
+import argparse
+import time
+from typing import Tuple, Optional
+
+import numpy as np
+
+import funcs
+import layout
+from layout import NUM_OF_TRIANGLES, PLAYER_ORDER, POSSIBLE_NUM_OF_PLAYERS
+
+# The values in the occupancy arrays: 0 is an empty cell, otherwise the
+# index of the color of the ped in the cell plus one
+EMPTY = 0
+OFF_BOARD = 255
+
+PEDS_PER_PLAYER = 10
+MAX_NEIGHBORS = 6
+
+# Cells outside the triangles, and the padding cell
+CENTER = -1
+NO_TRIANGLE = -2
+
+
+class BatchEngine:
+    """Generating the legal moves of many boards at once.
+    A batch of K boards is a (K, 121) uint8 occupancy array, with the cells
+    in the order of layout.all_positions (the same as Board's cells).
+    Moves are found with gathers from precomputed neighbor and hop tables,
+    which are built with the same rules Board uses."""
+
+    def __init__(self) -> None:
+
+        positions, neighbors, hops = layout.cell_tables()
+
+        self.num_cells = len(positions)
+
+        # The tables are padded to 6 entries per cell with an extra
+        # off-board cell, which is always "occupied"
+        self._pad = self.num_cells
+        self._neighbors = np.full((self.num_cells, MAX_NEIGHBORS), self._pad,
+                                  dtype=np.intp)
+        self._hops = np.full((self.num_cells, MAX_NEIGHBORS), self._pad,
+                             dtype=np.intp)
+
+        for cell, (cell_neighbors, landings) in enumerate(zip(neighbors, hops)):
+            for k, (neighbor, landing) in enumerate(zip(cell_neighbors, landings)):
+                self._neighbors[cell, k] = neighbor
+                if landing >= 0:
+                    self._hops[cell, k] = landing
+
+        # The triangle of every cell (and of the padding cell)
+        self._triangles = np.full(self.num_cells + 1, NO_TRIANGLE, dtype=np.intp)
+        self._triangles[:self.num_cells] = CENTER
+
+        cell = 0
+        for triangle, triangle_positions in \
+                enumerate(layout.triangles_positions().values()):
+            self._triangles[cell:cell + len(triangle_positions)] = triangle
+            cell += len(triangle_positions)
+
+        self._cell_triangles = self._triangles[:self.num_cells]
+
+        # Whether a step or a hop from a cell stays in the cell's triangle.
+        # A ped in its target triangle can't leave it.
+        self._step_stays = (self._triangles[self._neighbors] ==
+                            self._cell_triangles[:, None])
+        self._hop_stays = (self._triangles[self._hops] ==
+                           self._cell_triangles[:, None])
+
+    def cell_triangles(self) -> np.ndarray:
+        """Return the triangle of every cell (CENTER for the center cells)."""
+
+        return self._cell_triangles
+
+    def starting_occupancy(self, num_players: int, num_boards: int) -> np.ndarray:
+        """Return the occupancy of the given number of boards at the start
+        of a game of the given number of players."""
+
+        occupancy = np.zeros((num_boards, self.num_cells), dtype=np.uint8)
+
+        for color in self.playing_colors(num_players):
+            occupancy[:, self._cell_triangles == color] = color + 1
+
+        return occupancy
+
+    @staticmethod
+    def playing_colors(num_players: int) -> np.ndarray:
+        """Return the color (triangle) indices of the players,
+        in the order they play."""
+
+        for order in PLAYER_ORDER:
+            if len(order) == num_players:
+                return np.array(order, dtype=np.intp) - 1
+
+        raise ValueError("Invalid number of players", num_players)
+
+    @staticmethod
+    def target_triangles(colors: np.ndarray) -> np.ndarray:
+        """Return the target triangle of each of the given colors,
+        which is the opposite triangle."""
+
+        return (colors + NUM_OF_TRIANGLES // 2) % NUM_OF_TRIANGLES
+
+    def _padded(self, occupancy: np.ndarray) -> np.ndarray:
+        """Return the occupancy with the always occupied padding cell."""
+
+        padding = np.full((occupancy.shape[0], 1), OFF_BOARD, dtype=np.uint8)
+        return np.concatenate([occupancy, padding], axis=1)
+
+    def move_masks(self, occupancy: np.ndarray,
+                   colors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the single moves of the peds of the given color on each
+        board, like Board.find_valid_moves: a (K, 121, 6) mask of the steps
+        to each neighbor, and a (K, 121, 6) mask of the hops over each
+        neighbor. The destination cells are in neighbor_table and hop_table."""
+
+        padded = self._padded(occupancy)
+        own = occupancy == (colors[:, None] + 1)
+
+        # Peds in their target triangle can only move inside of it
+        in_target = self._cell_triangles[None, :] == \
+            self.target_triangles(colors)[:, None]
+
+        neighbors = padded[:, self._neighbors]
+
+        steps = (own[:, :, None] & (neighbors == EMPTY) &
+                 (~in_target[:, :, None] | self._step_stays[None]))
+
+        hops = (own[:, :, None] & (neighbors != EMPTY) &
+                (padded[:, self._hops] == EMPTY) &
+                (~in_target[:, :, None] | self._hop_stays[None]))
+
+        return steps, hops
+
+    def turn_masks(self, occupancy: np.ndarray,
+                   colors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the legal turns of the peds of the given color on each
+        board, including chains of hops of any length.
+        Returns the cells of the peds, a (K, P) array (-1 where a board has
+        less than P peds), and a (K, P, 121) mask of the cells each ped can
+        end its turn at."""
+
+        num_boards = occupancy.shape[0]
+        rows = np.arange(num_boards)[:, None]
+
+        steps, hops = self.move_masks(occupancy, colors)
+        own = occupancy == (colors[:, None] + 1)
+
+        # The cells of the peds, first the peds of the player
+        num_peds = max(int(own.sum(axis=1).max(initial=0)), 1)
+        ped_cells = np.argsort(~own, axis=1, kind="stable")[:, :num_peds]
+        valid = own[rows, ped_cells]
+        ped_cells = np.where(valid, ped_cells, -1)
+        safe_cells = np.where(valid, ped_cells, 0)
+
+        # The cells reachable with a single hop (an extra padding column
+        # catches the hops that leave the board)
+        reach = np.zeros((num_boards, num_peds, self.num_cells + 1), dtype=bool)
+        np.put_along_axis(reach, self._hops[safe_cells],
+                          hops[rows, safe_cells] & valid[:, :, None], axis=2)
+        reach[:, :, self._pad] = False
+
+        # Hopping into a cell d over its neighbor k, from the cell beyond it.
+        # The hopped cell must be occupied by a ped other than the moving
+        # one, d must be empty, and peds in the target triangle stay in it.
+        padded = self._padded(occupancy)
+        target = self.target_triangles(colors)
+
+        hop_from = self._hops
+        over_occupied = padded[:, self._neighbors] != EMPTY
+        into_empty = (occupancy == EMPTY)[:, :, None]
+        stays = (~(self._triangles[hop_from][None] == target[:, None, None]) |
+                 self._hop_stays[None])
+        can_hop_into = (over_occupied & into_empty & stays)[:, None]
+
+        over_origin = self._neighbors[None, None] == \
+            safe_cells[:, :, None, None]
+
+        # Extend the hop chains until no new cells are reached
+        while True:
+            extended = (reach[:, :, hop_from] & can_hop_into &
+                        ~over_origin).any(axis=3)
+
+            new_reach = reach[:, :, :self.num_cells] | extended
+            if np.array_equal(new_reach, reach[:, :, :self.num_cells]):
+                break
+
+            reach[:, :, :self.num_cells] = new_reach
+
+        # Add the steps to the neighbors
+        np.put_along_axis(reach, self._neighbors[safe_cells],
+                          (steps[rows, safe_cells] & valid[:, :, None]) |
+                          np.take_along_axis(reach, self._neighbors[safe_cells],
+                                             axis=2),
+                          axis=2)
+
+        return ped_cells, reach[:, :, :self.num_cells]
+
+    @staticmethod
+    def random_turns(ped_cells: np.ndarray, destinations: np.ndarray,
+                     rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        """Choose a random legal turn on each board.
+        Returns the start and end cells of the turns, -1 on boards
+        without a legal turn."""
+
+        num_boards, num_peds, num_cells = destinations.shape
+
+        scores = np.where(destinations,
+                          rng.random(destinations.shape), -1.0)
+        choice = scores.reshape(num_boards, -1).argmax(axis=1)
+
+        has_turn = destinations.reshape(num_boards, -1).any(axis=1)
+        ped = choice // num_cells
+
+        starts = np.where(has_turn, ped_cells[np.arange(num_boards), ped], -1)
+        ends = np.where(has_turn, choice % num_cells, -1)
+
+        return starts, ends
+
+    @staticmethod
+    def apply_turns(occupancy: np.ndarray, starts: np.ndarray,
+                    ends: np.ndarray) -> None:
+        """Move the peds from the start cells to the end cells, in place.
+        Boards with a start cell of -1 are left as they are."""
+
+        rows = np.nonzero(starts >= 0)[0]
+        occupancy[rows, ends[rows]] = occupancy[rows, starts[rows]]
+        occupancy[rows, starts[rows]] = EMPTY
+
+    def finished(self, occupancy: np.ndarray, colors: np.ndarray) -> np.ndarray:
+        """Return which boards the player of the given color has won:
+        all of its peds are in its target triangle."""
+
+        own = occupancy == (colors[:, None] + 1)
+        in_target = self._cell_triangles[None, :] == \
+            self.target_triangles(colors)[:, None]
+
+        return ~(own & ~in_target).any(axis=1)
+
+
+def run_random_games(engine: BatchEngine, num_players: int, num_boards: int,
+                     num_turns: int, seed: Optional[int] = None) -> Tuple[int, float]:
+    """Advance the given number of boards by random turns, all at once.
+    Returns the number of legal turns generated and the time it took."""
+
+    rng = np.random.default_rng(seed)
+    occupancy = engine.starting_occupancy(num_players, num_boards)
+    playing_colors = engine.playing_colors(num_players)
+
+    generated = 0
+    start = time.perf_counter()
+
+    for turn in range(num_turns):
+        colors = np.full(num_boards, playing_colors[turn % num_players],
+                         dtype=np.intp)
+
+        ped_cells, destinations = engine.turn_masks(occupancy, colors)
+        generated += int(destinations.sum())
+
+        starts, ends = engine.random_turns(ped_cells, destinations, rng)
+        engine.apply_turns(occupancy, starts, ends)
+
+    return generated, time.perf_counter() - start
+
+
+def main() -> None:
+    """Benchmark the batched move generation."""
+
+    parser = argparse.ArgumentParser(
+        description="Advance many random games at once and report the "
+                    "number of legal turns generated per second.")
+    parser.add_argument("-p", "--players", type=int, default=2,
+                        choices=POSSIBLE_NUM_OF_PLAYERS)
+    parser.add_argument("-k", "--boards", type=int, default=1000,
+                        help="the number of boards in the batch")
+    parser.add_argument("-t", "--turns", type=int, default=60,
+                        help="the number of turns to play on every board")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    # The seed is printed, so the same games can be played again
+    if args.seed is None:
+        args.seed = funcs.new_seed()
+
+    engine = BatchEngine()
+    generated, elapsed = run_random_games(engine, args.players, args.boards,
+                                          args.turns, args.seed)
+
+    print(f"boards {args.boards}  turns {args.turns}  moves {generated}  "
+          f"time {elapsed:.3f}s  moves/s {generated / elapsed:.0f}  seed {args.seed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,79 +1,181 @@
-from typing import Tuple, List, Dict, Union, Optional
+import functools
+import random
+from typing import Tuple, List, Dict, Set, Union, Optional
 
+from instrumentation import INSTRUMENTATION, timed
+import layout
+from layout import NUM_OF_TRIANGLES, PLAYER_ORDER
 from ped import Ped
 from pygame_switch import InitGui
+from terminal import format_position
 
 Coordinates = Tuple[float, float]
 
-# Constants from the GUI
-FRAME_HEIGHT = 590
-FRAME_WIDTH = 930
-BOARD_HEIGHT = 0.95 * FRAME_HEIGHT
-BOARD_WIDTH = 0.6 * FRAME_WIDTH
-
 X_COORD = 0
 Y_COORD = 1
 
+NEIGHBOR_MOVES = 0
+HOP_MOVES = 1
+
+# The Zobrist keys are drawn from a fixed seed,
+# so the hash of a position is the same in every process
+ZOBRIST_SEED = 20240601
+MAX_PLAYERS = 6
+
+# The most moves kept in the cache of a board before it's emptied
+MOVES_CACHE_SIZE = 100_000
+
+
+@functools.lru_cache(maxsize=None)
+def zobrist_keys(num_cells: int) -> Tuple[Tuple[Tuple[int, ...], ...], Tuple[int, ...]]:
+    """Return the random 64-bit keys of a ped of every color in every cell,
+    and of every side to move. The hash of a position is the xor of the
+    keys of its peds (and of the side to move)."""
+
+    rng = random.Random(ZOBRIST_SEED)
+
+    cells = tuple(tuple(rng.getrandbits(64) for _ in range(NUM_OF_TRIANGLES))
+                  for _ in range(num_cells))
+    sides = tuple(rng.getrandbits(64) for _ in range(MAX_PLAYERS))
+
+    return cells, sides
+
 
 class Board:
 
-    def __init__(self, num_players: int) -> None:
+    def __init__(self, num_players: int, headless: bool = False) -> None:
+        """Create a board for the given number of players.
+        A headless board has no gui: it only keeps the rules and the
+        state of the game, so it can be used without a display."""
 
         self._peds: List[Ped] = []
-        self.gui = InitGui(num_players)
+
+        # Indexes of the peds, kept up to date when placing peds,
+        # so finding a ped doesn't need to scan all the peds
+        self._peds_set: Set[Ped] = set()
+        self._peds_by_color: Dict[str, List[Ped]] = {}
+
+        self.gui = None if headless else InitGui(num_players)
+
+        for order in PLAYER_ORDER:
+            if len(order) == num_players:
+                self._player_order = order
+                break
 
         board: Dict[Coordinates, Union[Ped, None]] = dict()
 
-        # Getting the locations of all cells from the gui object
-        all_locations = self.get_all_positions()
-        for location in all_locations:
+        # Getting the locations of all cells and their neighbors, once.
+        # The peds keep the index of their location in this list, and the
+        # index of their color in the list of colors.
+        positions, self._neighbor_cells, self._hop_cells = layout.cell_tables()
+        self._positions: List[Coordinates] = list(positions)
+
+        self._cells: Dict[Coordinates, int] = {
+            location: cell for cell, location in enumerate(self._positions)}
+
+        self._color_positions = layout.triangles_positions()
+        self._target_distances = layout.target_distances()
+        self._colors: List[str] = list(self._color_positions.keys())
+
+        # The triangle (color index) of every cell, None for the center
+        self._cell_triangles: List[Optional[int]] = [None] * len(self._positions)
+        for triangle, color in enumerate(self._colors):
+            for location in self._color_positions[color]:
+                self._cell_triangles[self._cells[location]] = triangle
+
+        for location in self._positions:
             board[location] = None
 
+        # The Zobrist hash of the peds on the board, updated on every move
+        self._zobrist_cells, self._zobrist_sides = zobrist_keys(len(self._positions))
+        self._hash = 0
+
+        # Bit i is set if cell i is occupied, updated on every move
+        self._occupied = 0
+        self._move_masks = layout.move_masks()
+
+        # The valid moves of a ped, by its cell, its color and which of the
+        # cells around it are occupied. A move only changes that for the
+        # cells around the cells it emptied and filled, so the moves of the
+        # other peds are still found in the cache, and also after moves
+        # that are taken back while searching.
+        self._moves_cache: Dict[Tuple[int, int, int],
+                                Tuple[Tuple[Coordinates, ...],
+                                      Tuple[Coordinates, ...]]] = {}
+
         self._board = board
 
         self.board_state: List[Dict[Coordinates, Union[Ped, None]]] = []
 
+    def create_ped(self, color: str, location: Coordinates) -> Ped:
+        """Create a ped of the given color at the given location.
+        The ped is not placed on the board."""
+
+        return Ped(self._colors.index(color), self._cells[location],
+                   self._colors, self._positions)
+
+    def place_starting_peds(self) -> List[Ped]:
+        """Create the peds of all the players on their starting positions
+        (their home triangles), place them on the board and return them."""
+
+        peds = [self.create_ped(color, location)
+                for color in self.playable_colors()
+                for location in self._color_positions[color]]
+
+        self.place_peds(peds)
+
+        return peds
+
+    def place_occupancy(self, occupancy: List[int]) -> List[Ped]:
+        """Create peds by the given occupancy (as returned from
+        get_occupancy), place them on the board and return them."""
+
+        peds = [Ped(value - 1, cell, self._colors, self._positions)
+                for cell, value in enumerate(occupancy) if value]
+
+        self.place_peds(peds)
+
+        return peds
+
+    def get_occupancy(self) -> List[int]:
+        """Return the occupancy of every cell, by the order of the cells:
+        0 for an empty cell, otherwise the color index of the ped plus 1."""
+
+        occupancy = [0] * len(self._positions)
+        for ped in self._peds:
+            occupancy[ped.get_cell()] = ped.get_color_index() + 1
+
+        return occupancy
+
+    def get_cell(self, location: Coordinates) -> int:
+        """Return the index of the cell at the given location."""
+
+        return self._cells[location]
+
     def place_peds(self, peds: List[Ped]) -> None:
         """Placing the given peds on their initial locations on the board."""
 
         for ped in peds:
-            if ped in self._peds:
+            if ped in self._peds_set:
                 raise Exception("This ped already exists")
 
             # else, place the ped on the board
             self._board[ped.get_location()] = ped
             self._peds.append(ped)  # add the ped to the list of peds
+            self._hash ^= self._zobrist_cells[ped.get_cell()][ped.get_color_index()]
+            self._occupied |= 1 << ped.get_cell()
+
+            # add the ped to the indexes
+            self._peds_set.add(ped)
+            self._peds_by_color.setdefault(ped.get_color(), []).append(ped)
 
         self._update_board_state()
 
     def _find_neighbors(self, curr_pos: Coordinates) -> List[Coordinates]:
         """Return a list of the neighbor positions of the given position."""
 
-        neighbors = []
-        cell_dist = self.gui.get_cell_distance()
-
-        # Define the bounding box around the cell based on its distance from
-        # other cells. We multiply by 1.1 because the placement between
-        # several cells is not exact, so we need to take a larger area.
-        min_x = curr_pos[X_COORD] - cell_dist * 1.2
-        max_x = curr_pos[X_COORD] + cell_dist * 1.2
-        min_y = curr_pos[Y_COORD] - cell_dist * 1.2
-        max_y = curr_pos[Y_COORD] + cell_dist * 1.2
-
-        def is_valid_neighbor(position: Coordinates) -> bool:
-            """Return True if the given position is valid, False otherwise.
-            Assumes that the position that is given is from the
-            dictionary/list from the gui object."""
-
-            x, y = position
-
-            return min_x <= x <= max_x and min_y <= y <= max_y
-
-        for pos in self.get_all_positions():
-            if pos != curr_pos and is_valid_neighbor(pos):
-                neighbors.append(pos)
-
-        return neighbors
+        return [self._positions[neighbor]
+                for neighbor in self._neighbor_cells[self._cells[curr_pos]]]
 
     def _is_valid_move(self, curr_location: Coordinates,
                        end_location: Coordinates) -> Tuple[bool, bool]:
@@ -83,18 +185,17 @@ class Board:
         of the dictionary or list from the gui."""
 
         curr_ped = self._board[curr_location]
-        in_opposite_home = self.gui.is_in_opposite_home(curr_ped)
+        in_opposite_home = self.is_in_opposite_home(curr_ped)
 
         # if the ped is in the foreign home, moving out of it is invalid
         if in_opposite_home:
-            opposite_color = self.gui.color_of_opposite_home(curr_location)
+            opposite_color = self.color_of_opposite_home(curr_location)
 
             if opposite_color is None:
                 print("There is a problem.")  # Not supposed to happen (check)
                 pass
 
-            elif (end_location not in
-                    self.gui.get_color_positions_dict()[opposite_color]):
+            elif end_location not in self._color_positions[opposite_color]:
                 return False, False
 
         # if the new location is occupied by another ped,
@@ -122,69 +223,65 @@ class Board:
         Assumes that the new location is one of the locations
         of the dictionary or list from the gui."""
 
-        # Iterate through the neighbors of the current location and
-        # check if hopping over is possible
-        for neighbor in self._find_neighbors(curr_location):
-
-            # if the neighbor is not visited and is occupied by a ped,
-            # meaning we can possibly hop over it
-            if self._board[neighbor] is not None:
-
-                # Calculate the new location after hopping over the ped
-                new_x = 2 * neighbor[X_COORD] - curr_location[X_COORD]
-                new_y = 2 * neighbor[Y_COORD] - curr_location[Y_COORD]
-                new_location = (new_x, new_y)
-
-                # we need a little bit of offset because the placement
-                # is not perfect
-                offset_x = 5
-                offset_y = 5
-
-                # check for the end location in the center positions list
-                for pos in self.gui.get_center_positions_list():
-
-                    if (new_x - offset_x <= pos[
-                        X_COORD] <= new_x + offset_x and
-                            new_y - offset_y <= pos[
-                                Y_COORD] <= new_y + offset_y and
-                            self._board[pos] is None):
-                        new_location = pos
-
-                        if new_location == end_location:
-                            return True
-
-                # If we didn't find the new location at the center,
-                # we need to check if the new location is within
-                # the outer triangles locations
-                for colors, positions in self.gui.get_color_positions_dict().items():
-                    for pos in positions:
-                        if (new_x - offset_x <= pos[X_COORD] <= new_x + offset_x and
-                                new_y - offset_y <= pos[Y_COORD] <= new_y + offset_y and
-                                self._board[pos] is None):
-                            new_location = pos
-
-                            # if we found the new location, we can break
-                            if new_location == end_location:
-                                return True
+        curr_cell = self._cells[curr_location]
+
+        # Iterate through the neighbors of the current location and check
+        # if hopping over is possible. The hop table has the cell a ped
+        # lands on when hopping over each neighbor (-1 outside the board).
+        for neighbor, landing in zip(self._neighbor_cells[curr_cell],
+                                     self._hop_cells[curr_cell]):
+
+            if (landing >= 0 and
+                    self._board[self._positions[neighbor]] is not None and
+                    self._positions[landing] == end_location and
+                    self._board[end_location] is None):
+                return True
 
         return False  # we didn't find a way to hop over
 
+    @timed("board.find_valid_moves")
     def find_valid_moves(self, curr_pos: Coordinates) -> List[List[Coordinates]]:
-        """Return a list of valid moves for the given ped."""
+        """Return a list of valid moves for the given ped.
+        The moves are cached, see _moves_cache."""
+
+        curr_cell = self._cells[curr_pos]
+        key = (curr_cell, self._board[curr_pos].get_color_index(),
+               self._occupied & self._move_masks[curr_cell])
+
+        cached = self._moves_cache.get(key)
+
+        # The hit rate of the cache, counted only when instrumenting
+        if INSTRUMENTATION.enabled:
+            INSTRUMENTATION.count("board.moves_cache.miss" if cached is None
+                                  else "board.moves_cache.hit")
+
+        if cached is None:
+            if len(self._moves_cache) >= MOVES_CACHE_SIZE:
+                self._moves_cache.clear()
+
+            neighbor_moves, hop_moves = self._compute_valid_moves(curr_pos)
+            cached = self._moves_cache[key] = (tuple(neighbor_moves),
+                                               tuple(hop_moves))
+
+        # The callers change the lists they get, so they get new ones
+        return [list(cached[NEIGHBOR_MOVES]), list(cached[HOP_MOVES])]
+
+    def _compute_valid_moves(self, curr_pos: Coordinates) -> List[List[Coordinates]]:
+        """Return a list of valid moves for the given ped, checking
+        every cell it can reach."""
 
         valid_moves = []
         neighbor_moves = []
         hop_moves = []
 
-        # Get all the positions of the board
-        all_positions = self.get_all_positions()
-
-        # Iterate through all the positions of the board
-        for position in all_positions:
+        # Only the neighbors and the cells beyond them can be reached
+        # in a single move, so only they are checked (by the order of cells)
+        curr_cell = self._cells[curr_pos]
+        candidates = sorted(set(self._neighbor_cells[curr_cell]) |
+                            set(self._hop_cells[curr_cell]) - {-1})
 
-            # skip the current position
-            if position == curr_pos:
-                continue
+        for cell in candidates:
+            position = self._positions[cell]
 
             # if the move is valid, add it to the list of valid moves
             is_valid, is_hop = self._is_valid_move(curr_pos, position)
@@ -198,29 +295,86 @@ class Board:
 
         return valid_moves
 
-    def get_all_positions(self) -> List[Coordinates]:
-        """Return a list of all the positions of the board,
-        retrieved from the gui object."""
+    def find_turns(self, curr_pos: Coordinates) -> List[List[Coordinates]]:
+        """Return all the legal turns of the ped at the given position.
+        Each turn is the path of locations the ped goes through: a single
+        neighbor move, or a chain of one or more hops (a player may stop
+        after any hop, and can't hop back to a location visited in the turn)."""
 
-        all_positions = []
+        ped = self.get_ped_by_location(curr_pos)
+        possible_moves = self.find_valid_moves(curr_pos)
 
-        for color, positions in self.gui.get_color_positions_dict().items():
-            all_positions.extend(positions)
+        turns = [[curr_pos, location]
+                 for location in possible_moves[NEIGHBOR_MOVES]]
 
-        all_positions.extend(self.gui.get_center_positions_list())
+        for location in possible_moves[HOP_MOVES]:
+            self._collect_hop_chains(ped, [curr_pos, location], turns)
 
-        return all_positions
+        return turns
 
-    def _find_peds_by_color(self, color: str) -> List[Ped]:
-        """Return a list of peds with the given color."""
+    def is_valid_turn(self, path: List[Coordinates]) -> bool:
+        """Return True if the ped at the first location of the path can go
+        through the whole path in a single turn: a neighbor move, or a chain
+        of hops that doesn't visit a location twice."""
 
-        peds_list = []
+        if len(path) < 2 or len(set(path)) != len(path):
+            return False
 
-        for ped in self._peds:
-            if ped.get_color() == color:
-                peds_list.append(ped)
+        if any(location not in self._cells for location in path):
+            return False
+
+        try:
+            ped = self.get_ped_by_location(path[0])
+
+        except KeyError:
+            return False
+
+        if len(path) == 2 and \
+                path[1] in self.find_valid_moves(path[0])[NEIGHBOR_MOVES]:
+            return True
+
+        # Follow the hops, and move the ped back when done
+        valid = True
+        for i in range(1, len(path)):
+            if path[i] not in self.find_valid_moves(path[i - 1])[HOP_MOVES]:
+                valid = False
+                break
+
+            self.relocate_ped(ped, path[i])
+
+        self.relocate_ped(ped, path[0])
+
+        return valid
+
+    def _collect_hop_chains(self, ped: Ped, path: List[Coordinates],
+                            turns: List[List[Coordinates]]) -> None:
+        """Add the given hop path and all its hop continuations to the turns.
+        The ped is moved along the path while searching, and is moved back
+        to where it was when done."""
+
+        turns.append(list(path))
 
-        return peds_list
+        self.relocate_ped(ped, path[-1])
+
+        for location in self.find_valid_moves(path[-1])[HOP_MOVES]:
+            if location not in path:
+                path.append(location)
+                self._collect_hop_chains(ped, path, turns)
+                path.pop()
+
+        self.relocate_ped(ped, path[-2])
+
+    def get_all_positions(self) -> List[Coordinates]:
+        """Return a list of all the positions of the board, retrieved from
+        the gui object. The index of a position in the list is the
+        index of its cell. The list is shared, and shouldn't be changed."""
+
+        return self._positions
+
+    def _find_peds_by_color(self, color: str) -> List[Ped]:
+        """Return a list of peds with the given color."""
+
+        return list(self._peds_by_color.get(color, []))
 
     def get_ped_by_location(self, location: Coordinates) -> Optional[Ped]:
         """Return the ped at the given location.
@@ -231,10 +385,11 @@ class Board:
 
         raise KeyError("No ped found at this location")
 
+    @timed("board.move_ped")
     def move_ped(self, ped: Ped, new_location: Coordinates) -> None:
         """Move the ped to the new location."""
 
-        if ped not in self._peds:
+        if ped not in self._peds_set:
             raise Exception("This ped does not exist")
 
         # if the new location is not valid, raise an exception
@@ -247,24 +402,36 @@ class Board:
         self._board[old_location] = None
 
         # update the ped's location and place the ped in the new location
-        ped.set_location(new_location)
+        self._hash ^= self._zobrist_cells[ped.get_cell()][ped.get_color_index()]
+        self._occupied ^= 1 << ped.get_cell()
+        ped.set_cell(self._cells[new_location])
+        self._hash ^= self._zobrist_cells[ped.get_cell()][ped.get_color_index()]
+        self._occupied ^= 1 << ped.get_cell()
         self._board[new_location] = ped
 
         # update the gui
-        self.gui.update_ped(self.gui.get_temp_surface(), old_location, ped)
+        if self.gui is not None:
+            self.gui.update_ped(old_location, ped)
 
         self._update_board_state()
 
+    def relocate_ped(self, ped: Ped, new_location: Coordinates) -> None:
+        """Move the ped to the new location without validating the move,
+        updating the gui or recording the board state.
+        Used for simulating moves (and taking them back) while searching."""
+
+        self._board[ped.get_location()] = None
+        self._hash ^= self._zobrist_cells[ped.get_cell()][ped.get_color_index()]
+        self._occupied ^= 1 << ped.get_cell()
+        ped.set_cell(self._cells[new_location])
+        self._hash ^= self._zobrist_cells[ped.get_cell()][ped.get_color_index()]
+        self._occupied ^= 1 << ped.get_cell()
+        self._board[new_location] = ped
+
     def get_peds_locations_by_color(self, color: str) -> List[Coordinates]:
         """Return a list of all the locations of peds with the given color."""
 
-        locations = []
-
-        for ped in self._peds:
-            if ped.get_color() == color:
-                locations.append(ped.get_location())
-
-        return locations
+        return [ped.get_location() for ped in self._peds_by_color.get(color, [])]
 
     def get_all_peds_locations(self) -> List[Coordinates]:
         """Return a list of all the locations of all the peds."""
@@ -276,11 +443,78 @@ class Board:
 
         return locations
 
+    def playable_colors(self) -> List[str]:
+        """Return the colors of the players in the order they play."""
+
+        return [self._colors[num - 1] for num in self._player_order]
+
+    def is_in_opposite_home(self, ped: Ped) -> bool:
+        """Check if the given ped is in the home of
+        his matching opposite corner."""
+
+        # The opposite triangle is 3 triangles away from the ped's home
+        opposite_triangle = ((ped.get_color_index() + NUM_OF_TRIANGLES // 2)
+                             % NUM_OF_TRIANGLES)
+
+        return self._cell_triangles[ped.get_cell()] == opposite_triangle
+
+    def color_of_opposite_home(self, location: Coordinates) -> Optional[str]:
+        """Return the color of the foreign home if the given location is in it,
+        None otherwise."""
+
+        triangle = self._cell_triangles[self._cells[location]]
+
+        return None if triangle is None else self._colors[triangle]
+
+    def has_won(self, color: str) -> bool:
+        """Return True if all the peds of the given color are in
+        the opposite home."""
+
+        peds = self._peds_by_color.get(color, [])
+
+        return bool(peds) and all(self.is_in_opposite_home(ped) for ped in peds)
+
+    def zobrist_hash(self, side: Optional[int] = None) -> int:
+        """Return the 64-bit Zobrist hash of the position: of the peds on
+        the board, and of the side to move (the index of the player in the
+        playing order), if given. Equal positions have equal hashes."""
+
+        if side is None:
+            return self._hash
+
+        return self._hash ^ self._zobrist_sides[side]
+
+    def get_color_index(self, color: str) -> int:
+        """Return the index of the color (and of its home triangle)."""
+
+        return self._colors.index(color)
+
+    def distance_to_target(self, color: str, location: Coordinates) -> float:
+        """Return how far the location is from the target of the peds
+        of the given color (see layout.target_distances)."""
+
+        return self._target_distances[self._colors.index(color)][
+            self._cells[location]]
+
+    def total_distance(self, color: str) -> float:
+        """Return the sum of the distances of the peds of the given color
+        from their target. The lower, the closer the player is to winning."""
+
+        distances = self._target_distances[self._colors.index(color)]
+
+        return sum(distances[ped.get_cell()]
+                   for ped in self._peds_by_color.get(color, []))
+
     def get_all_peds(self):
         """Return all the ped objects on the board."""
 
         return self._peds
 
+    def __str__(self) -> str:
+        """Return the position as text (see terminal.format_position)."""
+
+        return format_position(self.get_occupancy())
+
     def _update_board_state(self) -> None:
         """Update the state of the board based on the move number."""
 
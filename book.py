@@ -0,0 +1,566 @@
+import argparse
+import hashlib
+import itertools
+import random
+import struct
+import time
+from typing import List, Tuple, Dict, Optional
+
+import numpy as np
+
+from batch import BatchEngine
+from board import Board
+from layout import NUM_OF_TRIANGLES, POSSIBLE_NUM_OF_PLAYERS
+from players import Bot
+
+Coordinates = Tuple[float, float]
+
+FROM = 0
+TO = -1
+
+PEDS_PER_PLAYER = 10
+
+# The files of the tables start with a header: a magic, the version, the
+# number of payload bytes per entry, a parameter of the table, and the
+# number of entries. Then come the sorted 64-bit keys and the payloads,
+# so the file can be memory-mapped and searched without loading it.
+HEADER = struct.Struct("<4sHHHHQ4x")
+VERSION = 1
+
+BOOK_MAGIC = b"CCOB"
+ENDGAME_MAGIC = b"CCEG"
+
+DEFAULT_BOOK_FILE = "opening_book.bin"
+DEFAULT_ENDGAME_FILE = "endgame.bin"
+
+# The opening book is built from the best turns by a search that looks
+# this many of the player's own turns ahead
+DEFAULT_PLIES = 6
+DEFAULT_WIDTH = 2
+DEFAULT_SEARCH_DEPTH = 2
+
+# The endgame table has the positions of a single player with up to this
+# many peds outside the target (more than 3 takes too much time and memory)
+DEFAULT_MAX_OUTSIDE = 2
+MAX_OUTSIDE_LIMIT = 5
+
+# Endgame positions that can't be finished (or weren't solved)
+UNSOLVED = 255
+
+# The number of positions given to the batch engine at once
+CHUNK_SIZE = 2048
+
+
+class LookupTable:
+    """A table of fixed size payloads by 64-bit keys, kept sorted by key
+    and looked up with a binary search. Loaded tables are memory-mapped,
+    so opening even a large table is instant, and tables loaded by many
+    processes share the same memory."""
+
+    def __init__(self, keys: np.ndarray, payloads: np.ndarray,
+                 parameter: int = 0) -> None:
+
+        self.keys = keys
+        self.payloads = payloads
+        self.parameter = parameter
+
+    @classmethod
+    def from_dict(cls, entries: Dict[int, Tuple[int, ...]], width: int,
+                  parameter: int = 0) -> 'LookupTable':
+        """Create a table from a dict of keys to payload bytes."""
+
+        keys = np.array(sorted(entries), dtype=np.uint64)
+        payloads = np.array([entries[int(key)] for key in keys],
+                            dtype=np.uint8).reshape(len(keys), width)
+
+        return cls(keys, payloads, parameter)
+
+    def save(self, file_name: str, magic: bytes) -> None:
+        """Write the table to a file."""
+
+        order = np.argsort(self.keys, kind="stable")
+
+        with open(file_name, "wb") as f:
+            f.write(HEADER.pack(magic, VERSION, self.payloads.shape[1],
+                                self.parameter, 0, len(self.keys)))
+            f.write(np.ascontiguousarray(self.keys[order], dtype="<u8").tobytes())
+            f.write(np.ascontiguousarray(self.payloads[order]).tobytes())
+
+    @classmethod
+    def load(cls, file_name: str, magic: bytes) -> 'LookupTable':
+        """Memory-map a table from a file."""
+
+        with open(file_name, "rb") as f:
+            file_magic, version, width, parameter, _, count = \
+                HEADER.unpack(f.read(HEADER.size))
+
+        if file_magic != magic or version != VERSION:
+            raise ValueError("Not a table of the expected kind", file_name)
+
+        if count == 0:
+            return cls(np.zeros(0, dtype=np.uint64),
+                       np.zeros((0, width), dtype=np.uint8), parameter)
+
+        keys = np.memmap(file_name, dtype="<u8", mode="r",
+                         offset=HEADER.size, shape=(count,))
+        payloads = np.memmap(file_name, dtype=np.uint8, mode="r",
+                             offset=HEADER.size + 8 * count, shape=(count, width))
+
+        return cls(keys, payloads, parameter)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lookup(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return which of the keys are in the table, and their payloads
+        (the payloads of missing keys are meaningless)."""
+
+        keys = np.asarray(keys, dtype=np.uint64)
+        if len(self.keys) == 0:
+            return (np.zeros(keys.shape, dtype=bool),
+                    np.zeros(keys.shape + (self.payloads.shape[1],), dtype=np.uint8))
+
+        indices = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        found = self.keys[indices] == keys
+
+        return found, np.asarray(self.payloads[indices])
+
+    def get(self, key: int) -> Optional[np.ndarray]:
+        """Return the payload of a single key, or None if it's missing."""
+
+        found, payloads = self.lookup(np.array([key], dtype=np.uint64))
+        return payloads[0] if found[0] else None
+
+
+def position_key(occupancy: List[int], color_index: int) -> int:
+    """Return the key of a position in the opening book:
+    a 64-bit hash of the occupancy of the board and the color to move."""
+
+    digest = hashlib.blake2b(bytes(occupancy) + bytes([color_index]),
+                             digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def search_turns(board: Board, color: str, depth: int,
+                 table: Optional[Dict[Tuple[int, int], float]] = None) -> \
+        List[Tuple[float, int, int]]:
+    """Rank the turns of the player with the given color by how close to
+    its target the player can get within the given number of its own turns
+    (the other players are assumed not to move).
+    Returns (distance, start cell, end cell) of every turn, best first.
+    Turns through different paths to the same cell are the same here.
+    Positions reached by different orders of turns are searched once,
+    with a transposition table of their Zobrist hashes."""
+
+    if table is None:
+        table = {}
+
+    ranked = []
+
+    for location in board.get_peds_locations_by_color(color):
+        ped = board.get_ped_by_location(location)
+
+        ends = {turn[TO] for turn in board.find_turns(location)}
+        for end in ends:
+            board.relocate_ped(ped, end)
+
+            if depth <= 1 or board.has_won(color):
+                distance = board.total_distance(color)
+            else:
+                distance = _best_distance(board, color, depth - 1, table)
+
+            board.relocate_ped(ped, location)
+
+            ranked.append((distance, board.get_cell(location),
+                           board.get_cell(end)))
+
+    ranked.sort()
+    return ranked
+
+
+def _best_distance(board: Board, color: str, depth: int,
+                   table: Dict[Tuple[int, int], float]) -> float:
+    """Return the least distance the player can get to within the given
+    number of turns, looking it up in the transposition table first."""
+
+    key = (board.zobrist_hash(), depth)
+    if key not in table:
+        ranked = search_turns(board, color, depth, table)
+        table[key] = ranked[0][0] if ranked else board.total_distance(color)
+
+    return table[key]
+
+
+def turn_between(board: Board, start: int, end: int) -> Optional[List[Coordinates]]:
+    """Return a legal turn from the start cell to the end cell, as a path
+    of locations, or None if there is no such turn."""
+
+    positions = board.get_all_positions()
+
+    try:
+        turns = board.find_turns(positions[start])
+
+    except KeyError:
+        return None
+
+    for turn in turns:
+        if turn[TO] == positions[end]:
+            return turn
+
+    return None
+
+
+def build_opening_book(num_players: int, plies: int, width: int,
+                       depth: int) -> Dict[int, Tuple[int, int]]:
+    """Return the opening book of games with the given number of players:
+    the best turn (start and end cells) by the search, in every position of
+    the first plies of the game. Every player is expected to play one of
+    its best turns, so the positions after the given number of the best
+    turns of every player are in the book."""
+
+    board = Board(num_players, headless=True)
+    board.place_starting_peds()
+    colors = board.playable_colors()
+
+    book: Dict[int, Tuple[int, int]] = {}
+
+    def expand(ply: int) -> None:
+        color = colors[ply % num_players]
+        key = position_key(board.get_occupancy(), board.get_color_index(color))
+
+        if key in book:
+            return
+
+        ranked = search_turns(board, color, depth)
+        if not ranked:
+            return
+
+        book[key] = ranked[0][1:]
+
+        if ply + 1 >= plies:
+            return
+
+        positions = board.get_all_positions()
+        for _, start, end in ranked[:width]:
+            ped = board.get_ped_by_location(positions[start])
+
+            board.relocate_ped(ped, positions[end])
+            expand(ply + 1)
+            board.relocate_ped(ped, positions[start])
+
+    expand(0)
+
+    return book
+
+
+class RaceTable:
+    """The positions of races: a player whose peds don't meet the peds of
+    the other players anymore, with a few peds outside the target.
+    A position is keyed by the color, the empty cells of the target and the
+    cells of the peds outside of it, and its payload is the number of turns
+    it takes to win from it."""
+
+    def __init__(self) -> None:
+        self._engine = BatchEngine()
+        self._triangles = self._engine.cell_triangles()
+        self._num_cells = self._engine.num_cells
+
+    def target_cells(self, color: int) -> np.ndarray:
+        return np.nonzero(self._triangles ==
+                          (color + NUM_OF_TRIANGLES // 2) % NUM_OF_TRIANGLES)[0]
+
+    def keys(self, own: np.ndarray, color: int) -> np.ndarray:
+        """Return the keys of the positions of the peds of the given color,
+        given as a (K, 121) mask of the cells of the peds.
+        The keys of positions with too many peds outside are meaningless."""
+
+        target = self.target_cells(color)
+        outside = np.ones(self._num_cells, dtype=bool)
+        outside[target] = False
+
+        # The empty cells of the target, as a bit mask
+        holes = (~own[:, target]).astype(np.uint64) << \
+            np.arange(len(target), dtype=np.uint64)
+        keys = holes.sum(axis=1, dtype=np.uint64) << np.uint64(40)
+
+        # The cells outside the target, sorted, a byte each
+        cells = np.where(own & outside[None], np.arange(self._num_cells),
+                         UNSOLVED)
+        cells = np.sort(cells, axis=1)[:, :MAX_OUTSIDE_LIMIT].astype(np.uint64)
+        for i in range(MAX_OUTSIDE_LIMIT):
+            keys |= cells[:, i] << np.uint64(8 * i)
+
+        return keys | (np.uint64(color) << np.uint64(50))
+
+    def positions(self, color: int, num_outside: int) -> np.ndarray:
+        """Return all the positions of the given color with the given
+        number of peds outside the target, as a (K, 121) mask."""
+
+        target = self.target_cells(color)
+        outside = np.setdiff1d(np.arange(self._num_cells), target)
+
+        outside_sets = np.array(list(itertools.combinations(outside, num_outside)),
+                                dtype=np.intp).reshape(-1, num_outside)
+        hole_sets = np.array(list(itertools.combinations(target, num_outside)),
+                             dtype=np.intp).reshape(-1, num_outside)
+
+        own = np.zeros((len(outside_sets) * len(hole_sets), self._num_cells),
+                       dtype=bool)
+        own[:, target] = True
+
+        rows = np.arange(len(own))[:, None]
+        own[rows, np.repeat(outside_sets, len(hole_sets), axis=0)] = True
+        own[rows, np.tile(hole_sets, (len(outside_sets), 1))] = False
+
+        return own
+
+    def successors(self, own: np.ndarray,
+                   color: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the positions after every legal turn of every position:
+        the index of the position each turn is from, and the keys of the
+        positions the turns lead to."""
+
+        sources = []
+        keys = []
+
+        for first in range(0, len(own), CHUNK_SIZE):
+            chunk = own[first:first + CHUNK_SIZE]
+            colors = np.full(len(chunk), color, dtype=np.intp)
+            occupancy = chunk.astype(np.uint8) * np.uint8(color + 1)
+
+            ped_cells, destinations = self._engine.turn_masks(occupancy, colors)
+            board_ids, peds, ends = np.nonzero(destinations)
+
+            after = chunk[board_ids]
+            after[np.arange(len(after)), ped_cells[board_ids, peds]] = False
+            after[np.arange(len(after)), ends] = True
+
+            sources.append(board_ids + first)
+            keys.append(self.keys(after, color))
+
+        return np.concatenate(sources), np.concatenate(keys)
+
+    def solve(self, color: int, max_outside: int,
+              verbose: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the keys and the number of turns to win of all the
+        positions of the given color with up to the given number of
+        peds outside the target.
+        The positions are solved by the number of peds outside, from the
+        won position up: a ped that entered the target can't leave it, so a
+        turn either keeps the number of peds outside or lowers it by one.
+        The turns that keep it can be taken back, so inside a layer, the
+        distances spread like a breadth-first search."""
+
+        won = np.zeros((1, self._num_cells), dtype=bool)
+        won[0, self.target_cells(color)] = True
+
+        solved_keys = [self.keys(won, color)]
+        solved_turns = [np.zeros(1, dtype=np.int64)]
+
+        for num_outside in range(1, max_outside + 1):
+            start = time.perf_counter()
+
+            own = self.positions(color, num_outside)
+            layer_keys = self.keys(own, color)
+            order = np.argsort(layer_keys)
+            own, layer_keys = own[order], layer_keys[order]
+
+            sources, keys = self.successors(own, color)
+            del own
+
+            # The turns into the layer below, which is solved already
+            below_keys, below_turns = solved_keys[-1], solved_turns[-1]
+            index = np.minimum(np.searchsorted(below_keys, keys),
+                               len(below_keys) - 1)
+            into_below = below_keys[index] == keys
+
+            turns = np.full(len(layer_keys), np.iinfo(np.int64).max // 2,
+                            dtype=np.int64)
+            np.minimum.at(turns, sources[into_below],
+                          below_turns[index[into_below]] + 1)
+
+            # The turns inside the layer
+            index = np.searchsorted(layer_keys, keys[~into_below])
+            inside_from = sources[~into_below]
+
+            while True:
+                relaxed = turns.copy()
+                np.minimum.at(relaxed, inside_from, turns[index] + 1)
+                if np.array_equal(relaxed, turns):
+                    break
+                turns = relaxed
+
+            solved_keys.append(layer_keys)
+            solved_turns.append(turns)
+
+            if verbose:
+                print(f"color {color}  outside {num_outside}  "
+                      f"positions {len(layer_keys)}  "
+                      f"time {time.perf_counter() - start:.1f}s")
+
+        keys = np.concatenate(solved_keys)
+        turns = np.concatenate(solved_turns)
+
+        return keys, np.minimum(turns, UNSOLVED).astype(np.uint8)
+
+
+def build_endgame_table(colors: List[int], max_outside: int,
+                        verbose: bool = False) -> LookupTable:
+    """Solve the race positions of the given colors."""
+
+    race = RaceTable()
+    keys, turns = [], []
+
+    for color in colors:
+        color_keys, color_turns = race.solve(color, max_outside, verbose)
+        keys.append(color_keys)
+        turns.append(color_turns)
+
+    return LookupTable(np.concatenate(keys), np.concatenate(turns)[:, None],
+                       max_outside)
+
+
+class BookBot(Bot):
+    """A bot that plays the turns of the opening book and the endgame table
+    when its position is in them, and searches for a turn otherwise."""
+
+    __slots__ = ("_book", "_endgame", "_race", "_depth")
+
+    def __init__(self, peds_color: str, book: Optional[LookupTable] = None,
+                 endgame: Optional[LookupTable] = None,
+                 depth: int = 1) -> None:
+
+        super().__init__(peds_color)
+
+        self._book = book
+        self._endgame = endgame
+        self._race = RaceTable() if endgame is not None else None
+        self._depth = depth
+
+    def _book_turn(self, board: Board) -> Optional[List[Coordinates]]:
+        """Return the turn of the opening book, if the position is in it."""
+
+        if self._book is None:
+            return None
+
+        color_index = board.get_color_index(self._peds_color)
+        payload = self._book.get(position_key(board.get_occupancy(), color_index))
+        if payload is None:
+            return None
+
+        return turn_between(board, int(payload[0]), int(payload[1]))
+
+    def _endgame_turn(self, board: Board,
+                      rng: random.Random) -> Optional[List[Coordinates]]:
+        """Return the turn that wins the race the fastest, if the position
+        is in the endgame table. The table ignores the other players, so
+        only their peds in the way of the race make it wrong."""
+
+        if self._endgame is None:
+            return None
+
+        color_index = board.get_color_index(self._peds_color)
+        outside = [location
+                   for location in board.get_peds_locations_by_color(self._peds_color)
+                   if not board.is_in_opposite_home(board.get_ped_by_location(location))]
+
+        if not outside or len(outside) > self._endgame.parameter:
+            return None
+
+        cells = np.zeros(len(board.get_all_positions()), dtype=bool)
+        cells[[board.get_cell(location) for location in
+               board.get_peds_locations_by_color(self._peds_color)]] = True
+
+        # The positions after every turn
+        turns = [turn for location in board.get_peds_locations_by_color(self._peds_color)
+                 for turn in board.find_turns(location)]
+        if not turns:
+            return None
+
+        after = np.repeat(cells[None], len(turns), axis=0)
+        for i, turn in enumerate(turns):
+            after[i, board.get_cell(turn[FROM])] = False
+            after[i, board.get_cell(turn[TO])] = True
+
+        found, payloads = self._endgame.lookup(self._race.keys(after, color_index))
+        remaining = np.where(found, payloads[:, 0], UNSOLVED)
+
+        best = remaining.min()
+        if best == UNSOLVED:
+            return None
+
+        return rng.choice([turn for turn, turns_left in zip(turns, remaining)
+                           if turns_left == best])
+
+    def choose_turn(self, board: Board,
+                    rng: random.Random) -> Optional[List[Coordinates]]:
+        """Choose the turn of the book or the endgame table, or the best
+        turn of a short search."""
+
+        turn = self._book_turn(board) or self._endgame_turn(board, rng)
+        if turn is not None:
+            return turn
+
+        ranked = search_turns(board, self._peds_color, self._depth)
+        if not ranked:
+            return None
+
+        best = [(start, end) for distance, start, end in ranked
+                if distance == ranked[0][0]]
+        return turn_between(board, *rng.choice(best))
+
+
+def main() -> None:
+    """Build the opening book and the endgame table."""
+
+    parser = argparse.ArgumentParser(
+        description="Build the opening book and the endgame table of the bots.")
+    subparsers = parser.add_subparsers(dest="table", required=True)
+
+    book_parser = subparsers.add_parser("book", help="build the opening book")
+    book_parser.add_argument("-p", "--players", type=int, nargs="+",
+                             default=POSSIBLE_NUM_OF_PLAYERS,
+                             choices=POSSIBLE_NUM_OF_PLAYERS)
+    book_parser.add_argument("--plies", type=int, default=DEFAULT_PLIES,
+                             help="the number of turns (of all the players) "
+                                  "from the start that are in the book")
+    book_parser.add_argument("--width", type=int, default=DEFAULT_WIDTH,
+                             help="the number of best turns of every "
+                                  "position that are followed")
+    book_parser.add_argument("-d", "--depth", type=int,
+                             default=DEFAULT_SEARCH_DEPTH,
+                             help="the number of own turns the search looks at")
+    book_parser.add_argument("-o", "--output", default=DEFAULT_BOOK_FILE)
+
+    endgame_parser = subparsers.add_parser("endgame",
+                                           help="solve the race positions")
+    endgame_parser.add_argument("-c", "--colors", type=int, nargs="+",
+                                default=list(range(NUM_OF_TRIANGLES)),
+                                help="the indices of the colors to solve")
+    endgame_parser.add_argument("-m", "--max-outside", type=int,
+                                default=DEFAULT_MAX_OUTSIDE,
+                                choices=range(1, MAX_OUTSIDE_LIMIT + 1))
+    endgame_parser.add_argument("-o", "--output", default=DEFAULT_ENDGAME_FILE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+
+    if args.table == "book":
+        entries: Dict[int, Tuple[int, int]] = {}
+        for num_players in args.players:
+            entries.update(build_opening_book(num_players, args.plies,
+                                              args.width, args.depth))
+
+        table = LookupTable.from_dict(entries, 2, args.plies)
+        table.save(args.output, BOOK_MAGIC)
+
+    else:
+        table = build_endgame_table(args.colors, args.max_outside, verbose=True)
+        table.save(args.output, ENDGAME_MAGIC)
+
+    print(f"{len(table)} positions written to {args.output}  "
+          f"time {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import os
+import sqlite3
+import time
+from typing import List, Tuple, Optional, NamedTuple
+
+from snapshot import GameSnapshot
+
+# The catalog is kept in the working directory, next to the logs of the games
+DEFAULT_CATALOG_FILE = "game_catalog.sqlite"
+
+# A row for every game played, by its log. The final position is the
+# occupancy of the cells (a byte each, see Board.get_occupancy), and bit i
+# of bots is set if the player at seat i is a bot. The winner is the seat of
+# the winner, NULL if nobody won (the game was stopped, or ended in a draw).
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    game_id INTEGER PRIMARY KEY,
+    log_file TEXT NOT NULL UNIQUE,
+    played_at REAL NOT NULL,
+    players INTEGER NOT NULL,
+    bots INTEGER NOT NULL,
+    seed INTEGER NOT NULL,
+    turns INTEGER NOT NULL,
+    winner INTEGER,
+    draw INTEGER NOT NULL,
+    final_position BLOB NOT NULL
+)
+"""
+
+COLUMNS = ("game_id, log_file, played_at, players, bots, seed, turns, winner, "
+           "draw, final_position")
+
+
+class CatalogEntry(NamedTuple):
+    """A game of the catalog: enough to list it and show how it ended,
+    without its log or any of its objects."""
+
+    game_id: int
+    log_file: str
+    played_at: float  # Seconds since the epoch, when it was last played
+    players: int
+    bots: int  # Bit i is set if the player at seat i is a bot
+    seed: int
+    turns: int
+    winner: Optional[int]  # The seat of the winner
+    draw: bool
+    final_position: Tuple[int, ...]  # As returned from Board.get_occupancy
+
+    def real_players(self) -> int:
+        """Return the number of human players."""
+
+        return sum(not self.bots >> seat & 1 for seat in range(self.players))
+
+    def is_over(self) -> bool:
+        return self.winner is not None or self.draw
+
+    def describe(self) -> str:
+        """Return a line about the game, for listing it."""
+
+        if self.winner is not None:
+            outcome = f"won by player {self.winner + 1}"
+        elif self.draw:
+            outcome = "a draw"
+        else:
+            outcome = "unfinished"
+
+        played_at = time.strftime("%Y-%m-%d %H:%M", time.localtime(self.played_at))
+
+        return (f"{os.path.basename(self.log_file)} ({played_at}): "
+                f"{self.players} players, {self.real_players()} real, "
+                f"{self.turns} turns, {outcome}")
+
+
+class GameCatalog:
+    """The games played, kept in a small SQLite file, so the history of the
+    games survives the process and listing it reads no logs.
+    The file is opened on first use."""
+
+    def __init__(self, file_name: str = DEFAULT_CATALOG_FILE) -> None:
+        self.file_name = file_name
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.file_name)
+            self._connection.execute(SCHEMA)
+
+        return self._connection
+
+    def add(self, snapshot: GameSnapshot, winner: Optional[int] = None,
+            draw: bool = False) -> int:
+        """Add the game of the snapshot (taken when it ended) to the
+        catalog, or update it if it's there already (a resumed game).
+        Returns the id of the game."""
+
+        connection = self._connect()
+
+        with connection:
+            connection.execute(
+                "INSERT INTO games (log_file, played_at, players, bots, seed, "
+                "turns, winner, draw, final_position) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (log_file) DO UPDATE SET played_at = excluded.played_at, "
+                "turns = excluded.turns, winner = excluded.winner, "
+                "draw = excluded.draw, final_position = excluded.final_position",
+                (os.path.abspath(snapshot.log_file), time.time(), snapshot.players,
+                 snapshot.bots, snapshot.seed, snapshot.turns, winner, int(draw),
+                 bytes(snapshot.occupancy)))
+
+            row = connection.execute("SELECT game_id FROM games WHERE log_file = ?",
+                                     (os.path.abspath(snapshot.log_file),)).fetchone()
+
+        return row[0]
+
+    def games(self) -> List[CatalogEntry]:
+        """Return the games of the catalog, in the order they were first
+        played."""
+
+        rows = self._connect().execute(
+            f"SELECT {COLUMNS} FROM games ORDER BY game_id").fetchall()
+
+        return [_entry(row) for row in rows]
+
+    def game(self, game_id: int) -> Optional[CatalogEntry]:
+        row = self._connect().execute(
+            f"SELECT {COLUMNS} FROM games WHERE game_id = ?", (game_id,)).fetchone()
+
+        return _entry(row) if row is not None else None
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def _entry(row: tuple) -> CatalogEntry:
+    *fields, draw, final_position = row
+    return CatalogEntry(*fields, bool(draw), tuple(final_position))
@@ -0,0 +1,262 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import List, Dict, Optional, Any, NamedTuple
+
+import funcs
+from board import Board
+from layout import POSSIBLE_NUM_OF_PLAYERS
+from players import Bot, GreedyBot
+from server import GameServer, DEFAULT_HOST, DEFAULT_PORT, encode
+
+Message = Dict[str, Any]
+
+# The number of moves after which a simulated game is abandoned,
+# because random players can shuffle peds back and forth forever
+DEFAULT_MAX_MOVES = 200
+
+
+class GameClient:
+    """A connection to the game server."""
+
+    def __init__(self, reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter) -> None:
+        self._reader = reader
+        self._writer = writer
+
+        # The number of messages sent and received
+        self.sent = 0
+        self.received = 0
+
+    @classmethod
+    async def connect(cls, host: str = DEFAULT_HOST,
+                      port: int = DEFAULT_PORT) -> 'GameClient':
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def send(self, message: Message) -> None:
+        self._writer.write(encode(message))
+        self.sent += 1
+        await self._writer.drain()
+
+    async def receive(self) -> Optional[Message]:
+        """Return the next message from the server,
+        or None if the connection was closed."""
+
+        line = await self._reader.readline()
+        if not line:
+            return None
+
+        self.received += 1
+        return json.loads(line)
+
+    async def close(self) -> None:
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+
+        except ConnectionError:
+            pass
+
+
+class SimulatedPlayer:
+    """A client that plays a seat at a table with the turns of a greedy bot.
+    It follows the game on its own headless board, which is updated by the
+    deltas the server sends. The time from sending a turn until the server
+    broadcasts it is kept in the latencies list."""
+
+    def __init__(self, client: GameClient, table_id: int,
+                 max_moves: int = DEFAULT_MAX_MOVES,
+                 rng: Optional[random.Random] = None) -> None:
+
+        self._client = client
+        self._table_id = table_id
+        self._max_moves = max_moves
+        self._rng = rng if rng is not None else random.Random()
+
+        self._board: Optional[Board] = None
+        self._bot: Optional[Bot] = None
+        self._seat: Optional[int] = None
+        self._moves = 0
+
+        self._sent_at = 0.0
+        self.latencies: List[float] = []
+
+    async def _move_if_turn(self, turn: int) -> bool:
+        """Send a turn if it's the player's turn.
+        Returns False if the player gives up the game."""
+
+        if turn != self._seat:
+            return True
+
+        if self._moves >= self._max_moves:
+            await self._client.send({"type": "leave", "table": self._table_id})
+            return False
+
+        turn = self._bot.choose_turn(self._board, self._rng)
+        if turn is None:
+            await self._client.send({"type": "pass", "table": self._table_id})
+            return True
+
+        path = [self._board.get_cell(location) for location in turn]
+
+        self._sent_at = time.perf_counter()
+        await self._client.send({"type": "move", "table": self._table_id,
+                                 "path": path})
+        return True
+
+    def _apply(self, path: List[int]) -> None:
+        """Apply a turn that the server accepted to the local board."""
+
+        positions = self._board.get_all_positions()
+        ped = self._board.get_ped_by_location(positions[path[0]])
+        self._board.relocate_ped(ped, positions[path[-1]])
+
+    async def play(self) -> Optional[int]:
+        """Join the table and play until the game ends.
+        Returns the seat of the winner, or None if the game was abandoned
+        or ended in a draw."""
+
+        await self._client.send({"type": "join", "table": self._table_id})
+
+        while True:
+            message = await self._client.receive()
+            if message is None:
+                return None
+
+            message_type = message.get("type")
+
+            if message_type == "joined":
+                state = message["state"]
+                self._seat = message["seat"]
+                self._board = Board(state["players"], headless=True)
+                self._board.place_occupancy(state["cells"])
+                self._bot = GreedyBot(self._board.playable_colors()[self._seat])
+
+            elif message_type == "started":
+                if not await self._move_if_turn(message["turn"]):
+                    return None
+
+            elif message_type == "moved":
+                if message["seat"] == self._seat:
+                    self.latencies.append(time.perf_counter() - self._sent_at)
+
+                self._apply(message["path"])
+                self._moves += 1
+
+                if message["winner"] is not None:
+                    return message["winner"]
+
+                if not await self._move_if_turn(message["turn"]):
+                    return None
+
+            elif message_type == "passed":
+                if message["draw"]:
+                    return None
+
+                if not await self._move_if_turn(message["turn"]):
+                    return None
+
+            elif message_type in ("abandoned", "left"):
+                return None
+
+            elif message_type == "error":
+                raise RuntimeError(message["message"])
+
+
+class TableResult(NamedTuple):
+    """The outcome of a simulated table."""
+
+    winner: Optional[int]
+    latencies: List[float]
+    sent: int
+    received: int
+
+
+async def simulate_table(host: str, port: int, num_players: int,
+                         max_moves: int, rng: random.Random) -> TableResult:
+    """Create a table and fill it with simulated players, and play until
+    the game ends (the winner is None if the game was abandoned)."""
+
+    clients = [await GameClient.connect(host, port) for _ in range(num_players)]
+
+    try:
+        await clients[0].send({"type": "create", "players": num_players})
+        table_id = (await clients[0].receive())["table"]
+
+        players = [SimulatedPlayer(client, table_id, max_moves,
+                                   random.Random(rng.random()))
+                   for client in clients]
+
+        winners = await asyncio.gather(*(player.play() for player in players))
+
+    finally:
+        for client in clients:
+            await client.close()
+
+    return TableResult(winners[0],
+                       [latency for player in players
+                        for latency in player.latencies],
+                       sum(client.sent for client in clients),
+                       sum(client.received for client in clients))
+
+
+async def simulate(host: str, port: int, num_tables: int, num_players: int,
+                   max_moves: int, seed: Optional[int] = None,
+                   spawn_server: bool = False) -> None:
+    """Play the given number of tables at once and report how it went."""
+
+    server = None
+    if spawn_server:
+        server = await GameServer().serve(host, port)
+
+    # The seed is printed, so the same games can be played again
+    if seed is None:
+        seed = funcs.new_seed()
+
+    rng = random.Random(seed)
+    start = time.perf_counter()
+
+    try:
+        results = await asyncio.gather(
+            *(simulate_table(host, port, num_players, max_moves,
+                             random.Random(rng.random()))
+              for _ in range(num_tables)))
+
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+
+    elapsed = time.perf_counter() - start
+    finished = sum(result.winner is not None for result in results)
+
+    print(f"tables {num_tables}  finished {finished}  "
+          f"abandoned {num_tables - finished}  time {elapsed:.2f}s  seed {seed}")
+
+
+def main() -> None:
+    """Run simulated players against a game server."""
+
+    parser = argparse.ArgumentParser(
+        description="Simulate players on a Chinese Checkers game server.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("-t", "--tables", type=int, default=10)
+    parser.add_argument("-p", "--players", type=int, default=2,
+                        choices=POSSIBLE_NUM_OF_PLAYERS)
+    parser.add_argument("--max-moves", type=int, default=DEFAULT_MAX_MOVES,
+                        help="abandon a game after this many moves at the table")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--spawn-server", action="store_true",
+                        help="run the server in this process")
+    args = parser.parse_args()
+
+    asyncio.run(simulate(args.host, args.port, args.tables, args.players,
+                         args.max_moves, args.seed, args.spawn_server))
+
+
+if __name__ == "__main__":
+    main()
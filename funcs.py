@@ -1,11 +1,18 @@
 import json
+import os
+import random
 import re
-from typing import List, Tuple, Optional
+from datetime import datetime
+from typing import List, Tuple, Optional, Iterator
 
 import webcolors
 
 Coordinates = Tuple[float, float]
 
+# The name of the player of the first record in a log, which holds the
+# details of the game (the number of players and the seed)
+GAME_HEADER_PLAYER = "Game"
+
 
 def convert_to_rgb(color):
     """Convert a color of a certain type to RGB."""
@@ -73,15 +80,9 @@ def make_transparent(color, alpha):
     return make_transparent(convert_to_rgb("#CDAA7D"), alpha)
 
 
-def parse_data_from_file(log_file: str) -> \
-        Tuple[List[str], List[Tuple[Coordinates, Coordinates]], Optional[bool]]:
-    """Parse the board state from the file.
-    Returns a list of tuples representing moves, each tuple contains
-    start and end coordinates of the move."""
-
-    actions = []
-    winner = None
-    moves = []
+def read_log_records(log_file: str) -> Iterator[dict]:
+    """Yield the data of every record of the game in the log file, in order.
+    Each record is a dict with the player, time, from, to and message."""
 
     with open(log_file, "r") as f:
 
@@ -95,34 +96,84 @@ def parse_data_from_file(log_file: str) -> \
                 try:
                     data_list = json.loads(parts[2])
 
-                    # Checking if everything is valid with the file
-                    if len(data_list) == 2 and isinstance(data_list[1], dict):
-                        move_format, data = data_list
+                except json.JSONDecodeError:
+                    print("Invalid log message format:", line)
+                    continue
 
-                        # if there is a move in the data, append it to the moves list
-                        if 'player' in data and 'from' in data and 'to' in data:
-                            if data['from'] != "N/A" and data['to'] != "N/A":
-                                action = "{} moved from: {} , to: {}".format(
-                                    data['player'], data['from'], data['to'])
+                # Checking if everything is valid with the file
+                if len(data_list) == 2 and isinstance(data_list[1], dict):
+                    yield data_list[1]
 
-                                # Converting the string to tuple
-                                data['from'] = eval(data['from'])
-                                data['to'] = eval(data['to'])
 
-                                # Appending the move to the moves list
-                                move = (data['from'], data['to'])
-                                moves.append(move)
+def read_game_header(log_file: str) -> Optional[dict]:
+    """Return the header record of the game in the log file,
+    or None if the log has no header (logs of older games)."""
 
-                            elif 'message' in data and data['message'] != "N/A":
-                                action = "{}: {}".format(data['player'], data['message'])
+    for data in read_log_records(log_file):
+        return data if data.get("player") == GAME_HEADER_PLAYER else None
 
-                                if "Won the game!" in data['message']:
-                                    winner = True
+    return None
 
-                            # Appending the action to the actions list
-                            actions.append(action)
 
-                except json.JSONDecodeError:
-                    print("Invalid log message format:", line)
+def new_seed() -> int:
+    """Return a new seed for the random generator of a game.
+    The seed is recorded, so the game can be played again the same way."""
+
+    return random.SystemRandom().randrange(2 ** 32)
+
+
+def new_log_file_name() -> str:
+    """Create the log file of a new game and return its name. Games that
+    start in the same second get a numbered name, and the file is created
+    only if it doesn't exist, so no two games (in any process) share a log."""
+
+    name = f"game_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    log_file = name + ".txt"
+    number = 1
+
+    while True:
+        try:
+            os.close(os.open(log_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return log_file
+
+        except FileExistsError:
+            number += 1
+            log_file = f"{name}_{number}.txt"
+
+
+def parse_data_from_file(log_file: str) -> \
+        Tuple[List[str], List[Tuple[Coordinates, Coordinates]], Optional[bool]]:
+    """Parse the board state from the file.
+    Returns a list of tuples representing moves, each tuple contains
+    start and end coordinates of the move."""
+
+    actions = []
+    winner = None
+    moves = []
+
+    for data in read_log_records(log_file):
+
+        # if there is a move in the data, append it to the moves list
+        if 'player' in data and 'from' in data and 'to' in data:
+            if data['from'] != "N/A" and data['to'] != "N/A":
+                action = "{} moved from: {} , to: {}".format(
+                    data['player'], data['from'], data['to'])
+
+                # Converting the string to tuple
+                data['from'] = eval(data['from'])
+                data['to'] = eval(data['to'])
+
+                # Appending the move to the moves list
+                move = (data['from'], data['to'])
+                moves.append(move)
+
+            elif 'message' in data and data['message'] != "N/A":
+                action = "{}: {}".format(data['player'], data['message'])
+
+                if "Won the game!" in data['message']:
+                    winner = True
+
+            # Appending the action to the actions list
+            actions.append(action)
 
     return actions, moves, winner
@@ -1,11 +1,11 @@
-from typing import Tuple, List, Union
+from typing import Tuple, List, Dict, Union
 
 import pygame
 
-import funcs
+from archive import read_log_turns
 from board import Board
 from ped import Ped
-from players import Human, Bot
+from players import Human, Bot, GreedyBot
 from pygame_switch import InitGui
 from logic import ChineseCheckersGame
 
@@ -52,14 +52,14 @@ class GameHistory:
 
         self._initialize_players(current_player_index)
 
-    def get_all_moves_from_file(self) -> List[Tuple[Coordinates, Coordinates]]:
-        """Get all moves from the log file.
-        Returns a list of tuples representing moves, each tuple contains
-        start and end coordinates of the move."""
+    def get_all_moves_from_file(self) -> List[List[Coordinates]]:
+        """Get all the turns from the log file.
+        Returns a list of the paths of the turns, each path contains the
+        locations the ped went through, one for every hop."""
 
-        actions, moves, winner = funcs.parse_data_from_file(self._log_file)
+        turns, players = read_log_turns(self._log_file)
 
-        return moves
+        return turns
 
     def _place_peds(self) -> List[Ped]:
         """Place the peds in their starting positions."""
@@ -74,7 +74,7 @@ class GameHistory:
         # of the colored triangles from the gui.
         for color in playable_colors:
             for position in self._gui.get_color_positions_dict()[color]:
-                new_ped = Ped(color, position)
+                new_ped = self._board.create_ped(color, position)
 
                 player_by_color = None
                 try:
@@ -108,16 +108,19 @@ class GameHistory:
             color = list(self._gui.get_color_positions_dict().keys())[
                 self._player_order[j] - 1]
 
-            self._players.append(Bot(color))
+            self._players.append(GreedyBot(color))
+
+        # The player of each color, to find the owner of a ped quickly
+        self._players_by_color: Dict[str, Union[Human, Bot]] = {
+            player.get_color(): player for player in self._players}
 
         self._current_player = self._players[current_player_index]
 
     def _get_player_by_color(self, color: str) -> Union[Human, Bot, None]:
         """Return the player with the given color."""
 
-        for player in self._players:
-            if player.get_color() == color:
-                return player
+        if color in self._players_by_color:
+            return self._players_by_color[color]
 
         raise ValueError("No player with the color", color)
 
@@ -131,8 +134,18 @@ class GameHistory:
         self._board.place_peds(peds)
         moves = self.get_all_moves_from_file()
 
-        for move in moves:
-            self._board.move_ped(self._board.get_ped_by_location(move[FROM]), move[TO])
+        # The moves are replayed at once, without moving the peds smoothly
+        animator = self._board.gui.animator
+        enabled, animator.enabled = animator.enabled, False
+
+        for path in moves:
+            ped = self._board.get_ped_by_location(path[FROM])
+
+            # The hops of a turn are made one by one, like they were played
+            for location in path[TO:]:
+                self._board.move_ped(ped, location)
+
+        animator.enabled = enabled
 
         pygame.mouse.set_cursor(*pygame.cursors.arrow)  # Set the cursor to an arrow
 
@@ -0,0 +1,181 @@
+import atexit
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Iterator, Any, Optional
+
+# Set to any non-empty value to record timings of the game's hot paths
+INSTRUMENT_ENV = "CHINESE_CHECKERS_INSTRUMENT"
+
+# Set to "cprofile" or "pyinstrument" to profile the whole game
+PROFILE_ENV = "CHINESE_CHECKERS_PROFILE"
+
+# The histogram buckets are powers of 2 in microseconds,
+# bucket i counts the calls that took less than 2^i microseconds
+NUM_OF_BUCKETS = 32
+
+# The timings of all the games of the process are saved in the working
+# directory (next to their logs) when the process exits, under this name
+TIMINGS_FILE_NAME = "game_timings_{pid}.json"
+
+
+class PhaseStats:
+    """Counters and a latency histogram of a single phase."""
+
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets: List[int] = [0] * NUM_OF_BUCKETS
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+        bucket = min(int(seconds * 1_000_000).bit_length(), NUM_OF_BUCKETS - 1)
+        self.buckets[bucket] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the stats in a JSON friendly format."""
+
+        histogram = {f"<{2 ** i}us": count
+                     for i, count in enumerate(self.buckets) if count}
+
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total * 1000 / self.count if self.count else 0.0,
+            "max_ms": self.max * 1000,
+            "histogram": histogram
+        }
+
+
+class Instrumentation:
+    """Collecting per-phase timings and counters of the games.
+    When disabled, the timed decorator leaves the functions untouched,
+    so there is no overhead at all. The games of a process may run in
+    threads, so they record under a lock, into the same phases."""
+
+    def __init__(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self._phases: Dict[str, PhaseStats] = {}
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, phase: str, seconds: float) -> None:
+        """Record a single call of the given phase."""
+
+        with self._lock:
+            stats = self._phases.get(phase)
+            if stats is None:
+                stats = self._phases[phase] = PhaseStats()
+
+            stats.add(seconds)
+
+    def count(self, counter: str, amount: int = 1) -> None:
+        """Increase the given counter."""
+
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + amount
+
+    def timed(self, phase: str) -> Callable[[Callable], Callable]:
+        """A decorator that records the time of every call of the
+        decorated function under the given phase."""
+
+        def decorator(func: Callable) -> Callable:
+
+            if not self.enabled:
+                return func
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(phase, time.perf_counter() - start)
+
+            return wrapper
+
+        return decorator
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return all the recorded data in a JSON friendly format."""
+
+        with self._lock:
+            return {
+                "phases": {phase: stats.to_dict()
+                           for phase, stats in sorted(self._phases.items())},
+                "counters": dict(sorted(self._counters.items()))
+            }
+
+    def dump(self, file_name: str) -> None:
+        """Write all the recorded data to the given JSON file."""
+
+        if not self.enabled:
+            return
+
+        with open(file_name, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+@contextlib.contextmanager
+def profiled(file_name: str) -> Iterator[None]:
+    """Profile the code inside the context with the profiler chosen by
+    the environment variable, and save the results under the given name
+    (without a suffix). Does nothing if no profiler is chosen."""
+
+    profiler_name = os.environ.get(PROFILE_ENV, "").lower()
+
+    if profiler_name == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(file_name + ".prof")
+
+    elif profiler_name == "pyinstrument":
+        profiler = _start_pyinstrument()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.stop()
+                with open(file_name + ".html", "w") as f:
+                    f.write(profiler.output_html())
+
+    else:
+        yield
+
+
+def _start_pyinstrument() -> Optional[Any]:
+    """Start a pyinstrument profiler, if pyinstrument is installed."""
+
+    try:
+        import pyinstrument
+
+    except ImportError:
+        print("pyinstrument is not installed, not profiling.")
+        return None
+
+    profiler = pyinstrument.Profiler()
+    profiler.start()
+    return profiler
+
+
+INSTRUMENTATION = Instrumentation(bool(os.environ.get(INSTRUMENT_ENV)))
+
+# The timings of all the games are saved once, when the process exits
+atexit.register(lambda: INSTRUMENTATION.dump(TIMINGS_FILE_NAME.format(pid=os.getpid())))
+
+timed = INSTRUMENTATION.timed
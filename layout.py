@@ -0,0 +1,363 @@
+import functools
+import math
+from typing import Tuple, List, Dict
+
+import funcs
+
+# Constants of the board geometry, shared by the gui and the rules
+FRAME_HEIGHT = 590
+FRAME_WIDTH = 930
+
+BOARD_HEIGHT = 0.95 * FRAME_HEIGHT
+BOARD_WIDTH = 0.6 * FRAME_WIDTH
+
+COLORS = ["Aqua", "green", "grey", "purple", "yellow", "lavenderblush"]
+
+# The rules of the seating, shared by the engine, the batch engine, the
+# bots, the statistics and the tournaments, so they all agree on them
+POSSIBLE_NUM_OF_PLAYERS = [2, 3, 4, 6]
+NUM_OF_TRIANGLES = 6
+
+# The triangles (color indices plus 1) the players sit at, by the number
+# of players, in the order they play
+PLAYER_ORDER = [[4, 1, 3, 6, 2, 5],
+                [4, 1, 3, 6],
+                [4, 2, 6],
+                [4, 1]]
+
+# A game of bots only is a draw when the same position (with the same
+# player to move) comes up this many times, because the bots will repeat
+# it forever
+REPETITION_LIMIT = 3
+
+HEXAGRAM_SIZE_RATIO = 0.90  # The ratio of the hexagram size to the board
+CELL_RADIUS = 9.3  # The radius of the cells in the board
+PED_RADIUS = 6.7  # The radius of the peds in the board
+
+# The distance between the centers of adjacent cells in
+# the center of the board. 15 is the padding between the cells
+CELLS_DIST = 2 * CELL_RADIUS + 15
+
+# The rules look for neighbors in a box around a cell, and for the
+# landing cell of a hop around the point mirrored over the hopped cell,
+# because the placement of the cells is not exact
+NEIGHBOR_DIST_RATIO = 1.2
+HOP_OFFSET = 5
+
+Coordinates = Tuple[float, float]
+
+X_COORD = 0
+Y_COORD = 1
+
+
+class Viewport:
+    """The mapping of the board coordinates (the positions of the cells,
+    laid out in a frame of FRAME_WIDTH x FRAME_HEIGHT) to the pixels of a
+    window of any size. The frame is scaled to fit the window and centered
+    in it, so the rules never see the size of the window."""
+
+    __slots__ = ("width", "height", "scale", "offset_x", "offset_y")
+
+    def __init__(self, width: int, height: int) -> None:
+        self.width = width
+        self.height = height
+        self.scale = min(width / FRAME_WIDTH, height / FRAME_HEIGHT)
+
+        self.offset_x = (width - FRAME_WIDTH * self.scale) / 2
+        self.offset_y = (height - FRAME_HEIGHT * self.scale) / 2
+
+    def to_screen(self, point: Coordinates) -> Coordinates:
+        """Return the pixel of the given board point."""
+
+        return (self.offset_x + point[X_COORD] * self.scale,
+                self.offset_y + point[Y_COORD] * self.scale)
+
+    def to_board(self, point: Tuple[float, float]) -> Coordinates:
+        """Return the board point of the given pixel."""
+
+        return ((point[X_COORD] - self.offset_x) / self.scale,
+                (point[Y_COORD] - self.offset_y) / self.scale)
+
+    def length(self, length: float) -> float:
+        """Return the length in pixels of the given board length."""
+
+        return length * self.scale
+
+
+def color_names() -> List[str]:
+    """Return the names of the colors of the six triangles, in the order
+    of the triangles (the same names the gui uses as keys)."""
+
+    return [funcs.rgba_to_name(funcs.convert_to_rgb(color)) for color in COLORS]
+
+
+def hexagram_points() -> List[Coordinates]:
+    """Return the six outer points of the hexagram, clockwise from the top."""
+
+    cos_30 = math.cos(math.pi / 6)
+    sin_30 = math.sin(math.pi / 6)
+
+    # The hexagram is drawn at the center of the frame
+    center_y = FRAME_HEIGHT / 2
+    center_x = FRAME_WIDTH / 2
+
+    # The size of the hexagram is the distance from its center to
+    # any of its outer points.
+    hexagram_size = (min(BOARD_WIDTH, BOARD_HEIGHT) * HEXAGRAM_SIZE_RATIO) / 2
+
+    return [
+        (center_x, center_y - hexagram_size),  # Top
+
+        # Top-right
+        (center_x + hexagram_size * cos_30, center_y - hexagram_size * sin_30),
+
+        # Bottom-right
+        (center_x + hexagram_size * cos_30, center_y + hexagram_size * sin_30),
+
+        (center_x, center_y + hexagram_size),  # Bottom
+
+        # Bottom-left
+        (center_x - hexagram_size * cos_30, center_y + hexagram_size * sin_30),
+
+        # Top-left
+        (center_x - hexagram_size * cos_30, center_y - hexagram_size * sin_30)
+    ]
+
+
+def rotate_point(point: Coordinates, center_x: float, center_y: float,
+                 angle: int) -> Coordinates:
+    """Rotate the point around the given center by the given angle (degrees)."""
+
+    # Normalizing the angle to the range [0, 360) degrees (ensuring only)
+    # and then converting the angle to radians
+    angle_rad = math.radians(angle % 360)
+
+    # Translating the point so that the origin coords
+    # are at the center of the triangle
+    new_x = point[X_COORD] - center_x
+    new_y = point[Y_COORD] - center_y
+
+    # Rotating the point according to the formula for
+    # rotating a point around the origin
+    # [ x′ = x⋅cos(θ) − y⋅sin(θ) , y′ = x⋅sin(θ) + y⋅cos(θ) ]
+    rotated_x = new_x * math.cos(angle_rad) - new_y * math.sin(angle_rad)
+    rotated_y = new_x * math.sin(angle_rad) + new_y * math.cos(angle_rad)
+
+    # Translating the point back to its original position
+    new_x = rotated_x + center_x
+    new_y = rotated_y + center_y
+
+    return new_x, new_y
+
+
+def outer_cells_positions(point: Coordinates, angle: int,
+                          adjust: bool) -> List[Coordinates]:
+    """Return the positions of the 10 cells of the triangle at the given
+    point of the hexagram, rotated by the given angle."""
+
+    rows = 4
+    cells_dist = CELLS_DIST
+    positions = []
+
+    for i in range(rows):
+
+        # number of cells in the current row
+        cells_in_row = i + 1
+
+        # Calculate the y coordinate of the current row
+        y = point[Y_COORD] + i * cells_dist - 2  # 4 is the padding between the rows
+
+        for j in range(cells_in_row):
+
+            # Calculate the x coordinate of the current cell
+            # all the ifs below is for adjustments only
+            x = (point[X_COORD] - (cells_in_row - 1) *
+                 (cells_dist + 5) / 2 + j * (cells_dist + 3))
+
+            if j < cells_in_row // 2:
+                x = (point[X_COORD] - (cells_in_row - 1) *
+                     (cells_dist + 2) / 2 + j * (cells_dist + 3))
+
+            elif j == cells_in_row // 2 and j % 2 != 0:
+                x = (point[X_COORD] - (cells_in_row - 1) *
+                     (cells_dist + 4) / 2 + j * (cells_dist + 3))
+
+            elif adjust:
+                x = (point[X_COORD] - (cells_in_row - 1) *
+                     (cells_dist + 4) / 2 + j * (cells_dist + 3))
+
+            # Rotate the point
+            positions.append(rotate_point((x, y), point[X_COORD],
+                                          point[Y_COORD], angle))
+
+    return positions
+
+
+def center_cells_positions() -> List[Coordinates]:
+    """Return the positions of the 61 cells of the center hexagon."""
+
+    # The center of the hexagon that the center cells are forming is
+    # also the center of the screen
+    center_x = FRAME_WIDTH / 2
+    center_y = FRAME_HEIGHT / 2
+
+    # The number of cells on each side of the hexagon
+    rows = 9
+    positions = []
+
+    for i in range(rows):
+
+        # The number of cells in the current row
+        cells_in_row = 5 + i
+        if i > rows // 2:
+            cells_in_row = 5 + rows - i - 1
+
+        # Calculate the y coordinate of the current row
+        # (We deduct from the dest to make the hexagon more proportional)
+        y = (center_y - (rows - 1) * CELLS_DIST / 2 +
+             i * (CELLS_DIST - 3) + 12)
+
+        for j in range(cells_in_row):
+
+            # Calculate the x coordinate of the current cell.
+            x = (center_x - (cells_in_row - 1) * CELLS_DIST / 2 +
+                 j * CELLS_DIST)
+
+            positions.append((x, y))
+
+    return positions
+
+
+def triangles_positions() -> Dict[str, List[Coordinates]]:
+    """Return the positions of the cells of the six triangles, by the
+    color of the triangle, clockwise from the top triangle."""
+
+    rotation_angle = 60
+    color_positions: Dict[str, List[Coordinates]] = {}
+
+    for q, (point, color) in enumerate(zip(hexagram_points(), color_names())):
+
+        # The triangles at the bottom right and top left are adjusted a bit
+        adjust = q == 2 or q == 5
+        color_positions[color] = outer_cells_positions(point, rotation_angle * q,
+                                                       adjust)
+
+    return color_positions
+
+
+def all_positions() -> List[Coordinates]:
+    """Return the positions of all the cells: the triangles by their order,
+    then the center. The index of a position is the index of its cell."""
+
+    positions = []
+    for triangle in triangles_positions().values():
+        positions.extend(triangle)
+
+    positions.extend(center_cells_positions())
+
+    return positions
+
+
+def neighbor_table(positions: List[Coordinates]) -> List[List[int]]:
+    """Return the indices of the neighbor cells of every cell,
+    found the same way the board finds them."""
+
+    max_dist = CELLS_DIST * NEIGHBOR_DIST_RATIO
+    neighbors = []
+
+    for x, y in positions:
+        neighbors.append([cell for cell, (other_x, other_y) in enumerate(positions)
+                          if (other_x, other_y) != (x, y) and
+                          abs(other_x - x) <= max_dist and
+                          abs(other_y - y) <= max_dist])
+
+    return neighbors
+
+
+def hop_table(positions: List[Coordinates],
+              neighbors: List[List[int]]) -> List[List[int]]:
+    """Return, for every cell and each of its neighbors (in the order of
+    the neighbor table), the cell a ped lands on when hopping over the
+    neighbor, or -1 if the hop leaves the board."""
+
+    hops = []
+
+    for cell, cell_neighbors in enumerate(neighbors):
+        x, y = positions[cell]
+        landings = []
+
+        for neighbor in cell_neighbors:
+
+            # The landing point is the cell mirrored over the neighbor
+            new_x = 2 * positions[neighbor][X_COORD] - x
+            new_y = 2 * positions[neighbor][Y_COORD] - y
+
+            landing = -1
+            for other, (other_x, other_y) in enumerate(positions):
+                if (new_x - HOP_OFFSET <= other_x <= new_x + HOP_OFFSET and
+                        new_y - HOP_OFFSET <= other_y <= new_y + HOP_OFFSET):
+                    landing = other
+                    break
+
+            landings.append(landing)
+
+        hops.append(landings)
+
+    return hops
+
+
+@functools.lru_cache(maxsize=None)
+def cell_tables() -> Tuple[Tuple[Coordinates, ...], Tuple[Tuple[int, ...], ...],
+                           Tuple[Tuple[int, ...], ...]]:
+    """Return the positions of all the cells, the neighbor table and the
+    hop table. They are computed once and shared, so they are immutable."""
+
+    positions = all_positions()
+    neighbors = neighbor_table(positions)
+    hops = hop_table(positions, neighbors)
+
+    return (tuple(positions),
+            tuple(tuple(cell_neighbors) for cell_neighbors in neighbors),
+            tuple(tuple(landings) for landings in hops))
+
+
+@functools.lru_cache(maxsize=None)
+def target_distances() -> Tuple[Tuple[float, ...], ...]:
+    """Return, for the peds of each color (triangle), how far every cell is
+    from the target (the opposite triangle): the distance to the far corner
+    of the target. Unlike the distance along the line between the homes,
+    it doesn't let peds settle in the corners of the other triangles."""
+
+    triangles = list(triangles_positions().values())
+    positions = all_positions()
+    distances = []
+
+    for home in range(len(triangles)):
+        target_positions = triangles[(home + len(triangles) // 2) % len(triangles)]
+
+        # The first cell of a triangle is its outer corner
+        target_x, target_y = target_positions[0]
+
+        distances.append(tuple(math.hypot(target_x - x, target_y - y)
+                               for x, y in positions))
+
+    return tuple(distances)
+
+
+@functools.lru_cache(maxsize=None)
+def move_masks() -> Tuple[int, ...]:
+    """Return, for every cell, a bit mask of the cells its single moves
+    depend on: its neighbors and the cells a ped lands on when hopping.
+    Bit i of a mask stands for cell i."""
+
+    positions, neighbors, hops = cell_tables()
+    masks = []
+
+    for cell in range(len(positions)):
+        mask = 0
+        for other in set(neighbors[cell]) | set(hops[cell]) - {-1}:
+            mask |= 1 << other
+
+        masks.append(mask)
+
+    return tuple(masks)
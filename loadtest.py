@@ -0,0 +1,218 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional
+
+from client import simulate_table
+from layout import POSSIBLE_NUM_OF_PLAYERS
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8766
+
+DEFAULT_LEVELS = [10, 50, 100, 200]
+
+# How often the memory of the server is sampled, in seconds
+MEMORY_SAMPLE_INTERVAL = 0.05
+
+SERVER_START_TIMEOUT = 10.0
+
+
+def start_server(host: str, port: int) -> subprocess.Popen:
+    """Start a game server in a separate process, and wait until it
+    accepts connections."""
+
+    server_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               "server.py")
+    process = subprocess.Popen([sys.executable, server_path,
+                                "--host", host, "--port", str(port)],
+                               stdout=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return process
+
+        except OSError:
+            time.sleep(0.05)
+
+    process.kill()
+    raise RuntimeError("The game server didn't start")
+
+
+def resident_memory(pid: int) -> int:
+    """Return the resident memory of the process in bytes (Linux only)."""
+
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+
+    return 0
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """Return the given percentile of the values (nearest rank)."""
+
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(percent / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run_clients(host: str, port: int, num_tables: int, num_players: int,
+                max_moves: int, seed: int) -> Dict[str, Any]:
+    """Play the given number of tables at once from this process.
+    Runs in a worker process of the load test."""
+
+    async def play_tables():
+        rng = random.Random(seed)
+        return await asyncio.gather(
+            *(simulate_table(host, port, num_players, max_moves,
+                             random.Random(rng.random()))
+              for _ in range(num_tables)))
+
+    results = asyncio.run(play_tables())
+
+    return {"latencies": [latency for result in results
+                          for latency in result.latencies],
+            "sent": sum(result.sent for result in results),
+            "received": sum(result.received for result in results)}
+
+
+async def run_level(executor: ProcessPoolExecutor, server_pid: Optional[int],
+                    host: str, port: int, num_tables: int, num_players: int,
+                    max_moves: int, num_processes: int,
+                    seed: int) -> Dict[str, Any]:
+    """Run the given number of concurrent tables, spread over the client
+    processes, and measure the latencies, the messages and the peak
+    memory of the server (if its process is known)."""
+
+    loop = asyncio.get_running_loop()
+
+    # Splitting the tables between the client processes
+    shares = [num_tables // num_processes + (i < num_tables % num_processes)
+              for i in range(num_processes)]
+
+    start = time.perf_counter()
+    futures = [loop.run_in_executor(executor, run_clients, host, port, share,
+                                    num_players, max_moves, seed + i)
+               for i, share in enumerate(shares) if share]
+
+    # Sample the memory of the server until all the tables are done
+    peak_memory = 0
+    done = asyncio.gather(*futures)
+    while not done.done():
+        if server_pid is not None:
+            peak_memory = max(peak_memory, resident_memory(server_pid))
+        await asyncio.wait([done], timeout=MEMORY_SAMPLE_INTERVAL)
+
+    results = done.result()
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for result in results for latency in result["latencies"]]
+    messages = sum(result["sent"] + result["received"] for result in results)
+
+    return {"tables": num_tables,
+            "moves": len(latencies),
+            "time_s": elapsed,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "moves_per_s": len(latencies) / elapsed,
+            "messages_per_s": messages / elapsed,
+            "peak_memory": peak_memory}
+
+
+async def run_load_test(host: str, port: int, levels: List[int],
+                        num_players: int, max_moves: int, num_processes: int,
+                        seed: int, spawn_server: bool) -> List[Dict[str, Any]]:
+    """Run the load test at every concurrency level, one after the other."""
+
+    server = start_server(host, port) if spawn_server else None
+    server_pid = server.pid if server is not None else None
+
+    try:
+        baseline = resident_memory(server_pid) if server_pid is not None else 0
+
+        rows = []
+        with ProcessPoolExecutor(num_processes) as executor:
+            for num_tables in levels:
+                row = await run_level(executor, server_pid,
+                                      host, port, num_tables, num_players,
+                                      max_moves, num_processes, seed)
+
+                # The memory is only meaningful for a server we started
+                if server_pid is not None:
+                    row["memory_per_table_kib"] = \
+                        max(row["peak_memory"] - baseline, 0) / num_tables / 1024
+                row.pop("peak_memory")
+
+                rows.append(row)
+                print_row(row)
+
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    return rows
+
+
+def print_row(row: Dict[str, Any]) -> None:
+    """Print the results of a single concurrency level."""
+
+    memory = row.get("memory_per_table_kib")
+    memory_text = f"{memory:8.1f} KiB/table" if memory is not None else ""
+
+    print(f"tables {row['tables']:>5}  moves {row['moves']:>7}  "
+          f"p50 {row['p50_ms']:7.2f}ms  p99 {row['p99_ms']:7.2f}ms  "
+          f"{row['moves_per_s']:8.0f} moves/s  "
+          f"{row['messages_per_s']:8.0f} msgs/s  {memory_text}")
+
+
+def main() -> None:
+    """Run the load test from the command line."""
+
+    parser = argparse.ArgumentParser(
+        description="Load test a Chinese Checkers game server with "
+                    "simulated bot players.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("-t", "--tables", type=int, nargs="+",
+                        default=DEFAULT_LEVELS,
+                        help="the numbers of concurrent tables to test")
+    parser.add_argument("-p", "--players", type=int, default=2,
+                        choices=POSSIBLE_NUM_OF_PLAYERS)
+    parser.add_argument("--max-moves", type=int, default=100,
+                        help="the number of moves to play at every table")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="the number of client processes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-server", action="store_true",
+                        help="use a server that is already running "
+                             "(the memory isn't measured)")
+    parser.add_argument("--json", default=None,
+                        help="a file to save the results to")
+    args = parser.parse_args()
+
+    rows = asyncio.run(run_load_test(args.host, args.port, args.tables,
+                                     args.players, args.max_moves,
+                                     args.processes, args.seed,
+                                     not args.no_server))
+
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,23 @@
+import functools
 import json
-import logging
 import sys
 import time
 import random
-from datetime import datetime
-from typing import Tuple, List, Union, Optional, Set
+from typing import Tuple, List, Dict, Union, Optional, Set
 
 import pygame
 
 import funcs
+import layout
+from layout import PLAYER_ORDER, REPETITION_LIMIT
 from board import Board
+from instrumentation import timed, profiled
+from logwriter import GameLog, LOG_WRITER
 from ped import Ped
-from players import Human, Bot
-from pygame_switch import InitGui
+from players import Human, Bot, GreedyBot, player_kind, new_player
+from pygame_switch import InitGui, HeadlessGui
+from snapshot import GameSnapshot, check_seed, snapshot_file_name
+from spectator import SpectatorHub, Subscription
 
 X_COORD = 0
 Y_COORD = 1
@@ -28,10 +33,21 @@ Coordinates = Tuple[float, float]
 PLAYER_TURNS = 1
 ANOTHER_TURN = 2
 
-PLAYER_ORDER = [[4, 1, 3, 6, 2, 5],
-                [4, 1, 3, 6],
-                [4, 2, 6],
-                [4, 1]]
+# The ways a game ends in a draw, as said in the messages and the log
+DRAW_BY_REPETITION = "by repetition"
+DRAW_BY_PASSES = "because nobody can move"
+
+# The key that makes the moves and the pauses of the game faster, or slow
+# again (the "f" key)
+FAST_FORWARD_KEY = pygame.K_f
+
+
+@functools.lru_cache(maxsize=1)
+def _log_time(second: int) -> str:
+    """Return the time of the given second as written in the logs. A turn
+    logs a few records in the same second, so it's formatted once."""
+
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(second))
 
 
 class ChineseCheckersGame:
@@ -40,11 +56,32 @@ class ChineseCheckersGame:
                  board: Board = None, gui: InitGui = None,
                  players: List[Union[Human, Bot]] = None,
                  current_player: Union[Human, Bot] = None,
-                 log_file=None) -> None:
+                 log_file=None, seed: Optional[int] = None,
+                 snapshot: Optional[GameSnapshot] = None,
+                 headless: bool = False) -> None:
+        """Create a new game, or resume a game from its snapshot, or from
+        its board, players and log file. The bots of the game choose their
+        turns with a random generator of the given seed (a new one if not
+        given), which is recorded in the log, so the game can be played
+        again the same way.
+        A headless game (of bots only) has no display. Every game owns its
+        board, gui, random generator and log, so many headless games
+        can be played together in a process, in threads or tasks."""
 
         from board import Board  # local import
 
-        if board is not None and gui is not None and \
+        self._headless = headless
+        if headless and (snapshot.real_players() if snapshot is not None
+                         else num_real_players):
+            raise ValueError("A game without a display can't have real players")
+
+        if seed is not None:
+            check_seed(seed)
+
+        if snapshot is not None:
+            self._restore(snapshot)
+
+        elif board is not None and gui is not None and \
                 players is not None and current_player is not None:
 
             self._board = board
@@ -54,7 +91,40 @@ class ChineseCheckersGame:
             self._players = players
             self._current_player = current_player
 
+            # The player of each color, to find the owner of a ped quickly
+            self._players_by_color: Dict[str, Union[Human, Bot]] = {
+                player.get_color(): player for player in players}
+
             self.log_file_name = log_file
+            self._log = GameLog(log_file)
+
+            # The random generator of the bots continues from the seed of
+            # the game and the number of moves made, so resuming a game at
+            # the same move is reproducible too
+            if seed is None:
+                header = funcs.read_game_header(log_file)
+                seed = header["seed"] if header is not None and "seed" in header \
+                    else funcs.new_seed()
+
+            self._seed = seed
+            num_moves = len(funcs.parse_data_from_file(log_file)[1])
+            self._rng = random.Random(f"{seed}:{num_moves}")
+
+            # The hops of a turn are separate moves in the log, so this is
+            # the number of turns only if there were no hop chains
+            self._turns = num_moves
+
+            # The rest of the turn the current bot planned
+            self._bot_path: List[Coordinates] = []
+
+            # The number of times every position came up, by its hash
+            self._positions: Dict[int, int] = {}
+            self._draw = False
+            self._draw_reason = ""
+            self._winner: Optional[int] = None  # The seat of the winner
+
+            # The number of players that passed in a row, having no legal turn
+            self._passes = 0
 
             # Showing a message that indicates the current player
             self._show_message(f"{self._is_bot(self._current_player)} "
@@ -64,47 +134,169 @@ class ChineseCheckersGame:
         else:
 
             # self._game_history = GameHistory(LOG_FILE, Board(num_players), num_players)
-            self._board = Board(num_players)  # Initialize the board
+            self._board = Board(num_players, headless)  # Initialize the board
 
             for order in PLAYER_ORDER:
                 if len(order) == num_players:
                     self._player_order = order
                     break
 
-            self._gui = self._board.gui  # Initialize the GUI
+            # Initialize the GUI
+            self._gui = HeadlessGui() if headless else self._board.gui
 
             self._players: List[Union[Human, Bot]] = []  # Initialize the players
+            self._players_by_color: Dict[str, Union[Human, Bot]] = {}
             self._num_players = num_players
             self._num_real_players = num_real_players
 
             self._current_player = None  # Initialize the current player
+
+            # The random generator of the bots, and the rest of the turn
+            # the current bot planned
+            self._seed = seed if seed is not None else funcs.new_seed()
+            self._rng = random.Random(self._seed)
+            self._bot_path: List[Coordinates] = []
+            self._turns = 0
+
+            # The number of times every position came up, by its hash
+            self._positions: Dict[int, int] = {}
+            self._draw = False
+            self._draw_reason = ""
+            self._winner: Optional[int] = None  # The seat of the winner
+
+            # The number of players that passed in a row, having no legal turn
+            self._passes = 0
+
             self._initialize_players()  # Initialize the players
             self._create_and_place_peds()  # Place the peds in their starting positions
 
-            # Initializing the log file.
-            self.log_file_name = f"game_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}" \
-                                 f".txt"
-            logging.basicConfig(filename=self.log_file_name, level=logging.INFO)
+            # Initializing the log file, written off the thread of the game
+            self.log_file_name = funcs.new_log_file_name()
+            self._log = GameLog(self.log_file_name)
+
+            # The header of the log, with what it takes to replay the game
+            self._log_game_data(funcs.GAME_HEADER_PLAYER,
+                                message=f"Started a game of {num_players} players "
+                                        f"with seed {self._seed}.",
+                                seed=self._seed, players=num_players,
+                                real_players=num_real_players)
+
+        # The spectators of the game get every move made from here on
+        self._spectators = SpectatorHub(self._board.get_occupancy())
+
+        # The game is saved after every turn, so it can be resumed at once
+        self.snapshot_file_name = snapshot_file_name(self.log_file_name)
+        self._save_snapshot()
+
+    def _restore(self, snapshot: GameSnapshot) -> None:
+        """Set up the game as it was when the snapshot was taken: the board,
+        the players, the player to move and the random generator of the
+        bots. The moves of the game are not replayed, and its log is only
+        added to (a new log is started if the snapshot has none)."""
+
+        self._board = Board(snapshot.players, self._headless)
+        self._gui = HeadlessGui() if self._headless else self._board.gui
+        self._num_players = snapshot.players
+        self._num_real_players = snapshot.real_players()
+
+        for order in PLAYER_ORDER:
+            if len(order) == snapshot.players:
+                self._player_order = order
+                break
+
+        # The players by their seats, of their kinds and with the colors
+        # the seats play with (snapshots without the kinds have greedy bots)
+        self._players: List[Union[Human, Bot]] = [
+            new_player(snapshot.kinds[seat], color) if snapshot.kinds else
+            GreedyBot(color) if snapshot.is_bot(seat) else Human(color)
+            for seat, color in enumerate(self._board.playable_colors())]
+        self._players_by_color: Dict[str, Union[Human, Bot]] = {
+            player.get_color(): player for player in self._players}
+        self._current_player = self._players[snapshot.to_move]
+
+        # Place the peds where they were, and show them
+        for ped in self._board.place_occupancy(list(snapshot.occupancy)):
+            self.get_player_by_color(ped.get_color()).add_ped(ped)
+
+        if not self._headless:
+            self._gui.show_peds(self._board.get_all_peds())
+
+        self._seed = snapshot.seed
+        self._rng = random.Random()
+        self._rng.setstate(snapshot.rng_state)
+        self._bot_path: List[Coordinates] = []
+        self._turns = snapshot.turns
+
+        # The number of times every position came up, by its hash
+        self._positions: Dict[int, int] = {}
+        self._draw = False
+        self._draw_reason = ""
+        self._winner: Optional[int] = None
+        self._passes = 0
+
+        self.log_file_name = snapshot.log_file or funcs.new_log_file_name()
+        self._log = GameLog(self.log_file_name)
+
+        # A new log starts with this record as its header
+        self._log_game_data(funcs.GAME_HEADER_PLAYER,
+                            message=f"Resumed a game of {snapshot.players} players "
+                                    f"after {snapshot.turns} turns.",
+                            seed=self._seed, players=snapshot.players,
+                            real_players=self._num_real_players,
+                            resumed_at=snapshot.turns)
+
+        # Showing a message that indicates the current player
+        self._show_message(f"{self._is_bot(self._current_player)} "
+                           f"{snapshot.to_move + 1}'s turn", PLAYER_TURNS)
+
+    def get_snapshot(self) -> GameSnapshot:
+        """Return the snapshot of the game as it is now. It's taken between
+        turns, so the player to move starts a whole turn when resuming."""
+
+        bots = 0
+        for seat, player in enumerate(self._players):
+            if player.is_bot():
+                bots |= 1 << seat
+
+        return GameSnapshot(self._num_players,
+                            self._players.index(self._current_player), bots,
+                            self._turns, self._seed, self._rng.getstate(),
+                            tuple(self._board.get_occupancy()), self.log_file_name,
+                            tuple(player_kind(player) for player in self._players))
+
+    def get_winner(self) -> Optional[int]:
+        """Return the seat of the winner, or None if nobody won (yet)."""
+
+        return self._winner
+
+    def is_draw(self) -> bool:
+        return self._draw
+
+    @timed("snapshot.save")
+    def _save_snapshot(self) -> None:
+        """Queue saving the snapshot of the game. The log writer saves it
+        after the records of the turn, so the game doesn't wait for it."""
+
+        LOG_WRITER.replace(self.snapshot_file_name, self.get_snapshot().to_bytes())
 
     def _initialize_players(self) -> None:
         """Initialize the players of the game."""
 
-        for i in range(self._num_real_players):
+        # The colors of the players, as ordered in the player_order list
+        colors = self._board.playable_colors()
 
-            # Create a player with the color as ordered in the player_order list.
-            # num-1 because the list is we're starting the player order from 1
-            color = list(self._gui.get_color_positions_dict().keys())[
-                self._player_order[i] - 1]
+        for i in range(self._num_real_players):
 
-            self._players.append(Human(color))
+            # Create a player with the color of its seat
+            self._players.append(Human(colors[i]))
 
         for j in range(self._num_real_players, self._num_players):
-            # Create a bot player with the color as ordered in the player_order list.
-            # num-1 because the list is we're starting the player order from 1
-            color = list(self._gui.get_color_positions_dict().keys())[
-                self._player_order[j] - 1]
+            # Create a bot player with the color of its seat
+            self._players.append(GreedyBot(colors[j]))
 
-            self._players.append(Bot(color))
+        # The player of each color, to find the owner of a ped quickly
+        for player in self._players:
+            self._players_by_color[player.get_color()] = player
 
         self._current_player = self._players[0]
 
@@ -136,9 +328,8 @@ class ChineseCheckersGame:
     def get_player_by_color(self, color: str) -> Union[Human, Bot, None]:
         """Return the player with the given color."""
 
-        for player in self._players:
-            if player.get_color() == color:
-                return player
+        if color in self._players_by_color:
+            return self._players_by_color[color]
 
         raise ValueError("No player with the color", color)
 
@@ -149,13 +340,14 @@ class ChineseCheckersGame:
 
         # Getting the colors of the players in the order they play,
         # taking into account the number of players
-        playable_colors = self._gui.playable_colors()
+        playable_colors = self._board.playable_colors()
 
         # Create the peds of the game by retrieving the positions
-        # of the colored triangles from the gui.
+        # of the colored triangles.
+        color_positions = layout.triangles_positions()
         for color in playable_colors:
-            for position in self._gui.get_color_positions_dict()[color]:
-                new_ped = Ped(color, position)
+            for position in color_positions[color]:
+                new_ped = self._board.create_ped(color, position)
 
                 try:
                     # Assign the ped to the player with the same color
@@ -171,6 +363,7 @@ class ChineseCheckersGame:
 
         return peds
 
+    @timed("game.handle_events")
     def handle_events(self) -> Optional[str]:
         """Handle the events of the game."""
 
@@ -179,6 +372,11 @@ class ChineseCheckersGame:
             if event.type == pygame.QUIT:
                 raise SystemExit
 
+            elif event.type == pygame.VIDEORESIZE:
+                self._gui.resize(event.w, event.h)
+
+            elif event.type == pygame.KEYDOWN and event.key == FAST_FORWARD_KEY:
+                self._gui.animator.toggle_fast_forward()
 
             elif (event.type == pygame.MOUSEBUTTONDOWN or
                   self._is_bot(self._current_player) == "Bot"):
@@ -187,12 +385,10 @@ class ChineseCheckersGame:
                 if self._is_bot(self._current_player) == "Bot" or event.button == 1:
                     return self._start_player_turn()
 
+    @timed("game.start_player_turn")
     def _start_player_turn(self) -> Optional[str]:
         """Start the turn of the current player."""
 
-        # Get the position of the mouse
-        pos = pygame.mouse.get_pos()
-
         # log the start of the turn
         self._log_game_data(
             (self._is_bot(self._current_player) + (" " +
@@ -203,14 +399,26 @@ class ChineseCheckersGame:
         locations = None
         is_hop = False
         if self._is_bot(self._current_player) == "Bot":
-            locations, is_hop = self._handle_bot_turn()
+
+            # The bot plans its whole turn, and then makes it move by move
+            turn = self._current_player.choose_turn(self._board, self._rng)
+            if turn is None:
+                return self._pass_turn()
+
+            locations, is_hop = self._handle_bot_turn(turn)
 
         if self._is_bot(self._current_player) == "Human":
+
+            # Get the position of the mouse, on the board
+            pos = self._gui.to_board(pygame.mouse.get_pos())
+
             # Returns True if a player made a turn successfully,
             # False otherwise
             locations, is_hop = self._handle_human_turn(pos)
 
         if locations is not None:
+            self._turns += 1
+            self._passes = 0
 
             # log the move of the player
             self._log_game_data(
@@ -222,8 +430,7 @@ class ChineseCheckersGame:
             # Check if the any player won the game
             won_index = self._check_winner()
             if won_index is not None:
-                return f"{self._is_bot(self._current_player)} " \
-                       + str(won_index) + " won the game!"
+                return self._win(won_index)
 
             # If no player won the game, continue the game
 
@@ -254,10 +461,22 @@ class ChineseCheckersGame:
                     current_location = new_hop_location
                     visited.add(old_location)
 
+                    # The hop may be the one that wins the game
+                    won_index = self._check_winner()
+                    if won_index is not None:
+                        return self._win(won_index)
+
                     new_hop_location = self._check_another_turn(
                         visited, current_location)
 
             self._change_player()  # change the player
+            self._save_snapshot()
+
+            # Bots can repeat the same turns forever,
+            # so such a game ends in a draw
+            if self._is_repeating():
+                return self._end_in_draw(DRAW_BY_REPETITION)
+
             return won_index
 
         # If a player failed to make a turn, let him try again
@@ -266,16 +485,75 @@ class ChineseCheckersGame:
         else:
             self._delete_last_log_message()
 
-    def _handle_bot_turn(self) -> Tuple[Optional[Tuple[Coordinates, Coordinates]], bool]:
-        """Handle the turn of the bot."""
+    def _win(self, won_index: int) -> str:
+        """Record the winner (by the index _check_winner returned), and
+        return the message about it."""
+
+        self._winner = won_index - 1
+
+        return f"{self._is_bot(self._players[self._winner])} " \
+               + str(won_index) + " won the game!"
+
+    def _pass_turn(self) -> Optional[str]:
+        """The current player (a bot) has no legal turn, so it passes, and
+        the next player plays. If all the players passed one after the
+        other, nobody can move, and the game ends in a draw."""
+
+        self._log_game_data(
+            (self._is_bot(self._current_player) + (" " +
+                                                   str(self._players.index(
+                                                       self._current_player) + 1))),
+            message="passed, having no legal turn.")
+
+        self._passes += 1
+        if self._passes >= len(self._players):
+            return self._end_in_draw(DRAW_BY_PASSES)
+
+        self._change_player()
+        self._save_snapshot()
+
+        return None
+
+    def _end_in_draw(self, reason: str) -> str:
+        """End the game in a draw, and return the message about it."""
+
+        self._draw = True
+        self._draw_reason = reason
+
+        return f"The game is a draw {reason}."
+
+    def play_turn(self) -> Optional[str]:
+        """Play the turn of the current player (a bot) at once, without
+        waiting for an event. Returns what handle_events returns."""
+
+        return self._start_player_turn()
+
+    def _is_repeating(self) -> bool:
+        """Count the current position (with the player to move), and return
+        True if all the players are bots and it came up too many times."""
 
-        chosen_ped = random.choice(self._current_player.get_peds())
+        if not all(player.is_bot() for player in self._players):
+            return False
+
+        position = self._board.zobrist_hash(self._players.index(self._current_player))
+        self._positions[position] = self._positions.get(position, 0) + 1
+
+        return self._positions[position] >= REPETITION_LIMIT
+
+    def _handle_bot_turn(self, turn: List[Coordinates]) -> \
+            Tuple[Optional[Tuple[Coordinates, Coordinates]], bool]:
+        """Handle the turn of the bot, given as the path of locations the
+        ped goes through."""
+
+        chosen_ped = self._board.get_ped_by_location(turn[0])
         ped_position = chosen_ped.get_location()
+        self._bot_path = turn[1:]
+
         # if we're here, it means that we are in a turn state
         new_location, is_hop = self._turn(chosen_ped)
 
         # Update the display
-        pygame.display.flip()
+        self._gui.flip()
 
         if new_location is not None:  # if the move was successful
 
@@ -291,7 +569,7 @@ class ChineseCheckersGame:
             # so do the turn from the beginning
             return None, False
 
-    def _handle_human_turn(self, mouse_pos: Tuple[int, int]) -> \
+    def _handle_human_turn(self, mouse_pos: Coordinates) -> \
             Tuple[Optional[Tuple[Coordinates, Coordinates]], bool]:
         """Handle the click of the player.
         Returns the old and new locations if the player made a turn
@@ -317,7 +595,7 @@ class ChineseCheckersGame:
                 new_location, is_hop = self._turn(ped)
 
                 # Update the display
-                pygame.display.flip()
+                self._gui.flip()
 
                 if new_location is not None:  # if the move was successful
 
@@ -355,15 +633,14 @@ class ChineseCheckersGame:
             return None, False
 
         # If the ped has possible moves, change the cursor
-        pygame.mouse.set_cursor(*pygame.cursors.broken_x)
+        self._gui.set_cursor(pygame.cursors.broken_x)
 
         # Highlight the possible moves (guaranteed to exist)
-        self._gui.highlight_locations(self._gui.get_highlight_surface(),
-                                      possible_moves)
+        self._gui.highlight_locations(possible_moves)
 
         if self._is_bot(self._current_player) == "Bot":
-            new_location = random.choice(possible_moves[NEIGHBOR_MOVES] +
-                                         possible_moves[HOP_MOVES])
+            new_location = self._next_bot_location(possible_moves[NEIGHBOR_MOVES] +
+                                                   possible_moves[HOP_MOVES])
         else:
             # wait for a move
             new_location = self._wait_for_move(possible_moves)
@@ -373,8 +650,8 @@ class ChineseCheckersGame:
         # another ped. In addition, log it.
         if new_location is None:
 
-            self._gui.unhighlight_surface(self._gui.get_highlight_surface())
-            pygame.mouse.set_cursor(*pygame.cursors.arrow)
+            self._gui.unhighlight_locations()
+            self._gui.set_cursor(pygame.cursors.arrow)
             self._show_message("Please select a valid move. Restarting turn.")
 
             # If the click was not made on a ped, log that the player
@@ -388,8 +665,10 @@ class ChineseCheckersGame:
 
         # The location was chosen, unhighlight the possible moves
         # and change the cursor
-        pygame.mouse.set_cursor(*pygame.cursors.arrow)
-        self._gui.unhighlight_surface(self._gui.get_highlight_surface())
+        self._gui.set_cursor(pygame.cursors.arrow)
+        self._gui.unhighlight_locations()
+
+        start_cell = ped.get_cell()
 
         try:
             # Move the ped to the selected location
@@ -400,6 +679,9 @@ class ChineseCheckersGame:
             self._clear_log_file()
             sys.exit()
 
+        self._spectators.publish(self._players.index(self._current_player),
+                                 start_cell, ped.get_cell())
+
         # If the player made a hop move
         if new_location in possible_moves[HOP_MOVES]:
             return new_location, True
@@ -407,6 +689,17 @@ class ChineseCheckersGame:
         # If the player made a neighbor move
         return new_location, False
 
+    def _next_bot_location(self, possible_moves: List[Coordinates]) -> \
+            Optional[Coordinates]:
+        """Return the next location of the turn the bot planned, or None
+        if the turn is over (or the plan is not possible anymore)."""
+
+        if not self._bot_path or self._bot_path[0] not in possible_moves:
+            self._bot_path = []
+            return None
+
+        return self._bot_path.pop(0)
+
     def _check_another_turn(self, visited: Set[Coordinates],
                             curr_location: Coordinates) -> \
             Optional[Coordinates]:
@@ -440,11 +733,10 @@ class ChineseCheckersGame:
         hop_moves_only = [possible_moves[HOP_MOVES]]
 
         # If the ped has possible moves, change the cursor
-        pygame.mouse.set_cursor(*pygame.cursors.broken_x)
+        self._gui.set_cursor(pygame.cursors.broken_x)
 
         # Highlight the possible moves (guaranteed to exist)
-        self._gui.highlight_locations(self._gui.get_highlight_surface(),
-                                      hop_moves_only)
+        self._gui.highlight_locations(hop_moves_only)
 
         # Showing a message on the screen about a possible additional move.
         message = (f"{self._is_bot(self._current_player)} "
@@ -457,7 +749,7 @@ class ChineseCheckersGame:
         self._show_message(message, ANOTHER_TURN)
 
         if self._is_bot(self._current_player) == "Bot":
-            new_location = random.choice(possible_moves[HOP_MOVES])
+            new_location = self._next_bot_location(possible_moves[HOP_MOVES])
 
         else:
             # wait for a move
@@ -467,8 +759,8 @@ class ChineseCheckersGame:
         # in means that the player wants to finish the turn
         if new_location is None:
 
-            self._gui.unhighlight_surface(self._gui.get_highlight_surface())
-            pygame.mouse.set_cursor(*pygame.cursors.arrow)
+            self._gui.unhighlight_locations()
+            self._gui.set_cursor(pygame.cursors.arrow)
             self._show_message("Finishing turn.")
 
             # log that the player finished his turn
@@ -481,8 +773,10 @@ class ChineseCheckersGame:
 
         # The location was chosen, unhighlight the possible moves
         # and change the cursor
-        pygame.mouse.set_cursor(*pygame.cursors.arrow)
-        self._gui.unhighlight_surface(self._gui.get_highlight_surface())
+        self._gui.set_cursor(pygame.cursors.arrow)
+        self._gui.unhighlight_locations()
+
+        start_cell = ped.get_cell()
 
         try:
             # Move the ped to the selected location
@@ -493,10 +787,12 @@ class ChineseCheckersGame:
             self._clear_log_file()
             sys.exit()
 
+        self._spectators.publish(self._players.index(self._current_player),
+                                 start_cell, ped.get_cell())
+
         return new_location
 
-    @staticmethod
-    def _wait_for_move(possible_moves: List[List[Coordinates]]) \
+    def _wait_for_move(self, possible_moves: List[List[Coordinates]]) \
             -> Optional[Coordinates]:
         """Wait for the player to make a move from the given possible moves.
         Returns the location of the move if it was made, None otherwise. """
@@ -512,10 +808,13 @@ class ChineseCheckersGame:
                     # pygame.quit()
                     # sys.exit()
 
+                elif event.type == pygame.VIDEORESIZE:
+                    self._gui.resize(event.w, event.h)
+
                 elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
 
-                    # Get the position of the mouse
-                    mouse_pos = pygame.mouse.get_pos()
+                    # Get the position of the mouse, on the board
+                    mouse_pos = self._gui.to_board(pygame.mouse.get_pos())
 
                     # Check if the mouse click was made on one of
                     # the highlighted (possible moves) locations
@@ -553,10 +852,10 @@ class ChineseCheckersGame:
         if purpose != PLAYER_TURNS:
             # Wait for a short time before clearing the message
             if purpose == ANOTHER_TURN:
-                pygame.time.delay(4500)  # 4.5 seconds
+                self._gui.animator.delay(4500)  # 4.5 seconds
 
             else:
-                pygame.time.delay(1800)  # 1.8 seconds
+                self._gui.animator.delay(1800)  # 1.8 seconds
 
             # Clear the message from the screen
             self._gui.clear_message()
@@ -567,50 +866,45 @@ class ChineseCheckersGame:
         for player in self._players:
 
             # Check if all the peds of the player are in the home of the opponent
-            if all(self._gui.is_in_opposite_home(ped)
+            if all(self._board.is_in_opposite_home(ped)
                    for ped in player.get_peds()):
 
                 return self._players.index(player) + 1
 
         return None
 
-    @staticmethod
-    def _log_game_data(player: str,
+    @timed("log.write")
+    def _log_game_data(self, player: str,
                        start_location: Optional[Coordinates] = None,
                        end_location: Optional[Coordinates] = None,
-                       message: Optional[str] = None) -> None:
-        """Construct log data dictionary."""
+                       message: Optional[str] = None, **details) -> None:
+        """Construct log data dictionary.
+        Any other details are added to the data as they are."""
 
         log_data = {
             "player": player,
-            "time": str(time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())),
+            "time": _log_time(int(time.time())),
             "from": str(start_location) if start_location is not None else "N/A",
             "to": str(end_location) if end_location is not None else "N/A",
             "message": message if message is not None else "N/A"
         }
+        log_data.update(details)
 
+        # The record is only queued, the log writer writes it to the file
         data = ('%s', log_data)
-        logging.info(json.dumps(data))
+        self._log.write(json.dumps(data))
 
     def _clear_log_file(self) -> None:
         """Clear the log file of the game."""
 
-        with open(self.log_file_name, "w") as log_file:
-            log_file.write("")
+        self._log.clear()
 
+    @timed("log.delete_last")
     def _delete_last_log_message(self) -> None:
-        """Delete the last line from the log file."""
-
-        # Read all lines from the file
-        with open(self.log_file_name, 'r') as f:
-            lines = f.readlines()
+        """Delete the last line from the log file (once the records before
+        it are written, in order with them)."""
 
-        # Remove the last line
-        lines = lines[:-1]
-
-        # Write the updated lines back to the file
-        with open(self.log_file_name, 'w') as f:
-            f.writelines(lines)
+        self._log.delete_last()
 
     @staticmethod
     def _is_bot(player: Union[Human, Bot]) -> str:
@@ -622,120 +916,43 @@ class ChineseCheckersGame:
         else:
             return "Human"
 
-    def view_game(self) -> None:
-
-        """Asks the player if he wants to view the game.
-        If yes, asks the player to enter the move number to view the board state,
-        and showing him it.
-        If no, does nothing."""
-
-        actions, moves, winner = funcs.parse_data_from_file(self.log_file_name)
-
-        if moves is None:
-            print("No moves have been made in the game.")
-            return None
-
-        # Ask the user if he wants to view the game
-        view_game = input("Do you want to view the game? (Y/N)\n")
-
-        while view_game.upper() not in ["Y", "N"]:
-            print("Invalid input. Please enter 'Y' or 'N'.")
-
-            view_game = input("Do you want to view the game? (Y/N)\n")
-
-        if view_game.upper() == "Y":
-
-            if moves == 0:
-                print("No moves have been made in the game.")
-                return None
+    def subscribe(self, queue_size: Optional[int] = None) -> Subscription:
+        """Add a spectator of the game. It gets the current position, and
+        then every move made (see SpectatorHub)."""
 
-            # Display the board state at the specified move number.
-            # Do it again and again and again until the user decides to exit.
-            view_state = True
-            while view_state:
+        return self._spectators.subscribe(queue_size)
 
-                # Ask the user for input
-                move_number = input(f"Enter move number to view board state: "
-                                    f"1 - {len(moves)}\n")
+    def set_fast_forward(self, fast_forward: bool) -> None:
+        """Make the moves and the pauses of the game faster (or not).
+        It can also be toggled while playing with FAST_FORWARD_KEY."""
 
-                # Validate the input move number
-                while (not (move_number.isdigit()) or int(move_number) > len(moves) or
-                       int(move_number) <= 0):
+        self._gui.animator.fast_forward = fast_forward
 
-                    print("Invalid move number. Please enter a positive integer "
-                          "that is less than or equal to the total moves.")
+    def get_seed(self) -> int:
+        """Return the seed of the random generator of the bots."""
 
-                    move_number = input(f"Enter move number to view board state: "
-                                        f"1 - {len(moves)}\n")
+        return self._seed
 
-                move_number = int(move_number)
-
-                # Getting the screen copies from the gui
-                screen_copies = self._gui.get_screen_copies()
-
-                # Display the board state at the specified move number
-                if move_number <= len(screen_copies):
-                    # Display the screen copy at the specified move number
-                    self._gui.view_board_at_move(move_number)
-
-                else:
-                    print("Sorry, there are no screen copy available "
-                          "for the selected move number.")
-
-                # Ask the user if he wants to view another board state
-                view_state_answer = input("Do you want to view another "
-                                          "board state? (Y/N)\n")
-
-                while view_state_answer.upper() not in ["Y", "N"]:
-                    print("Invalid input. Please enter 'Y' or 'N'.")
-
-                    view_state_answer = input("Do you want to view another "
-                                              "board state? (Y/N)\n")
-
-                if view_state_answer.upper() == "N":
-                    view_state = False
-
-        from history import GameHistory
-        # After reviewing the game, ask the user if he wants to continue playing,
-        # if the game is not over yet.
-
-        continue_playing = input("Do you want to continue playing? (Y/N)\n")
-
-        # If the user wants to continue playing
-        if continue_playing.upper() == "Y":
-
-            continue_playing = True
-            while winner is None or not continue_playing:
-                board = Board(len(self._players))
-                gui = InitGui(len(self._players))
-
-                history_game = GameHistory(self.log_file_name,
-                                           board,
-                                           gui,
-                                           self._num_players,
-                                           self._num_real_players,
-                                           self._players.index(self._current_player),
-                                           self._player_order)
-
-                history_game.run()
-
-                # Ask the user if he wants to view another board state
-                view = input("Do you want to continue playing? (Y/N)\n")
-
-                while view.upper() not in ["Y", "N"]:
-                    print("Invalid input. Please enter 'Y' or 'N'.")
-
-                    view = input("Do you want to continue playing? (Y/N)\n")
+    def run(self) -> None:
+        """Run the game.
+        If profiling is enabled, the profile of the game is saved next to
+        the log file when the game ends (the timings of instrumentation are
+        saved when the process exits). The subscriptions of the spectators
+        and the log of the game end with the game."""
 
-                if view.upper() == "N":
-                    continue_playing = False
+        report_name = self.log_file_name.rsplit(".", 1)[0]
 
-        return None
+        try:
+            with profiled(report_name):
+                self._run()
 
-    def run(self) -> None:
-        """Run the game."""
+        finally:
+            self._spectators.close()
+            self._log.close()
 
-        pygame.mouse.set_cursor(*pygame.cursors.arrow)  # Set the cursor to an arrow
+    def _run(self) -> None:
+        """The main loop of the game."""
+        self._gui.set_cursor(pygame.cursors.arrow)  # Set the cursor to an arrow
 
         # Creating a clock object to control the frame rate
         clock = pygame.time.Clock()
@@ -744,26 +961,42 @@ class ChineseCheckersGame:
 
         # The main loop of the game
         while winner is None:
+
+            # A headless game plays turn after turn, without waiting for events
+            if self._headless:
+                winner = self.play_turn()
+                continue
+
             try:
-                pygame.display.flip()  # Update the display
+                self._gui.flip()  # Update the display
 
                 clock.tick(60)  # 60 frames per second
 
                 winner = self.handle_events()  # Handle the events
 
-                pygame.time.delay(1000)  # Delay for 1 second before the next move
+                # Delay for 1 second before the next move
+                self._gui.animator.delay(1000)
 
             except SystemExit or KeyboardInterrupt or pygame.error or EOFError as e:
 
                 # If the user closes the window, end the game
                 raise e
 
-        if winner is not None:
+        if self._draw:
+            self._show_message(winner)
+            self._log_game_data(funcs.GAME_HEADER_PLAYER,
+                                message=f"The game ended in a draw {self._draw_reason}.")
+
+        elif winner is not None:
+            winner_player = self._players[self._winner]
+
+            # A game that was won can't be resumed
+            LOG_WRITER.remove(self.snapshot_file_name)
+
             # Show the winner message
-            self._show_message(f"{self._is_bot(self._current_player)} {winner} wins!")
+            self._show_message(f"{self._is_bot(winner_player)} {winner} wins!")
 
             # log that the player won
-            self._log_game_data((self._is_bot(self._current_player) + (" " +
-                                 str(self._players.index(
-                                  self._current_player) + 1))),
+            self._log_game_data((self._is_bot(winner_player) + (" " +
+                                 str(self._winner + 1))),
                                 message="Won the game!")
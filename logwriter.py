@@ -0,0 +1,324 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import List, Dict, Tuple, Optional, Any
+
+# Every record of a log is a line "INFO:root:<record>", the way the root
+# logger used to write them, since that's how the logs are read back
+RECORD_PREFIX = "INFO:root:"
+
+# The longest time a record waits before it's written, in seconds. A crash
+# loses at most the records of this long (a single batch)
+FLUSH_INTERVAL = 0.2
+
+# The most records written together
+MAX_BATCH = 512
+
+# The most records waiting to be written. A game that logs faster than the
+# disk keeps up waits for room, instead of the records taking all the memory
+QUEUE_SIZE = 16_384
+
+# The number of lines of every log whose offsets are kept, so deleting one
+# of the last lines doesn't need to read the log
+KEPT_OFFSETS = 64
+
+# The operations on the logs, done by the writer in the order they're asked
+WRITE = 0
+DELETE_LAST = 1
+CLEAR = 2
+FLUSH = 3
+CLOSE = 4
+STOP = 5
+REPLACE_FILE = 6
+REMOVE_FILE = 7
+
+# The operations that are waited for, so they end a batch at once
+WAITED_OPERATIONS = (FLUSH, CLOSE, STOP)
+
+Request = Tuple[int, Optional[str], Any]
+
+
+class _OpenLog:
+    """A log file the writer has open, with the lines waiting for it."""
+
+    __slots__ = ("file", "pending", "offsets")
+
+    def __init__(self, file_name: str) -> None:
+        self.file = open(file_name, "ab")
+        self.pending: List[bytes] = []
+
+        # The offsets of the last lines written to the file
+        self.offsets: deque = deque(maxlen=KEPT_OFFSETS)
+
+    def write_pending(self) -> None:
+        """Write the lines waiting, in a single write."""
+
+        if not self.pending:
+            return
+
+        offset = self.file.tell()
+        for line in self.pending:
+            self.offsets.append(offset)
+            offset += len(line)
+
+        self.file.write(b"".join(self.pending))
+        self.file.flush()
+        self.pending.clear()
+
+    def delete_last(self) -> None:
+        """Delete the last line of the log."""
+
+        if self.pending:
+            self.pending.pop()
+            return
+
+        if self.offsets:
+            self._truncate(self.offsets.pop())
+            return
+
+        # The line was written before the log was opened: read the log
+        # to find where its last line starts
+        self.file.flush()
+        with open(self.file.name, "rb") as f:
+            lines = f.readlines()
+
+        self._truncate(sum(len(line) for line in lines[:-1]))
+
+    def clear(self) -> None:
+        self.pending.clear()
+        self.offsets.clear()
+        self._truncate(0)
+
+    def _truncate(self, size: int) -> None:
+        """Cut the file to the given size, and go on writing at its end."""
+
+        self.file.truncate(size)
+        self.file.seek(0, os.SEEK_END)
+
+    def close(self) -> None:
+        """Write the lines waiting, make sure they're on the disk, and
+        close the file."""
+
+        self.write_pending()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+
+def replace_file(file_name: str, data: bytes) -> None:
+    """Write the data to the file, replacing it at once, so a process
+    stopped while writing leaves the previous contents."""
+
+    temp_file_name = file_name + ".tmp"
+
+    with open(temp_file_name, "wb") as f:
+        f.write(data)
+
+    os.replace(temp_file_name, file_name)
+
+
+class LogWriter:
+    """Writing the logs of all the games of the process, off their threads.
+    The games only queue their records; a background thread writes them in
+    batches, every FLUSH_INTERVAL or when MAX_BATCH records are waiting,
+    with one write for every log. Deleting and clearing are queued too, so
+    they happen in order with the records. The logs are written (and
+    synced to the disk) when their games end, and when the process exits.
+    Files the games save whole (their snapshots) are replaced by the writer
+    too, after the records queued before them, and only the last contents
+    of a file queued in a batch are written."""
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL,
+                 max_batch: int = MAX_BATCH, queue_size: int = QUEUE_SIZE) -> None:
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+
+        self._queue: queue.Queue = queue.Queue(queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        # The logs the writer has open, by their file names (used by the
+        # thread of the writer only)
+        self._logs: Dict[str, _OpenLog] = {}
+
+    def submit(self, operation: int, file_name: Optional[str] = None,
+               argument: Any = None) -> None:
+        """Queue an operation on a log (the thread starts on the first)."""
+
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, daemon=True,
+                                                    name="log-writer")
+                    self._thread.start()
+
+        self._queue.put((operation, file_name, argument))
+
+    def _wait_for(self, operation: int, file_name: Optional[str] = None) -> None:
+        """Queue an operation and wait until it's done."""
+
+        done = threading.Event()
+        self.submit(operation, file_name, done)
+        done.wait()
+
+    def flush(self) -> None:
+        """Wait until everything queued so far is written."""
+
+        self._wait_for(FLUSH)
+
+    def close_log(self, file_name: str) -> None:
+        """Write what's queued for the log, sync it to the disk and close
+        it, and wait until it's done."""
+
+        self._wait_for(CLOSE, file_name)
+
+    def stop(self) -> None:
+        """Write and close all the logs, and stop the thread."""
+
+        if self._thread is not None and self._thread.is_alive():
+            self._wait_for(STOP)
+            self._thread.join()
+
+    def _run(self) -> None:
+        """The loop of the thread: take a batch of requests and do them."""
+
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+
+            # Gather the requests that come until the batch is due, unless
+            # a request is waited for
+            while (len(batch) < self.max_batch and
+                   batch[-1][0] not in WAITED_OPERATIONS):
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+
+                except queue.Empty:
+                    break
+
+            try:
+                self._do_batch(batch)
+
+            except Exception as e:
+                # The writer keeps going, the games can't do anything about it
+                print("Error: ", e)
+
+            finally:
+                # Whoever waits for a request of the batch is released,
+                # even if writing failed
+                for _, _, argument in batch:
+                    if isinstance(argument, threading.Event):
+                        argument.set()
+
+            if batch[-1][0] == STOP:
+                return
+
+    def _open(self, file_name: str) -> _OpenLog:
+        log = self._logs.get(file_name)
+        if log is None:
+            log = self._logs[file_name] = _OpenLog(file_name)
+
+        return log
+
+    def replace(self, file_name: str, data: bytes) -> None:
+        """Queue replacing the contents of the file with the data."""
+
+        self.submit(REPLACE_FILE, file_name, data)
+
+    def remove(self, file_name: str) -> None:
+        """Queue removing the file, if it exists."""
+
+        self.submit(REMOVE_FILE, file_name)
+
+    def _do_batch(self, batch: List[Request]) -> None:
+
+        # The last contents of every file replaced in the batch, None if
+        # it's removed
+        files: Dict[str, Optional[bytes]] = {}
+
+        for operation, file_name, argument in batch:
+
+            if operation == WRITE:
+                self._open(file_name).pending.append(argument)
+
+            elif operation == DELETE_LAST:
+                self._open(file_name).delete_last()
+
+            elif operation == CLEAR:
+                self._open(file_name).clear()
+
+            elif operation == CLOSE:
+                log = self._logs.pop(file_name, None)
+                if log is not None:
+                    log.close()
+
+            elif operation == REPLACE_FILE:
+                files[file_name] = argument
+
+            elif operation == REMOVE_FILE:
+                files[file_name] = None
+
+            elif operation == STOP:
+                for log in self._logs.values():
+                    log.close()
+
+                self._logs.clear()
+
+        for log in self._logs.values():
+            log.write_pending()
+
+        for file_name, data in files.items():
+            if data is not None:
+                replace_file(file_name, data)
+
+            elif os.path.exists(file_name):
+                os.remove(file_name)
+
+
+# The writer of the logs of the process
+LOG_WRITER = LogWriter()
+
+# Whatever is queued is written when the process exits normally
+atexit.register(LOG_WRITER.stop)
+
+
+class GameLog:
+    """The log of a single game, written by the log writer of the process.
+    Writing a record only queues it, so the game never waits for the disk."""
+
+    __slots__ = ("file_name", "_writer")
+
+    def __init__(self, file_name: str, writer: LogWriter = LOG_WRITER) -> None:
+        self.file_name = file_name
+        self._writer = writer
+
+    def write(self, record: str) -> None:
+        self._writer.submit(WRITE, self.file_name,
+                            (RECORD_PREFIX + record + "\n").encode())
+
+    def delete_last(self) -> None:
+        """Delete the last record written."""
+
+        self._writer.submit(DELETE_LAST, self.file_name)
+
+    def clear(self) -> None:
+        """Delete all the records."""
+
+        self._writer.submit(CLEAR, self.file_name)
+
+    def flush(self) -> None:
+        """Wait until the records written so far are in the file."""
+
+        self._writer.flush()
+
+    def close(self) -> None:
+        """Wait until all the records are in the file, on the disk (at the
+        end of the game). Records written after that open the file again."""
+
+        self._writer.close_log(self.file_name)
@@ -1,21 +1,58 @@
+import argparse
+import itertools
+import os
+import sqlite3
 import sys
+from typing import Optional
 
 import pygame
 
+from archive import log_positions
+from catalog import GameCatalog, CatalogEntry
 from logic import ChineseCheckersGame
+from pygame_switch import view_surface
+from render import renderer
+from snapshot import load_snapshot, find_snapshot, snapshot_file_name, check_seed
+from terminal import format_position
 
 NUM_OF_PLAYERS = 1
 NUM_OF_REAL_PLAYERS = 2
 
 
+def seed_argument(text: str) -> int:
+    """Read the seed given on the command line, which a snapshot of the
+    game must be able to keep."""
+
+    try:
+        return check_seed(int(text))
+
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
 class GameOrLoad:
     """Class to run or load Chinese Checkers games"""
 
-    def __init__(self) -> None:
-        """Creating the game Chinese Checkers."""
+    def __init__(self, seed: Optional[int] = None,
+                 fast_forward: bool = False,
+                 snapshot_file: Optional[str] = None) -> None:
+        """Creating the game Chinese Checkers.
+        The first game is played with the given seed, if given, to replay
+        a game with the seed from its log. If a snapshot file is given, its
+        game is resumed first. The games are fast forwarded from the start
+        if asked (it can be toggled while playing)."""
+
+        # The history of the games, kept on the disk
+        self._catalog = GameCatalog()
+        self._seed = seed
+        self._fast_forward = fast_forward
+
+        if snapshot_file is not None:
+            try:
+                self._resume(snapshot_file)
 
-        # Initialize the history of the games
-        self._history = []
+            except SystemExit or KeyboardInterrupt or pygame.error or EOFError:
+                pygame.quit()
 
         running = True
         while running:
@@ -94,34 +131,66 @@ class GameOrLoad:
         num_of_real_players = int(num_of_real_players)
 
         # Creating the game object
-        self._game = ChineseCheckersGame(num_of_players, num_of_real_players)
+        self._game = ChineseCheckersGame(num_of_players, num_of_real_players,
+                                         seed=self._seed)
+        self._seed = None
+        self._game.set_fast_forward(self._fast_forward)
+        print(f"The seed of the game is {self._game.get_seed()}")
 
         try:
             self._game.run()
 
-        except SystemExit or KeyboardInterrupt or pygame.error or EOFError as e:
-            self._history.append(self._game)
-            raise e
+        finally:
+            # Saving the game to the history
+            self._add_to_catalog()
+
+    def _resume(self, snapshot_file: str) -> None:
+        """Resume the game saved in the snapshot file."""
+
+        snapshot = load_snapshot(snapshot_file)
+
+        self._game = ChineseCheckersGame(snapshot.players, snapshot.real_players(),
+                                         snapshot=snapshot)
+        self._game.set_fast_forward(self._fast_forward)
+        print(f"Resuming the game of {self._game.log_file_name} "
+              f"after {snapshot.turns} turns")
+
+        try:
+            self._game.run()
+
+        finally:
+            # Saving the game to the history
+            self._add_to_catalog()
+
+    def _add_to_catalog(self) -> None:
+        """Save the entry of the game that ended to the catalog, and let go
+        of the game itself (its board, its gui and its drawings)."""
+
+        try:
+            self._catalog.add(self._game.get_snapshot(), self._game.get_winner(),
+                              self._game.is_draw())
+
+        except sqlite3.Error as e:
+            print("Error: ", e)
 
-        # Saving the game to the history
-        self._history.append(self._game)
+        self._game = None
 
     def _load(self) -> None:
         """Main function to load games."""
 
-        if not self._history:
+        games = self._catalog.games()
+
+        if not games:
             print("No games to load.")
             return
 
-        for i in range(len(self._history)):
-            print(f"{i + 1}: {self._history[i].log_file_name}")
+        for i in range(len(games)):
+            print(f"{i + 1}: {games[i].describe()}")
 
         # The user chooses a game to load
         choice = input("Enter the number of the game you want to load.\n")
 
-        while not (choice.isdigit() or
-                   int(choice) > 0 or
-                   int(choice) <= len(self._history)):
+        while not (choice.isdigit() and 0 < int(choice) <= len(games)):
 
             print("Please enter a valid input.")
 
@@ -132,16 +201,122 @@ class GameOrLoad:
 
         try:
             # Loading the game
-            self._history[choice - 1].view_game()
+            self._view(games[choice - 1])
 
         except SystemExit or KeyboardInterrupt or pygame.error or EOFError as e:
             raise e
 
+    def _view(self, entry: CatalogEntry) -> None:
+        """Show how the game ended, let the user view the board state at
+        any move (replayed from the log), and continue playing the game if
+        it isn't over."""
+
+        print("The final position of the game:")
+        print(format_position(entry.final_position))
+
+        if not os.path.exists(entry.log_file):
+            print("The log of the game is gone.")
+            return
+
+        # Ask the user if he wants to view the game
+        view_game = input("Do you want to view the game? (Y/N)\n")
+
+        while view_game.upper() not in ["Y", "N"]:
+            print("Invalid input. Please enter 'Y' or 'N'.")
+
+            view_game = input("Do you want to view the game? (Y/N)\n")
+
+        if view_game.upper() == "Y" and entry.turns == 0:
+            print("No moves have been made in the game.")
+
+        elif view_game.upper() == "Y":
+
+            # Display the board state at the specified move number.
+            # Do it again until the user decides to exit.
+            view_state = True
+            while view_state:
+
+                # Ask the user for input
+                move_number = input(f"Enter move number to view board state: "
+                                    f"1 - {entry.turns}\n")
+
+                # Validate the input move number
+                while not (move_number.isdigit() and
+                           0 < int(move_number) <= entry.turns):
+
+                    print("Invalid move number. Please enter a positive integer "
+                          "that is less than or equal to the total moves.")
+
+                    move_number = input(f"Enter move number to view board state: "
+                                        f"1 - {entry.turns}\n")
+
+                # The board state is replayed from the log, up to the move
+                try:
+                    occupancy = next(itertools.islice(
+                        log_positions(entry.log_file, entry.players),
+                        int(move_number) - 1, None), None)
+
+                except (KeyError, ValueError, IndexError) as e:
+                    # The records of the log can't be read
+                    print("Error: ", e)
+                    occupancy = None
+
+                if occupancy is not None:
+                    view_surface(renderer().render(occupancy))
+                else:
+                    print("Sorry, the log doesn't have the selected move.")
+
+                # Ask the user if he wants to view another board state
+                view_state_answer = input("Do you want to view another "
+                                          "board state? (Y/N)\n")
+
+                while view_state_answer.upper() not in ["Y", "N"]:
+                    print("Invalid input. Please enter 'Y' or 'N'.")
+
+                    view_state_answer = input("Do you want to view another "
+                                              "board state? (Y/N)\n")
+
+                if view_state_answer.upper() == "N":
+                    view_state = False
+
+        # After reviewing the game, ask the user if he wants to continue
+        # playing, if the game is not over yet
+        continue_playing = input("Do you want to continue playing? (Y/N)\n")
+
+        while continue_playing.upper() == "Y":
+
+            if entry.is_over():
+                print("The game is over.")
+                break
+
+            if find_snapshot(entry.log_file) is None:
+                print("The game has no snapshot to resume from.")
+                break
+
+            self._resume(snapshot_file_name(entry.log_file))
+
+            # The entry was updated when the game stopped
+            entry = self._catalog.game(entry.game_id)
+
+            continue_playing = input("Do you want to continue playing? (Y/N)\n")
+
 
 if __name__ == "__main__":
 
+    parser = argparse.ArgumentParser(description="Play Chinese Checkers.")
+    parser.add_argument("--seed", type=seed_argument, default=None,
+                        help="the seed of the bots of the first game, "
+                             "to replay a game from its log")
+    parser.add_argument("--fast-forward", action="store_true",
+                        help="start the games with fast moves and short "
+                             "pauses (toggle it with the F key while playing)")
+    parser.add_argument("--resume", metavar="SNAPSHOT", default=None,
+                        help="resume a game from its snapshot file (saved "
+                             "next to its log after every turn)")
+    args = parser.parse_args()
+
     try:
-        GameOrLoad()
+        GameOrLoad(args.seed, args.fast_forward, args.resume)
 
     except KeyboardInterrupt:
         print("Goodbye!")
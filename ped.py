@@ -1,31 +1,39 @@
-from typing import Tuple
+from typing import Tuple, Sequence
 
 Coordinates = Tuple[float, float]
 
 
 class Ped:
+    """A ped of one of the players.
+    The location is kept as the index of the ped's cell in the board's
+    positions, and the color as the index of its home triangle in the
+    board's colors. The tables are shared by all the peds of a board,
+    so a ped is just a few small ints."""
 
-    def __init__(self, color: str, location: Coordinates) -> None:
-
-        self._color = color
-        self._location = location
-
-    def get_color(self):
-        return self._color
-
-    def get_location(self):
-        return self._location
-
-    def set_location(self, location: Coordinates) -> None:
-        self._location = location
-
-    def same_color(self, other: 'Ped') -> bool:
-        return self._color == other.get_color()
+    __slots__ = ("_color", "_cell", "_colors", "_positions")
 
+    def __init__(self, color: int, cell: int, colors: Sequence[str],
+                 positions: Sequence[Coordinates]) -> None:
 
+        self._color = color
+        self._cell = cell
+        self._colors = colors
+        self._positions = positions
 
+    def get_color(self) -> str:
+        return self._colors[self._color]
 
+    def get_color_index(self) -> int:
+        return self._color
 
+    def get_location(self) -> Coordinates:
+        return self._positions[self._cell]
 
+    def get_cell(self) -> int:
+        return self._cell
 
+    def set_cell(self, cell: int) -> None:
+        self._cell = cell
 
+    def same_color(self, other: 'Ped') -> bool:
+        return self._color == other.get_color_index()
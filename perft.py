@@ -0,0 +1,115 @@
+import argparse
+import time
+from typing import Tuple, List, Dict
+
+from board import Board
+from layout import POSSIBLE_NUM_OF_PLAYERS
+
+Coordinates = Tuple[float, float]
+
+FROM = 0
+TO = -1
+
+
+def starting_board(num_players: int) -> Board:
+    """Return a board with the peds of all the players placed on their
+    starting positions, like at the start of a game."""
+
+    board = Board(num_players, headless=True)
+    board.place_starting_peds()
+
+    return board
+
+
+def perft(board: Board, colors: List[str], depth: int, side: int = 0) -> int:
+    """Return the number of legal move sequences of the given depth,
+    when the players with the given colors play in turns, starting from
+    the player at the given side.
+    Every turn (a neighbor move, or a chain of hops of any length)
+    counts as one move. The board is left as it was given."""
+
+    if depth == 0:
+        return 1
+
+    color = colors[side]
+    next_side = (side + 1) % len(colors)
+
+    nodes = 0
+    for location in board.get_peds_locations_by_color(color):
+        ped = board.get_ped_by_location(location)
+
+        for turn in board.find_turns(location):
+
+            if depth == 1:
+                nodes += 1
+                continue
+
+            # Make the turn, count the sequences after it and take it back
+            board.relocate_ped(ped, turn[TO])
+            nodes += perft(board, colors, depth - 1, next_side)
+            board.relocate_ped(ped, turn[FROM])
+
+    return nodes
+
+
+def divide(board: Board, colors: List[str], depth: int,
+           side: int = 0) -> Dict[Tuple[Coordinates, Coordinates], int]:
+    """Return the perft count under each of the first turns, keyed by
+    the start and end locations of the turn.
+    Useful for finding where two move generators disagree."""
+
+    counts: Dict[Tuple[Coordinates, Coordinates], int] = {}
+    next_side = (side + 1) % len(colors)
+
+    for location in board.get_peds_locations_by_color(colors[side]):
+        ped = board.get_ped_by_location(location)
+
+        for turn in board.find_turns(location):
+            board.relocate_ped(ped, turn[TO])
+            key = (turn[FROM], turn[TO])
+            counts[key] = (counts.get(key, 0) +
+                           perft(board, colors, depth - 1, next_side))
+            board.relocate_ped(ped, turn[FROM])
+
+    return counts
+
+
+def main() -> None:
+    """Run perft from the starting positions and report the node counts
+    and the nodes per second."""
+
+    parser = argparse.ArgumentParser(
+        description="Count the legal move sequences from the starting "
+                    "position of Chinese Checkers.")
+    parser.add_argument("-p", "--players", type=int, nargs="+",
+                        default=POSSIBLE_NUM_OF_PLAYERS,
+                        choices=POSSIBLE_NUM_OF_PLAYERS,
+                        help="numbers of players to run perft for")
+    parser.add_argument("-d", "--depth", type=int, default=2,
+                        help="the maximal depth (in turns) to count")
+    parser.add_argument("--divide", action="store_true",
+                        help="print the counts under each first turn "
+                             "at the maximal depth")
+    args = parser.parse_args()
+
+    for num_players in args.players:
+        board = starting_board(num_players)
+        colors = board.playable_colors()
+
+        for depth in range(1, args.depth + 1):
+            start = time.perf_counter()
+            nodes = perft(board, colors, depth)
+            elapsed = time.perf_counter() - start
+
+            nps = nodes / elapsed if elapsed > 0 else float("inf")
+            print(f"players {num_players}  depth {depth}  nodes {nodes:>12}  "
+                  f"time {elapsed:8.3f}s  nps {nps:12.0f}")
+
+        if args.divide:
+            for (start_location, end_location), nodes in \
+                    divide(board, colors, args.depth).items():
+                print(f"{start_location} -> {end_location}: {nodes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,20 @@
-from typing import List
+import random
+from typing import List, Tuple, Dict, Optional, Union
 
+from board import Board
 from ped import Ped
 
+Coordinates = Tuple[float, float]
+
+# The number of decimal places the greedy bot compares distances by
+GAIN_PRECISION = 6
+
 
 class Human:
     """A class to represent a player in the game."""
 
+    __slots__ = ("_peds_color", "_peds")
+
     def __init__(self, peds_color: str) -> None:
         self._peds_color = peds_color
         self._peds: List[Ped] = []
@@ -27,6 +36,8 @@ class Human:
 class Bot:
     """A class to represent a bot (not real) player in the game."""
 
+    __slots__ = ("_peds_color", "_peds")
+
     def __init__(self, peds_color: str) -> None:
         self._peds_color = peds_color
         self._peds: List[Ped] = []
@@ -43,3 +54,87 @@ class Bot:
     @staticmethod
     def is_bot() -> bool:
         return True
+
+    def choose_turn(self, board: Board,
+                    rng: random.Random) -> Optional[List[Coordinates]]:
+        """Choose a random legal turn of the bot on the given board, as the
+        path of locations the ped goes through.
+        Returns None if the bot has no legal turn."""
+
+        locations = board.get_peds_locations_by_color(self._peds_color)
+        rng.shuffle(locations)
+
+        # Like a player, pick a random ped, and another one if it's stuck
+        for location in locations:
+            turns = board.find_turns(location)
+            if turns:
+                return rng.choice(turns)
+
+        return None
+
+
+class GreedyBot(Bot):
+    """A bot that makes the turn that brings one of its peds the farthest
+    toward its target, looking at every legal turn (hop chains included).
+    Ties are broken with the given random generator, so a seeded game is
+    played the same every time."""
+
+    __slots__ = ()
+
+    def choose_turn(self, board: Board,
+                    rng: random.Random) -> Optional[List[Coordinates]]:
+        """Choose the turn with the largest distance gained toward the
+        target, by the shortest path to its end location.
+        Returns None if the bot has no legal turn."""
+
+        best_gain = None
+        best_turns: Dict[Coordinates, List[Coordinates]] = {}
+
+        for location in board.get_peds_locations_by_color(self._peds_color):
+            start_distance = board.distance_to_target(self._peds_color, location)
+
+            for turn in board.find_turns(location):
+                end = turn[-1]
+
+                # Rounded, so turns with the same gain are tied
+                gain = round(start_distance -
+                             board.distance_to_target(self._peds_color, end),
+                             GAIN_PRECISION)
+
+                if best_gain is None or gain > best_gain:
+                    best_gain = gain
+                    best_turns = {}
+
+                if gain == best_gain:
+                    # Several hop chains can end at the same location
+                    if end not in best_turns or len(turn) < len(best_turns[end]):
+                        best_turns[end] = turn
+
+        if not best_turns:
+            return None
+
+        # Sorted, so the choice only depends on the generator
+        return rng.choice([best_turns[end] for end in sorted(best_turns)])
+
+
+# The kinds of players, by their codes in the snapshots of the games
+PLAYER_KINDS = (Human, Bot, GreedyBot)
+
+
+def player_kind(player: Union[Human, Bot]) -> int:
+    """Return the code of the kind of the player. A bot of another kind
+    is kept as a greedy bot, the bot of the games."""
+
+    if type(player) in PLAYER_KINDS:
+        return PLAYER_KINDS.index(type(player))
+
+    return PLAYER_KINDS.index(GreedyBot if player.is_bot() else Human)
+
+
+def new_player(kind: int, color: str) -> Union[Human, Bot]:
+    """Create a player of the kind with the given code."""
+
+    if not 0 <= kind < len(PLAYER_KINDS):
+        raise ValueError("Unknown kind of player", kind)
+
+    return PLAYER_KINDS[kind](color)
@@ -1,9 +1,14 @@
+import functools
+import math
 from typing import Tuple, List, Dict, Optional
 
 import pygame
-import math
 
 import funcs
+import layout
+from animation import Animator
+from instrumentation import timed
+from layout import FRAME_HEIGHT, FRAME_WIDTH, BOARD_HEIGHT, BOARD_WIDTH, COLORS
 
 from ped import Ped
 
@@ -15,14 +20,6 @@ BOARD_COLOR = "burlywood4"
 
 CENTER_CELLS_COLOR = "darkred"
 
-FRAME_HEIGHT = 590
-FRAME_WIDTH = 930
-
-BOARD_HEIGHT = 0.95 * FRAME_HEIGHT
-BOARD_WIDTH = 0.6 * FRAME_WIDTH
-
-COLORS = ["Aqua", "green", "grey", "purple", "yellow", "lavenderblush"]
-
 rgb_colors = list(map(lambda x: funcs.convert_to_rgb(x), COLORS))
 
 # Add transparency to the colors (x[:3] is the RGB part of the color,
@@ -49,309 +46,323 @@ PLAYER_ORDER = [[4, 1, 3, 6, 2, 5],
 
 DEFAULT_CAPTION = "Chinese Checkers. If it's a bot's turn, " \
                   "drag your mouse to view the bot's moves. "
-VIEWING_CAPTION = "Viewing the chosen move. Close the window to quit."
+VIEWING_CAPTION = "Viewing the chosen move. Close the window to go back."
 
 
-class InitGui:
-    """Class to initialize the GUI of the game Chinese Checkers."""
+# The width of the outer frame of the board, in board coordinates
+BOARD_FRAME_WIDTH = 7
 
-    def __init__(self, num_players: int) -> None:
-        """Initialize the GUI of the game Chinese Checkers."""
+# The width of the circles around the highlighted cells
+HIGHLIGHT_WIDTH = 3
 
-        # Initialize the game
-        pygame.init()
-        self._screen = pygame.display.set_mode((FRAME_WIDTH, FRAME_HEIGHT))
+# The number of window sizes whose board is kept drawn
+BACKGROUND_CACHE_SIZE = 8
 
-        # Creating a new surface with an alpha channel, so the hexagram
-        # could be transparent
-        self._temp_surface = pygame.Surface((FRAME_WIDTH, FRAME_HEIGHT),
-                                            pygame.SRCALPHA)
+# The names of the overlays, from the bottom one to the top one
+HIGHLIGHT_OVERLAY = "highlight"
+MOVING_OVERLAY = "moving"
+MESSAGE_OVERLAY = "message"
 
-        # Creating a new surface for the highlighting
-        self._highlight_surface = pygame.Surface((FRAME_WIDTH, FRAME_HEIGHT),
-                                                 pygame.SRCALPHA)
 
-        # make the window title
-        pygame.display.set_caption(DEFAULT_CAPTION)
+@timed("gui.flip")
+def flip_display() -> None:
+    """Update the whole display."""
 
-        self._font = pygame.font.SysFont("Courier", 18)
+    pygame.display.flip()
 
-        self._start_new_game(num_players)
 
-        # Setting a previous state property to revert the
-        # current state when needed
-        self._previous_state_highlight = None
-        self._previous_state_message = None
+@timed("gui.update")
+def update_display(rects: List[pygame.Rect]) -> None:
+    """Update only the given rects of the display."""
 
-    def _start_new_game(self, num_players: int) -> None:
-        """Start the game."""
+    pygame.display.update(rects)
 
-        self._num_players = num_players  # Number of players
 
-        for order in PLAYER_ORDER:
-            if len(order) == num_players:
-                self._player_order = order
-                break
+def view_surface(surface: pygame.Surface, caption: str = VIEWING_CAPTION) -> None:
+    """Show a drawn board (like one from render.BoardRenderer) in a window,
+    scaled to it, until the user closes the window."""
 
-        self._screen.fill(FRAME_COLOR)  # Set the background color
+    pygame.init()
+    screen = pygame.display.set_mode(surface.get_size(), pygame.RESIZABLE)
+    pygame.display.set_caption(caption)
 
-        # Dictionary to store the positions of the cells in
-        # outer triangles by color.
-        self._color_positions: Dict[str, List[Coordinates]] = {}
+    running = True
+    while running:
+        if surface.get_size() != screen.get_size():
+            screen.blit(pygame.transform.smoothscale(surface, screen.get_size()), (0, 0))
+        else:
+            screen.blit(surface, (0, 0))
 
-        # List to store the positions of the cells in
-        # the center of the board.
-        self._center_positions: List[Coordinates] = []
+        flip_display()
 
-        # Creating a list to store the screen copies for reviewing the game
-        # after it's finished, and even to start from where it was left.
-        self._screen_copies: List[pygame.Surface] = []
+        # Wait for the next event, instead of redrawing all the time
+        event = pygame.event.wait()
 
-        # determine the number of players
-        self.create_board()  # Create the game board
+        if event.type == pygame.QUIT:
+            running = False
 
-    def create_board(self) -> None:
-        """Creating or updating the game board, depending on the state of the game."""
+        elif event.type == pygame.VIDEORESIZE:
+            screen = pygame.display.set_mode((event.w, event.h), pygame.RESIZABLE)
 
-        # Draw the game board
-        center_x = FRAME_WIDTH / 2
-        center_y = FRAME_HEIGHT / 2
-        board_x0 = center_x - BOARD_WIDTH / 2
-        board_y0 = center_y - BOARD_HEIGHT / 2
+    pygame.display.quit()
 
-        # Draw the inner board
-        pygame.draw.rect(self._screen, BOARD_COLOR,
-                         (board_x0, board_y0, BOARD_WIDTH, BOARD_HEIGHT))
 
-        # Draw the outer frame
-        pygame.draw.rect(self._screen, OUTER_COLOR,
-                         (board_x0, board_y0, BOARD_WIDTH, BOARD_HEIGHT), 7)
+@functools.lru_cache(maxsize=BACKGROUND_CACHE_SIZE)
+@timed("gui.board_background")
+def board_background(width: int, height: int) -> pygame.Surface:
+    """Draw the empty board (the frame, the hexagram and the cells) for
+    a window of the given size. It's drawn once for every size, and
+    after that only blitted."""
 
-        # Call the method to draw the hexagram
-        self._draw_hexagram()
+    viewport = layout.Viewport(width, height)
 
-        # Update the display
-        pygame.display.flip()
+    background = pygame.Surface((width, height))
+    background.fill(FRAME_COLOR)  # Set the background color
 
-    def _draw_hexagram(self) -> None:
-        """Draw the hexagram, which is the shape of the board."""
+    # Draw the inner board
+    board_x0, board_y0 = viewport.to_screen(((FRAME_WIDTH - BOARD_WIDTH) / 2,
+                                             (FRAME_HEIGHT - BOARD_HEIGHT) / 2))
+    board_rect = (board_x0, board_y0,
+                  viewport.length(BOARD_WIDTH), viewport.length(BOARD_HEIGHT))
 
-        cos_30 = math.cos(math.pi / 6)
-        sin_30 = math.sin(math.pi / 6)
-        size_ratio = 0.90  # The ratio of the hexagram size to the board
-        self._radius_cells = 9.3  # The radius of the cells in the board
-        self._radius_peds = 6.7  # The radius of the center cells in the board
+    pygame.draw.rect(background, BOARD_COLOR, board_rect)
+
+    # Draw the outer frame
+    pygame.draw.rect(background, OUTER_COLOR, board_rect,
+                     max(round(viewport.length(BOARD_FRAME_WIDTH)), 1))
+
+    # The hexagram and the cells are drawn on a surface with an alpha
+    # channel, so the cells of the triangles could be transparent
+    hexagram = pygame.Surface((width, height), pygame.SRCALPHA)
+
+    # The six outer points of the hexagram
+    points = [viewport.to_screen(point) for point in layout.hexagram_points()]
+
+    # Converting the board color to rgb, fully opaque
+    hexagram_color = (*funcs.convert_to_rgb(BOARD_COLOR)[:3], 255)
+
+    # Draw two big triangles that form the hexagram.
+    # Each tuple represents the points to be used for a triangle.
+    for indices in [(0, 2, 4), (3, 1, 5)]:
+        pygame.draw.polygon(hexagram, hexagram_color, [points[i] for i in indices])
+
+    cell_radius = viewport.length(layout.CELL_RADIUS)
+
+    # Draw the cells of the six triangles, and the 61 center cells
+    for triangle, positions in enumerate(layout.triangles_positions().values()):
+        for position in positions:
+            pygame.draw.circle(hexagram, TRANSPARENT_COLORS[triangle],
+                               viewport.to_screen(position), cell_radius)
+
+    for x, y in layout.center_cells_positions():
+        pygame.draw.circle(hexagram, CENTER_CELLS_COLOR,
+                           viewport.to_screen((int(x), int(y))), cell_radius)
+
+    background.blit(hexagram, (0, 0))
+
+    return background
 
-        # The distance between the centers of adjacent cells in
-        # the center of the board.
 
-        # 15 is the padding between the cells
-        self._cells_dist = 2 * self._radius_cells + 15
+@functools.lru_cache(maxsize=None)
+def ped_sprite(color: str, radius: float) -> pygame.Surface:
+    """Draw a ped of the given color and radius (in pixels), centered in
+    a transparent square surface."""
 
-        # Calculate the center of the board, to ensure that the hexagram is drawn
-        # in its center.
+    half_size = math.ceil(radius) + 1
+    sprite = pygame.Surface((2 * half_size, 2 * half_size), pygame.SRCALPHA)
 
-        # The reason why we use frame dimensions instead of board dimensions is because
-        # the frame dimensions represent the total dimensions of the frame including
-        # any borders or padding, while the board dimensions represent the
-        # inner dimensions
-        # of the board excluding any borders or padding.
-        center_y = FRAME_HEIGHT / 2
-        center_x = FRAME_WIDTH / 2
+    # Draw the ped, with a small frame around the circle
+    pygame.draw.circle(sprite, color, (half_size, half_size), radius)
+    pygame.draw.circle(sprite, "white" if color == "black" else "black",
+                       (half_size, half_size), radius, 1)
 
-        # Calculating the size of the hexagram based on the board size.
-        # The hexagram will be inside the board.
-        # The size of the hexagram is the distance from its center to
-        # any of its outer points.
-        hexagram_size = (min(BOARD_WIDTH, BOARD_HEIGHT) * size_ratio) / 2
+    return sprite
 
-        # Note: We are dividing the size by 2 because without it, it is just the distance
-        # between one side of the hexagram to the other, and we want the distance to be
-        # from it to the center.
 
-        # Calculate the coordinates of the six points of the hexagram
-        points = [
-            (center_x, center_y - hexagram_size),  # Top
+@functools.lru_cache(maxsize=None)
+def highlight_sprite(radius: float, width: int) -> pygame.Surface:
+    """Draw the circle around a highlighted cell of the given radius
+    (in pixels), centered in a transparent square surface."""
 
-            # Top-right
-            (center_x + hexagram_size * cos_30, center_y - hexagram_size * sin_30),
+    half_size = math.ceil(radius) + 1
+    sprite = pygame.Surface((2 * half_size, 2 * half_size), pygame.SRCALPHA)
+    pygame.draw.circle(sprite, HIGHLIGHT_COLOR, (half_size, half_size), radius, width)
 
-            # Bottom-right
-            (center_x + hexagram_size * cos_30, center_y + hexagram_size * sin_30),
+    return sprite
 
-            (center_x, center_y + hexagram_size),  # Bottom
 
-            # Bottom-left
-            (center_x - hexagram_size * cos_30, center_y + hexagram_size * sin_30),
+class InitGui:
+    """Class to initialize the GUI of the game Chinese Checkers.
+    The window can be resized: the board is drawn in board coordinates
+    through a viewport that fits them to the size of the window.
 
-            # Top-left
-            (center_x - hexagram_size * cos_30, center_y - hexagram_size * sin_30)
-        ]
+    The window is composed of layers: the empty board (drawn once for
+    every size of the window), a transparent layer of the peds, and the
+    overlays - the highlights and the message, each a list of small
+    surfaces and the rects they're shown at. Changing a layer composes
+    again only the rects that changed, and updates only them."""
 
-        # Defining the indices for creating the triangles.
-        # Each tuple represents the points to be used for a triangle.
-        indices = [(0, 2, 4), (3, 1, 5)]
+    def __init__(self, num_players: int) -> None:
+        """Initialize the GUI of the game Chinese Checkers."""
 
-        # Converting the board color to rgb
-        board_color_rgb = funcs.convert_to_rgb(BOARD_COLOR)
-        transparency = 255  # 0 is fully transparent, 255 is fully opaque
+        # Initialize the game
+        pygame.init()
+        self._screen = pygame.display.set_mode((FRAME_WIDTH, FRAME_HEIGHT),
+                                               pygame.RESIZABLE)
+        self._viewport = layout.Viewport(FRAME_WIDTH, FRAME_HEIGHT)
+
+        # The layer of the peds, on top of the board
+        self._ped_layer = pygame.Surface((FRAME_WIDTH, FRAME_HEIGHT), pygame.SRCALPHA)
 
-        hexagram_color = (*board_color_rgb[:3], transparency)
+        # The overlays by their name, from the bottom one to the top one
+        self._overlays: Dict[str, List[Tuple[pygame.Surface, pygame.Rect]]] = {
+            HIGHLIGHT_OVERLAY: [], MOVING_OVERLAY: [], MESSAGE_OVERLAY: []}
 
-        # Draw two big triangles that form the hexagram on the temporary surface
-        for i in range(len(indices)):
-            triangle_points = [(points[j]) for j in indices[i]]
-            pygame.draw.polygon(self._temp_surface, hexagram_color, triangle_points)
+        # Moving the peds smoothly from cell to cell, and pacing the game
+        self.animator = Animator()
 
-        # Doing this separately so the cells will be drawn on top of the hexagram
-        for q in range(len(points)):
+        # make the window title
+        pygame.display.set_caption(DEFAULT_CAPTION)
+
+        self._font = pygame.font.SysFont("Courier", 18)
+
+        # What is highlighted and shown now, to show them again
+        # after the window is resized
+        self._highlighted: Optional[List[List[Coordinates]]] = None
+        self._message: Optional[Tuple[str, int]] = None
+
+        self._start_new_game(num_players)
 
-            rotation_angle = 60
+    def _start_new_game(self, num_players: int) -> None:
+        """Start the game."""
 
-            if q == 2 or q == 5:  # for adjusting only purposes
-                self._draw_outer_cells(self._temp_surface, points[q], self._radius_cells,
-                                       TRANSPARENT_COLORS[q], rotation_angle * q,
-                                       True)
+        self._num_players = num_players  # Number of players
 
-            else:
-                self._draw_outer_cells(self._temp_surface, points[q], self._radius_cells,
-                                       TRANSPARENT_COLORS[q], rotation_angle * q,
-                                       False)
+        for order in PLAYER_ORDER:
+            if len(order) == num_players:
+                self._player_order = order
+                break
 
-        # Draw the 61 center cells
-        self._draw_center_cells(self._temp_surface, self._radius_cells,
-                                CENTER_CELLS_COLOR)
+        self._radius_cells = layout.CELL_RADIUS  # The radius of the cells in the board
+        self._radius_peds = layout.PED_RADIUS  # The radius of the peds in the board
 
-        # Place the peds in the outer cells
-        self._place_peds(self._temp_surface, self._radius_peds)
+        # The distance between the centers of adjacent cells in
+        # the center of the board.
+        self._cells_dist = layout.CELLS_DIST
 
-        # Blit the temporary surface onto the screen surface
-        self._screen.blit(self._temp_surface, (0, 0))
+        # Dictionary to store the positions of the cells in
+        # outer triangles by color.
+        self._color_positions: Dict[str, List[Coordinates]] = \
+            layout.triangles_positions()
 
-    @staticmethod
-    def _rotate_point(point: Tuple[float, float],
-                      center_x: float, center_y: float,
-                      angle: int) -> Tuple[float, float]:
+        # List to store the positions of the cells in
+        # the center of the board.
+        self._center_positions: List[Coordinates] = layout.center_cells_positions()
 
-        # Normalizing the angle to the range [0, 360) degrees (ensuring only)
-        # and then converting the angle to radians
-        angle_rad = math.radians(angle % 360)
+        # The colors of the peds on the screen by their locations,
+        # to draw them again when the window is resized
+        self._peds: Dict[Coordinates, str] = {}
 
-        # Translating the point so that the origin coords
-        # are at the center of the triangle
-        new_x = point[X_COORD] - center_x
-        new_y = point[Y_COORD] - center_y
+        self.create_board()  # Create the game board
 
-        # Rotating the point according to the formula for
-        # rotating a point around the origin
-        # [ x′ = x⋅cos(θ) − y⋅sin(θ) , y′ = x⋅sin(θ) + y⋅cos(θ) ]
-        rotated_x = new_x * math.cos(angle_rad) - new_y * math.sin(angle_rad)
-        rotated_y = new_x * math.sin(angle_rad) + new_y * math.cos(angle_rad)
+    @timed("gui.create_board")
+    def create_board(self) -> None:
+        """Creating the game board, with the peds in their initial positions."""
 
-        # Translating the point back to its original position
-        new_x = rotated_x + center_x
-        new_y = rotated_y + center_y
+        self._place_peds()
+        self._redraw()
 
-        return new_x, new_y
+    def _redraw(self) -> None:
+        """Draw the whole window: the board, all the peds and the overlays."""
 
-    def _draw_outer_cells(self,
-                          surface: pygame.Surface,
-                          point: Tuple[float, float],
-                          radius: float,
-                          color: Tuple,
-                          angle: int,
-                          adjust: bool) -> None:
+        self._ped_layer.fill((0, 0, 0, 0))
+        for location, color in self._peds.items():
+            self._draw_ped(location, color)
 
-        rows = 4
-        cells_dist = self._cells_dist
+        self._compose([self._screen.get_rect()])
 
-        for i in range(rows):
+    @timed("gui.compose")
+    def _compose(self, rects: List[pygame.Rect]) -> None:
+        """Draw the given rects of the window from the layers, and update
+        them on the display."""
 
-            # number of cells in the current row
-            cells_in_row = i + 1
+        background = board_background(self._viewport.width, self._viewport.height)
 
-            # Calculate the y coordinate of the current row
-            y = point[Y_COORD] + i * cells_dist - 2  # 4 is the padding between the rows
+        for rect in rects:
+            self._screen.blit(background, rect, rect)
+            self._screen.blit(self._ped_layer, rect, rect)
 
-            for j in range(cells_in_row):
+            for items in self._overlays.values():
+                for surface, item_rect in items:
+                    overlap = rect.clip(item_rect)
 
-                # Calculate the x coordinate of the current cell
-                # all the ifs below is for adjustments only
-                x = (point[X_COORD] - (cells_in_row - 1) *
-                     (cells_dist + 5) / 2 + j * (cells_dist + 3))
+                    # Blit only the part of the item inside the rect
+                    if overlap:
+                        self._screen.blit(surface, overlap,
+                                          overlap.move(-item_rect.x, -item_rect.y))
 
-                if j < cells_in_row // 2:
-                    x = (point[X_COORD] - (cells_in_row - 1) *
-                         (cells_dist + 2) / 2 + j * (cells_dist + 3))
+        update_display(rects)
 
-                elif j == cells_in_row // 2 and j % 2 != 0:
-                    x = (point[X_COORD] - (cells_in_row - 1) *
-                         (cells_dist + 4) / 2 + j * (cells_dist + 3))
+    def _set_overlay(self, name: str,
+                     items: List[Tuple[pygame.Surface, pygame.Rect]]) -> None:
+        """Replace the items of the given overlay, composing again the
+        rects of the old items and of the new ones."""
 
-                elif adjust:
-                    x = (point[X_COORD] - (cells_in_row - 1) *
-                         (cells_dist + 4) / 2 + j * (cells_dist + 3))
+        dirty = [rect for _, rect in self._overlays[name]]
+        self._overlays[name] = items
+        dirty.extend(rect for _, rect in items)
 
-                # Rotate the point
-                rotated_x, rotated_y = self._rotate_point((x, y),
-                                                          point[X_COORD],
-                                                          point[Y_COORD],
-                                                          angle)
+        self._compose(dirty)
 
-                # (Actually it doesn't matter to convert the color to a name,
-                # I'm doing it so the dictionary will be prettier to see)
-                # Getting the color name without a transparency value
-                color_name = funcs.rgba_to_name(color)
+    def _draw_ped(self, location: Coordinates, color: str) -> None:
+        """Draw a ped of the given color in the cell at the given location,
+        on the layer of the peds."""
 
-                # Add the position of the cell to the dictionary of positions,
-                # at the key of the color of the cell.
-                if color_name not in self._color_positions:
-                    self._color_positions[color_name] = [(rotated_x, rotated_y)]
+        sprite = ped_sprite(color, self._viewport.length(self._radius_peds))
+        self._ped_layer.blit(sprite, sprite.get_rect(
+            center=self._cell_rect(location).center))
 
-                else:
-                    self._color_positions[color_name].append((rotated_x, rotated_y))
+    def _cell_rect(self, location: Coordinates) -> pygame.Rect:
+        """Return the rect of the window that the cell at the given
+        location is drawn in."""
 
-                # Draw the cell
-                pygame.draw.circle(surface, color,
-                                   (rotated_x, rotated_y), radius)
+        x, y = self._viewport.to_screen(location)
+        radius = math.ceil(self._viewport.length(self._radius_cells)) + 1
 
-    def _draw_center_cells(self, surface: pygame.Surface,
-                           radius_center_cells: float, color: str) -> None:
+        return pygame.Rect(round(x) - radius, round(y) - radius,
+                           2 * radius, 2 * radius)
 
-        # The center of the hexagon that the center cells are forming is
-        # also the center of the screen
-        center_x = FRAME_WIDTH / 2
-        center_y = FRAME_HEIGHT / 2
+    @timed("gui.resize")
+    def resize(self, width: int, height: int) -> None:
+        """Fit the board to the new size of the window. The empty board is
+        drawn once for every size, so this redraws only the peds, the
+        highlights and the message."""
 
-        # The number of cells on each side of the hexagon
-        rows = 9
+        self._screen = pygame.display.set_mode((width, height), pygame.RESIZABLE)
+        self._viewport = layout.Viewport(width, height)
+        self._ped_layer = pygame.Surface((width, height), pygame.SRCALPHA)
 
-        for i in range(rows):
+        # The overlays are placed again for the new size
+        self._overlays[HIGHLIGHT_OVERLAY] = \
+            [] if self._highlighted is None else self._highlight_items(self._highlighted)
+        self._overlays[MESSAGE_OVERLAY] = \
+            [] if self._message is None else self._message_items(*self._message)
 
-            # The number of cells in the current row
-            cells_in_row = 5 + i
-            if i > rows // 2:
-                cells_in_row = 5 + rows - i - 1
+        self._redraw()
 
-            # Calculate the y coordinate of the current row
-            # (We deduct from the dest to make the hexagon more proportional)
-            y = (center_y - (rows - 1) * self._cells_dist / 2 +
-                 i * (self._cells_dist - 3) + 12)
+    def to_board(self, pixel: Tuple[int, int]) -> Coordinates:
+        """Return the board coordinates of the given pixel of the window
+        (of a mouse click)."""
 
-            for j in range(cells_in_row):
+        return self._viewport.to_board(pixel)
 
-                # Calculate the x coordinate of the current cell.
-                # Appending 3 to the dist to make the hexagon more proportional
-                # in the x axis.
-                x = (center_x - (cells_in_row - 1) * self._cells_dist / 2 +
-                     j * self._cells_dist)
+    def set_cursor(self, cursor: tuple) -> None:
+        """Set the mouse cursor (one of pygame.cursors)."""
 
-                # Appending the coordinates to the list of center positions
-                self._center_positions.append((x, y))
+        pygame.mouse.set_cursor(*cursor)
 
-                # Draw the cell
-                pygame.draw.circle(surface, color, (int(x), int(y)),
-                                   radius_center_cells)
+    def flip(self) -> None:
+        flip_display()
 
     def playable_colors(self) -> List[str]:
         """Return the colors of the players in the order they play."""
@@ -361,7 +372,7 @@ class InitGui:
             playable_colors.append(list(self._color_positions.keys())[num-1])
         return playable_colors
 
-    def _place_peds(self, surface: pygame.Surface, radius_peds: float) -> None:
+    def _place_peds(self) -> None:
         """Place the peds in the initial positions at the start of the game."""
 
         # Get the colors of the players in the order they play
@@ -369,126 +380,79 @@ class InitGui:
 
         for color in playable_colors:
             for position in self._color_positions[color]:
+                self._peds[position] = color
 
-                # Draw the ped inside the position of the cell
-                # (because its radius is smaller than the cell's one),
-                # and with the color of the cell but full opaque
-                try:
-                    pygame.draw.circle(surface, color,
-                                       (position[X_COORD], position[Y_COORD]),
-                                       radius_peds)
-
-                    # Adding a small frame around the circle
-                    if color != "black":
-                        pygame.draw.circle(surface, "black",
-                                           (position[X_COORD], position[Y_COORD]),
-                                           radius_peds, 1)
-
-                    else:
-                        pygame.draw.circle(surface, "white",
-                                           (position[X_COORD], position[Y_COORD]),
-                                           radius_peds, 1)
-
-                except Exception as e:
-                    print(e)
-
-        # update the screen
-        pygame.display.flip()
-
-    def update_ped(self, surface: pygame.Surface,
-                   old_position: Coordinates, updated_ped: Ped) -> None:
-        """Update the position of the ped on the screen according to the
-        given position."""
-
-        # Clear the screen
-        surface.fill((0, 0, 0, 0))
+    def show_peds(self, peds: List[Ped]) -> None:
+        """Show the given peds instead of the peds on the screen, to show
+        a position at once (of a resumed game)."""
 
-        removed = False
-        # Remove the ped from its previous position:
+        self._peds = {ped.get_location(): ped.get_color() for ped in peds}
+        self._redraw()
 
-        # if the ped was in the outer triangles
-        for color, positions in self._color_positions.items():
-            if old_position in positions:
-
-                pygame.draw.circle(surface, color,
-                                   old_position, self._radius_cells)
-                removed = True
-                break
-
-        # if the ped was in the center hexagon
-        if not removed:
-            pygame.draw.circle(surface, CENTER_CELLS_COLOR,
-                               old_position, self._radius_cells)
-
-        # Draw the peds in their new positions
-        try:
-            pygame.draw.circle(surface, updated_ped.get_color(),
-                               updated_ped.get_location(), self._radius_peds)
-
-            # Adding a small frame around the circle
-            if updated_ped.get_color() != "black":
-                pygame.draw.circle(surface, "black",
-                                   updated_ped.get_location(),
-                                   self._radius_peds, 1)
+    @timed("gui.update_ped")
+    def update_ped(self, old_position: Coordinates, updated_ped: Ped) -> None:
+        """Update the position of the ped on the screen according to the
+        given position."""
 
-            else:
-                pygame.draw.circle(surface, "white",
-                                   updated_ped.get_location(),
-                                   self._radius_peds, 1)
+        self._peds.pop(old_position, None)
+        self._peds[updated_ped.get_location()] = updated_ped.get_color()
 
-        except Exception as e:
-            print(e)
+        # Remove the ped from its previous position, move it to
+        # its new position and draw it there
+        old_rect = self._cell_rect(old_position)
+        self._ped_layer.fill((0, 0, 0, 0), old_rect)
 
-        # Blit the surface on the screen
-        self._screen.blit(surface, (0, 0))
+        self._animate_ped(old_position, updated_ped)
+        self._draw_ped(updated_ped.get_location(), updated_ped.get_color())
+        self._overlays[MOVING_OVERLAY] = []
 
         # Update the screen
-        pygame.display.flip()
+        self._compose([old_rect, self._cell_rect(updated_ped.get_location())])
 
-        # Append the current state to the list of previous states
-        self._screen_copies.append(self._screen.copy())
+    @timed("gui.animate_ped")
+    def _animate_ped(self, old_position: Coordinates, updated_ped: Ped) -> None:
+        """Move the sprite of the ped from its old position to its new one
+        on the moving overlay. Every frame composes only the rects the
+        sprite left and entered."""
 
-    def highlight_locations(self, surface: pygame.Surface,
-                            positions: List[List[Coordinates]]) -> None:
-        """Highlight the given positions on the screen."""
+        sprite = ped_sprite(updated_ped.get_color(),
+                            self._viewport.length(self._radius_peds))
 
-        # Store the previous surface
-        self._previous_state_highlight = self._screen.copy()
+        def draw_frame(point: Coordinates) -> None:
+            center = (round(point[X_COORD]), round(point[Y_COORD]))
+            self._set_overlay(MOVING_OVERLAY, [(sprite, sprite.get_rect(center=center))])
 
-        # Clear the previous highlights
-        surface.fill((0, 0, 0, 0))
+        self.animator.play(self._cell_rect(old_position).center,
+                           self._cell_rect(updated_ped.get_location()).center,
+                           draw_frame)
 
-        for move_types in positions:
-            for position in move_types:
-                pygame.draw.circle(surface, HIGHLIGHT_COLOR,
-                                   (position[X_COORD], position[Y_COORD]),
-                                   self._radius_cells, 3)
+    def _highlight_items(self, positions: List[List[Coordinates]]) -> \
+            List[Tuple[pygame.Surface, pygame.Rect]]:
+        """Return the items of the highlight overlay of the given positions."""
 
-        # Blit the highlight surface on the temp surface
-        self._screen.blit(surface, (0, 0))
-        pygame.display.flip()  # Update the display
+        sprite = highlight_sprite(self._viewport.length(self._radius_cells),
+                                  max(round(self._viewport.length(HIGHLIGHT_WIDTH)), 1))
 
-    def unhighlight_surface(self, surface: pygame.Surface) -> None:
-        """Unhighlight the possible moves in the given surface."""
+        return [(sprite, sprite.get_rect(center=self._cell_rect(position).center))
+                for move_types in positions for position in move_types]
 
-        # Clear the previous highlights
-        surface.fill((0, 0, 0, 0))
-
-        # # Blit the highlight surface on the temp surface
-        # self._temp_surface.blit(surface, (0, 0))
+    @timed("gui.highlight_locations")
+    def highlight_locations(self, positions: List[List[Coordinates]]) -> None:
+        """Highlight the given positions on the screen."""
 
-        # Restore the previous state, if needed
-        if self._previous_state_highlight is not None:
-            self._screen.blit(self._previous_state_highlight, (0, 0))
-            pygame.display.flip()  # Update the display
-            self._previous_state_highlight = None  # Reset the previous state
+        self._highlighted = positions
+        self._set_overlay(HIGHLIGHT_OVERLAY, self._highlight_items(positions))
 
-        pygame.display.flip()  # Update the display
+    @timed("gui.unhighlight_locations")
+    def unhighlight_locations(self) -> None:
+        """Unhighlight the possible moves."""
 
-    def show_message(self, message: str, purpose: int = 0) -> None:
-        """Showing a message to the user."""
+        self._highlighted = None
+        self._set_overlay(HIGHLIGHT_OVERLAY, [])
 
-        self._previous_state_message = self._screen.copy()
+    def _message_items(self, message: str, purpose: int) -> \
+            List[Tuple[pygame.Surface, pygame.Rect]]:
+        """Return the items of the message overlay of the given message."""
 
         # Split the message into lines, can be too long
         whole_text = []
@@ -518,35 +482,40 @@ class InitGui:
             # Update the y_offset, to draw the next line below the current one
             y_offset += line.get_height()
 
-        # Blit the surface on the screen
+        # Place the surface on the screen
         if purpose == PLAYER_TURNS:
 
-            self._screen.blit(text_surface, ((FRAME_WIDTH + BOARD_WIDTH) / 2,
+            x, y = self._viewport.to_screen(((FRAME_WIDTH + BOARD_WIDTH) / 2,
                                              FRAME_HEIGHT / 4))
+            text_rect = text_surface.get_rect(topleft=(round(x), round(y)))
 
         else:
 
-            self._screen.blit(text_surface,
-                              (FRAME_WIDTH / 2 - text_surface.get_width() / 2,
-                               FRAME_HEIGHT / 2 - text_surface.get_height() / 2))
+            x, y = self._viewport.to_screen((FRAME_WIDTH / 2, FRAME_HEIGHT / 2))
+            text_rect = text_surface.get_rect(center=(round(x), round(y)))
 
-        pygame.display.flip()  # Update the display
+        return [(text_surface, text_rect)]
+
+    @timed("gui.show_message")
+    def show_message(self, message: str, purpose: int = 0) -> None:
+        """Showing a message to the user."""
 
+        self._message = (message, purpose)
+        self._set_overlay(MESSAGE_OVERLAY, self._message_items(message, purpose))
+
+    @timed("gui.clear_message")
     def clear_message(self) -> None:
         """Clearing the message from the screen."""
 
-        # Restore the previous state, if needed
-        if self._previous_state_message is not None:
-            self._screen.blit(self._previous_state_message, (0, 0))
-            pygame.display.flip()  # Update the display
-            self._previous_state_message = None  # Reset the previous state
+        self._message = None
+        self._set_overlay(MESSAGE_OVERLAY, [])
 
     def is_in_opposite_home(self, ped: Ped) -> bool:
         """Check if the given ped is in the home of
          his matching opposite corner."""
 
-        ped_color = ped.get_color()
-        home_index = list(self._color_positions.keys()).index(ped_color) + 1
+        # The color index of a ped is the index of its home triangle
+        home_index = ped.get_color_index() + 1
 
         # there is 3 (len(PLAYER_ORDER[0]) / 2) because the number of
         # triangles in a hexagram is always 6, and the opposite
@@ -572,59 +541,44 @@ class InitGui:
 
         return None
 
-    def view_board_at_move(self, move_number: int) -> None:
-        """Display the board state at the specified move number."""
-
-        if move_number <= len(self._screen_copies):
-
-            # Initialize pygame, because it is not initialized yet when we
-            # are viewing the game.
-            pygame.init()
-
-            try:
-                # Clear the screen
-                self._screen.fill((0, 0, 0))
+    def get_color_positions_dict(self) -> Dict[str, List[Coordinates]]:
+        return self._color_positions
 
-            except pygame.error:
+    def get_center_positions_list(self) -> List[Coordinates]:
+        return self._center_positions
 
-                # Recreate the display surface
-                self._screen = pygame.display.set_mode((FRAME_WIDTH, FRAME_HEIGHT))
-                self._screen.fill((0, 0, 0))
+    def get_cell_distance(self) -> float:
+        return self._cells_dist
 
-            # Set the window title
-            pygame.display.set_caption(VIEWING_CAPTION)
 
-            # Blit the screen copy onto the main screen
-            self._screen.blit(self._screen_copies[move_number - 1], (0, 0))
+class HeadlessGui:
+    """The gui of a game without a display: it shows nothing, and doesn't
+    pause the game. Games own their gui, and there is only one display,
+    so games that run together in a process (of bots only) are headless."""
 
-            # Update the display
-            pygame.display.flip()
+    def __init__(self) -> None:
+        self.animator = Animator(enabled=False, paced=False)
 
-            # Keep the screen open until the user closes it
-            running = True
-            while running:
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        running = False
-                        raise SystemExit
+    def resize(self, width: int, height: int) -> None:
+        pass
 
-        else:
-            print("No screen copy available for the selected move number.")
+    def to_board(self, pixel: Tuple[int, int]) -> Coordinates:
+        return pixel
 
-    def get_color_positions_dict(self) -> Dict[str, List[Coordinates]]:
-        return self._color_positions
+    def set_cursor(self, cursor: tuple) -> None:
+        pass
 
-    def get_center_positions_list(self) -> List[Coordinates]:
-        return self._center_positions
+    def flip(self) -> None:
+        pass
 
-    def get_cell_distance(self) -> float:
-        return self._cells_dist
+    def highlight_locations(self, positions: List[List[Coordinates]]) -> None:
+        pass
 
-    def get_temp_surface(self) -> pygame.Surface:
-        return self._temp_surface
+    def unhighlight_locations(self) -> None:
+        pass
 
-    def get_highlight_surface(self) -> pygame.Surface:
-        return self._highlight_surface
+    def show_message(self, message: str, purpose: int = 0) -> None:
+        pass
 
-    def get_screen_copies(self) -> List[pygame.Surface]:
-        return self._screen_copies
+    def clear_message(self) -> None:
+        pass
@@ -0,0 +1,236 @@
+import argparse
+import functools
+import os
+from multiprocessing import Pool
+from typing import List, Tuple, Optional, Iterator, Sequence
+
+import pygame
+
+import layout
+from archive import GameArchive, GameRecord
+from board import Board
+from layout import FRAME_HEIGHT, FRAME_WIDTH
+from pygame_switch import board_background, ped_sprite
+
+Coordinates = Tuple[float, float]
+
+X_COORD = 0
+Y_COORD = 1
+
+# How long every frame of an animated GIF is shown, in milliseconds
+DEFAULT_FRAME_DURATION = 300
+
+# The scale of the thumbnails, relative to the size of the window
+DEFAULT_THUMBNAIL_SCALE = 0.4
+
+
+class BoardRenderer:
+    """Drawing positions of the game offscreen, the same way the gui draws
+    them, at any scale.
+    The board itself (the frame, the hexagram and the cells) is drawn once
+    and every ped color has a ready sprite, so drawing a position is one
+    blit of the board and one blit for every ped. No display is needed."""
+
+    def __init__(self, scale: float = 1.0) -> None:
+        self.scale = scale
+        self.size = (round(FRAME_WIDTH * scale), round(FRAME_HEIGHT * scale))
+
+        viewport = layout.Viewport(*self.size)
+        radius = viewport.length(layout.PED_RADIUS)
+
+        self._background = board_background(*self.size)
+        self._sprites = [ped_sprite(color, radius) for color in layout.color_names()]
+
+        # The top left corner of the sprite of a ped in every cell
+        half_size = self._sprites[0].get_width() // 2
+        self._corners: List[Tuple[int, int]] = []
+        for position in layout.cell_tables()[0]:
+            x, y = viewport.to_screen(position)
+            self._corners.append((round(x) - half_size, round(y) - half_size))
+
+        # The surface the positions are drawn on, reused for every frame
+        self._frame = pygame.Surface(self.size)
+
+    def render(self, occupancy: Sequence[int]) -> pygame.Surface:
+        """Draw the position of the given occupancy (see
+        Board.get_occupancy). The surface returned is reused by the
+        next call, so it should be saved or copied before that."""
+
+        frame = self._frame
+        frame.blit(self._background, (0, 0))
+
+        frame.blits([(self._sprites[value - 1], self._corners[cell])
+                     for cell, value in enumerate(occupancy) if value],
+                    doreturn=False)
+
+        return frame
+
+    def render_board(self, board: Board) -> pygame.Surface:
+        """Draw the current position of the board."""
+
+        return self.render(board.get_occupancy())
+
+
+@functools.lru_cache(maxsize=None)
+def renderer(scale: float = 1.0) -> BoardRenderer:
+    """Return a renderer of the given scale, created once per process."""
+
+    return BoardRenderer(scale)
+
+
+@functools.lru_cache(maxsize=None)
+def starting_occupancy(num_players: int) -> Tuple[int, ...]:
+    """Return the occupancy of the board at the start of a game."""
+
+    board = Board(num_players, headless=True)
+    board.place_starting_peds()
+
+    return tuple(board.get_occupancy())
+
+
+def game_occupancies(game: GameRecord) -> Iterator[List[int]]:
+    """Yield the occupancy of the board at the start of the game and after
+    every turn. The same list is updated and yielded every time."""
+
+    occupancy = list(starting_occupancy(game.players))
+    yield occupancy
+
+    for start, end in game.moves.tolist():
+        occupancy[end] = occupancy[start]
+        occupancy[start] = 0
+        yield occupancy
+
+
+def save_png(surface: pygame.Surface, file_name: str) -> None:
+    pygame.image.save(surface, file_name)
+
+
+def save_frames(game: GameRecord, out_dir: str, scale: float = 1.0) -> int:
+    """Save the positions of the game as numbered PNG files.
+    Returns the number of frames saved."""
+
+    os.makedirs(out_dir, exist_ok=True)
+    board_renderer = renderer(scale)
+
+    frames = 0
+    for frames, occupancy in enumerate(game_occupancies(game), 1):
+        save_png(board_renderer.render(occupancy),
+                 os.path.join(out_dir, f"frame_{frames - 1:04d}.png"))
+
+    return frames
+
+
+def save_gif(game: GameRecord, file_name: str, scale: float = 1.0,
+             duration: int = DEFAULT_FRAME_DURATION) -> bool:
+    """Save the game as an animated GIF, a frame for every turn.
+    Needs Pillow, returns False (and saves nothing) without it."""
+
+    try:
+        from PIL import Image
+
+    except ImportError:
+        print("Pillow is not installed, can't save a GIF.")
+        return False
+
+    board_renderer = renderer(scale)
+
+    images = [Image.frombytes("RGB", board_renderer.size,
+                              pygame.image.tobytes(board_renderer.render(occupancy),
+                                                   "RGB"))
+              for occupancy in game_occupancies(game)]
+
+    images[0].save(file_name, save_all=True, append_images=images[1:],
+                   duration=duration, loop=0, optimize=False)
+
+    return True
+
+
+def save_thumbnail(game: GameRecord, file_name: str,
+                   scale: float = DEFAULT_THUMBNAIL_SCALE) -> None:
+    """Save the final position of the game."""
+
+    occupancy = None
+    for occupancy in game_occupancies(game):
+        pass
+
+    save_png(renderer(scale).render(occupancy), file_name)
+
+
+@functools.lru_cache(maxsize=None)
+def _open_archive(archive_file: str) -> GameArchive:
+    """Open an archive once per process."""
+
+    return GameArchive(archive_file)
+
+
+def _render_task(task: Tuple[str, int, str, str, float]) -> int:
+    """Render a game of an archive (in a worker process).
+    Returns the number of images saved."""
+
+    archive_file, game_id, out_dir, kind, scale = task
+    game = _open_archive(archive_file).game(game_id)
+
+    if kind == "thumbnail":
+        save_thumbnail(game, os.path.join(out_dir, f"game_{game_id:06d}.png"), scale)
+        return 1
+
+    if kind == "gif":
+        saved = save_gif(game, os.path.join(out_dir, f"game_{game_id:06d}.gif"), scale)
+        return len(game) + 1 if saved else 0
+
+    return save_frames(game, os.path.join(out_dir, f"game_{game_id:06d}"), scale)
+
+
+def render_games(archive_file: str, game_ids: Sequence[int], out_dir: str,
+                 kind: str = "thumbnail", scale: float = DEFAULT_THUMBNAIL_SCALE,
+                 processes: Optional[int] = None) -> int:
+    """Render the given games of the archive in a pool of processes, as
+    thumbnails, frames or GIFs (by kind). Returns the number of images."""
+
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = [(archive_file, int(game_id), out_dir, kind, scale)
+             for game_id in game_ids]
+
+    with Pool(processes) as pool:
+        return sum(pool.imap_unordered(_render_task, tasks,
+                                       chunksize=max(len(tasks) // 64, 1)))
+
+
+def main() -> None:
+    """Render games of an archive."""
+
+    parser = argparse.ArgumentParser(
+        description="Render games of an archive to images, without a display.")
+    parser.add_argument("kind", choices=["thumbnail", "frames", "gif"],
+                        help="the final position of every game, a PNG for "
+                             "every turn, or an animated GIF (needs Pillow)")
+    parser.add_argument("archive")
+    parser.add_argument("out_dir")
+    parser.add_argument("-g", "--games", type=int, nargs="+", default=None,
+                        help="the ids of the games (all of them by default)")
+    parser.add_argument("-p", "--players", type=int, default=None,
+                        help="only the games of this number of players")
+    parser.add_argument("-s", "--scale", type=float, default=None,
+                        help="the size of the images relative to the window "
+                             f"({DEFAULT_THUMBNAIL_SCALE} for thumbnails, "
+                             f"1 otherwise)")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="the number of worker processes "
+                             "(the number of CPUs by default)")
+    args = parser.parse_args()
+
+    scale = args.scale
+    if scale is None:
+        scale = DEFAULT_THUMBNAIL_SCALE if args.kind == "thumbnail" else 1.0
+
+    game_ids = args.games
+    if game_ids is None:
+        game_ids = GameArchive(args.archive).filter(args.players).tolist()
+
+    images = render_games(args.archive, game_ids, args.out_dir, args.kind,
+                          scale, args.processes)
+    print(f"rendered {len(game_ids)} games, {images} images")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,418 @@
+import argparse
+import asyncio
+import itertools
+import json
+from typing import List, Dict, Optional, Any, Set
+
+from board import Board
+from layout import POSSIBLE_NUM_OF_PLAYERS
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# The most tables a connection can have created that nobody has joined yet
+MAX_WAITING_TABLES = 8
+
+# A client whose unsent messages take more than this many bytes doesn't
+# read them, so it is dropped instead of buffering them without a limit
+MAX_WRITE_BUFFER = 256 * 1024
+
+REQUEST_TYPES = ["create", "join", "state", "move", "pass", "leave"]
+
+Message = Dict[str, Any]
+
+
+def encode(message: Message) -> bytes:
+    """Encode a message as a line of compact JSON."""
+
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+
+class Table:
+    """A game hosted by the server.
+    The game state lives in a headless board, and every turn is checked
+    with the board's rules before it is applied. Cells are sent as their
+    indices in the board's positions."""
+
+    def __init__(self, table_id: int, num_players: int) -> None:
+
+        self.table_id = table_id
+        self.num_players = num_players
+
+        self.board = Board(num_players, headless=True)
+        self.board.place_starting_peds()
+
+        self._positions = self.board.get_all_positions()
+        self._colors = self.board.playable_colors()
+
+        # The writers of the players at each seat
+        self.seats: List[Optional[asyncio.StreamWriter]] = [None] * num_players
+
+        self.turn = 0  # The seat of the player to move
+        self.moves = 0
+        self.winner: Optional[int] = None
+
+        # The number of players that passed in a row, having no legal turn.
+        # When all of them did, nobody can move, and the game is a draw
+        self.passes = 0
+        self.draw = False
+
+    def is_full(self) -> bool:
+        return all(writer is not None for writer in self.seats)
+
+    def join(self, writer: asyncio.StreamWriter) -> Optional[int]:
+        """Seat the player at the first free seat and return the seat,
+        or None if the table is full."""
+
+        for seat, seat_writer in enumerate(self.seats):
+            if seat_writer is None:
+                self.seats[seat] = writer
+                return seat
+
+        return None
+
+    def leave(self, writer: asyncio.StreamWriter) -> None:
+        """Free the seats of the given player."""
+
+        self.seats = [None if seat_writer is writer else seat_writer
+                      for seat_writer in self.seats]
+
+    def state(self) -> Message:
+        """Return the whole state of the table."""
+
+        return {"table": self.table_id,
+                "players": self.num_players,
+                "turn": self.turn,
+                "moves": self.moves,
+                "winner": self.winner,
+                "draw": self.draw,
+                "cells": self.board.get_occupancy()}
+
+    def is_over(self) -> bool:
+        return self.winner is not None or self.draw
+
+    def _check_turn(self, seat: int) -> Optional[str]:
+        """Return the reason the player at the given seat can't play now,
+        or None if it's its turn."""
+
+        if self.is_over():
+            return "The game is over"
+
+        if not self.is_full():
+            return "The table is not full yet"
+
+        if seat != self.turn:
+            return "Not your turn"
+
+        return None
+
+    def play(self, seat: int, path: List[int]) -> Optional[str]:
+        """Make the turn of the player at the given seat through the given
+        cells. Returns the reason if the turn is invalid, None otherwise."""
+
+        error = self._check_turn(seat)
+        if error is not None:
+            return error
+
+        if not all(isinstance(cell, int) and 0 <= cell < len(self._positions)
+                   for cell in path):
+            return "Invalid cells"
+
+        locations = [self._positions[cell] for cell in path]
+
+        try:
+            ped = self.board.get_ped_by_location(locations[0])
+
+        except (KeyError, IndexError):
+            return "No ped at the start of the path"
+
+        if ped.get_color() != self._colors[seat]:
+            return "Not your ped"
+
+        if not self.board.is_valid_turn(locations):
+            return "Invalid move"
+
+        self.board.relocate_ped(ped, locations[-1])
+        self.moves += 1
+        self.passes = 0
+
+        if self.board.has_won(self._colors[seat]):
+            self.winner = seat
+        else:
+            self.turn = (self.turn + 1) % self.num_players
+
+        return None
+
+    def pass_turn(self, seat: int) -> Optional[str]:
+        """Pass the turn of the player at the given seat, which is allowed
+        only if it has no legal turn. Returns the reason if it can't pass,
+        None otherwise."""
+
+        error = self._check_turn(seat)
+        if error is not None:
+            return error
+
+        if any(self.board.find_turns(location) for location in
+               self.board.get_peds_locations_by_color(self._colors[seat])):
+            return "You have a legal turn"
+
+        self.passes += 1
+        if self.passes == self.num_players:
+            self.draw = True
+        else:
+            self.turn = (self.turn + 1) % self.num_players
+
+        return None
+
+    def is_empty(self) -> bool:
+        return all(writer is None for writer in self.seats)
+
+    def broadcast(self, message: Message) -> None:
+        """Send the message to all the players at the table. A player that
+        is too far behind reading its messages is disconnected."""
+
+        data = encode(message)
+        for writer in set(self.seats):
+            if writer is None or writer.is_closing():
+                continue
+
+            if writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+                # Aborting the connection (closing it would wait for the
+                # buffer to be sent) ends its handler, which takes the
+                # player out of its tables
+                writer.transport.abort()
+                continue
+
+            writer.write(data)
+
+
+class GameServer:
+    """Hosting many tables over a single asyncio loop.
+    The protocol is a line of JSON per message, in both directions.
+    Requests are {"type": "create", "players": n},
+    {"type": "join", "table": t}, {"type": "move", "table": t, "path": [cells]},
+    {"type": "pass", "table": t} (only without a legal turn),
+    {"type": "state", "table": t} and {"type": "leave", "table": t}.
+    After every move, the players at the table get only the delta:
+    the seat, the path of cells, and the next seat to move. After a pass
+    they get the seat, the next seat to move, and whether the game ended
+    in a draw (when all the players passed one after the other)."""
+
+    def __init__(self) -> None:
+        self.tables: Dict[int, Table] = {}
+        self._table_ids = itertools.count(1)
+
+        # The seats of every connected player at every table
+        self._seats: Dict[asyncio.StreamWriter, Dict[int, int]] = {}
+
+        # The tables every connected player created, closed with its
+        # connection if nobody has joined them
+        self._created: Dict[asyncio.StreamWriter, Set[int]] = {}
+
+    async def handle_client(self, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter) -> None:
+        """Serve a single connection until it is closed."""
+
+        self._seats[writer] = {}
+        self._created[writer] = set()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                try:
+                    request = json.loads(line)
+                    response = self.handle_request(writer, request)
+
+                except (json.JSONDecodeError, AttributeError,
+                        TypeError, KeyError, ValueError):
+                    response = {"type": "error", "message": "Invalid request"}
+
+                if response is not None:
+                    writer.write(encode(response))
+
+                await writer.drain()
+
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+
+        finally:
+            self._disconnect(writer)
+            writer.close()
+
+    def handle_request(self, writer: asyncio.StreamWriter,
+                       request: Message) -> Optional[Message]:
+        """Handle a single request, and return the response to the sender
+        (if there is one)."""
+
+        request_type = request.get("type")
+
+        if request_type not in REQUEST_TYPES:
+            return {"type": "error", "message": "Unknown request type"}
+
+        if request_type == "create":
+            num_players = int(request.get("players", 2))
+            if num_players not in POSSIBLE_NUM_OF_PLAYERS:
+                return {"type": "error", "message": "Invalid number of players"}
+
+            created = self._created[writer]
+            waiting = [table_id for table_id in created
+                       if table_id in self.tables and self.tables[table_id].is_empty()]
+            if len(waiting) >= MAX_WAITING_TABLES:
+                return {"type": "error",
+                        "message": "Too many tables nobody has joined"}
+
+            table = Table(next(self._table_ids), num_players)
+            self.tables[table.table_id] = table
+
+            # Forget the created tables that were closed since
+            created.intersection_update(self.tables)
+            created.add(table.table_id)
+            return {"type": "created", "table": table.table_id}
+
+        table = self.tables.get(request.get("table"))
+        if table is None:
+            return {"type": "error", "message": "No such table"}
+
+        if request_type == "join":
+
+            # A player takes a single seat at a table, since its requests
+            # can only be for one seat
+            if table.table_id in self._seats[writer]:
+                return {"type": "error", "message": "Already seated at the table",
+                        "table": table.table_id}
+
+            seat = table.join(writer)
+            if seat is None:
+                return {"type": "error", "message": "The table is full",
+                        "table": table.table_id}
+
+            self._seats[writer][table.table_id] = seat
+            writer.write(encode({"type": "joined", "seat": seat,
+                                 "state": table.state()}))
+
+            if table.is_full():
+                table.broadcast({"type": "started", "table": table.table_id,
+                                 "turn": table.turn})
+            return None
+
+        if request_type == "state":
+            return {"type": "state", "state": table.state()}
+
+        seat = self._seats[writer].get(table.table_id)
+        if seat is None:
+            return {"type": "error", "message": "Not seated at the table",
+                    "table": table.table_id}
+
+        if request_type == "move":
+            path = list(request["path"])
+            error = table.play(seat, path)
+            if error is not None:
+                return {"type": "error", "message": error,
+                        "table": table.table_id}
+
+            table.broadcast({"type": "moved", "table": table.table_id,
+                             "seat": seat, "path": path, "turn": table.turn,
+                             "winner": table.winner})
+
+            if table.winner is not None:
+                self._close_table(table)
+            return None
+
+        if request_type == "pass":
+            error = table.pass_turn(seat)
+            if error is not None:
+                return {"type": "error", "message": error,
+                        "table": table.table_id}
+
+            table.broadcast({"type": "passed", "table": table.table_id,
+                             "seat": seat, "turn": table.turn,
+                             "draw": table.draw})
+
+            if table.draw:
+                self._close_table(table)
+            return None
+
+        # else, the player leaves the table
+        self._leave(writer, table)
+        return {"type": "left", "table": table.table_id}
+
+    def _leave(self, writer: asyncio.StreamWriter, table: Table) -> None:
+        """Take the player out of the table, and close the table if the
+        game can't go on."""
+
+        table.leave(writer)
+        self._seats[writer].pop(table.table_id, None)
+
+        if table.table_id in self.tables and table.moves > 0:
+            table.broadcast({"type": "abandoned", "table": table.table_id})
+            self._close_table(table)
+
+        elif table.is_empty():
+            self._close_table(table)
+
+    def _close_table(self, table: Table) -> None:
+        """Remove the table from the server."""
+
+        self.tables.pop(table.table_id, None)
+
+        for seat_writer in set(table.seats):
+            if seat_writer is not None and seat_writer in self._seats:
+                self._seats[seat_writer].pop(table.table_id, None)
+
+    def _disconnect(self, writer: asyncio.StreamWriter) -> None:
+        """Take the player out of all of its tables, and close the tables
+        it created that nobody has joined."""
+
+        table_ids: Set[int] = set(self._seats.get(writer, {}))
+        for table_id in table_ids:
+            table = self.tables.get(table_id)
+            if table is not None:
+                self._leave(writer, table)
+
+        for table_id in self._created.pop(writer, set()):
+            table = self.tables.get(table_id)
+            if table is not None and table.is_empty():
+                self._close_table(table)
+
+        self._seats.pop(writer, None)
+
+    async def serve(self, host: str = DEFAULT_HOST,
+                    port: int = DEFAULT_PORT) -> asyncio.AbstractServer:
+        """Start listening, and return the asyncio server."""
+
+        return await asyncio.start_server(self.handle_client, host, port)
+
+
+async def run_server(host: str, port: int) -> None:
+    """Run the game server until it is stopped."""
+
+    server = await GameServer().serve(host, port)
+
+    address = server.sockets[0].getsockname()
+    print(f"Serving Chinese Checkers on {address[0]}:{address[1]}")
+
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    """Run the game server from the command line."""
+
+    parser = argparse.ArgumentParser(
+        description="Host many Chinese Checkers tables over TCP.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run_server(args.host, args.port))
+
+    except KeyboardInterrupt:
+        print("Goodbye!")
+
+
+if __name__ == "__main__":
+    main()
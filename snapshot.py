@@ -0,0 +1,142 @@
+import os
+import struct
+from typing import Tuple, Optional, NamedTuple, Any
+
+from logwriter import replace_file
+
+# A snapshot file starts with a header: a magic, the version, the number of
+# players, the seat of the player to move, the bots mask (bit i is set if
+# the player at seat i is a bot), the number of cells, the number of turns
+# made, the seed of the game and the length of the name of the log file.
+# The occupancy of the cells follows it (a byte each, see
+# Board.get_occupancy), then the state of the random generator of the bots,
+# the name of the log file (empty if the game has no log), and the kind of
+# the player at every seat, a byte each (see players.PLAYER_KINDS). The
+# snapshots of version 1 have no kinds, their bots are greedy.
+HEADER = struct.Struct("<4sH BBBB Iq H")
+MAGIC = b"CCSS"
+VERSION = 2
+VERSIONS = (1, 2)
+
+# The seed is kept as a signed 64-bit integer, so a game can only be
+# seeded with one in this range
+MIN_SEED = -2 ** 63
+MAX_SEED = 2 ** 63 - 1
+
+# The state of a random.Random: the version of the generator, the 624 words
+# of the Mersenne Twister and its position, and the Gaussian it kept, if any
+MT_WORDS = 625
+RNG_STATE = struct.Struct(f"<B{MT_WORDS}I ?d")
+
+# The snapshot of a game is saved next to its log, with this suffix instead
+SNAPSHOT_SUFFIX = ".snapshot"
+
+
+class GameSnapshot(NamedTuple):
+    """Everything it takes to go on with a game from where it stopped,
+    without replaying its moves: the position, the player to move, who
+    plays, and the random generator of the bots."""
+
+    players: int
+    to_move: int  # The seat of the player to move
+    bots: int  # Bit i is set if the player at seat i is a bot
+    turns: int  # The number of turns made so far
+    seed: int
+    rng_state: Tuple[Any, ...]  # As returned from random.Random.getstate
+    occupancy: Tuple[int, ...]  # As returned from Board.get_occupancy
+    log_file: str = ""
+    kinds: Tuple[int, ...] = ()  # The kind of every seat, empty if not kept
+
+    def is_bot(self, seat: int) -> bool:
+        return bool(self.bots >> seat & 1)
+
+    def real_players(self) -> int:
+        """Return the number of human players."""
+
+        return sum(not self.is_bot(seat) for seat in range(self.players))
+
+    def to_bytes(self) -> bytes:
+        """Return the snapshot in the format of a snapshot file."""
+
+        log_file = self.log_file.encode()
+
+        version, words, gauss = self.rng_state
+        header = HEADER.pack(MAGIC, VERSION, self.players, self.to_move, self.bots,
+                             len(self.occupancy), self.turns, self.seed, len(log_file))
+
+        return b"".join([header, bytes(self.occupancy),
+                         RNG_STATE.pack(version, *words, gauss is not None,
+                                        gauss if gauss is not None else 0.0),
+                         log_file, bytes(self.kinds)])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'GameSnapshot':
+        """Read a snapshot from the contents of a snapshot file."""
+
+        try:
+            magic, version, players, to_move, bots, num_cells, turns, seed, \
+                name_length = HEADER.unpack_from(data)
+
+            if magic != MAGIC or version not in VERSIONS:
+                raise ValueError("Not a game snapshot")
+
+            offset = HEADER.size
+            occupancy = tuple(data[offset:offset + num_cells])
+            offset += num_cells
+
+            rng_version, *words, has_gauss, gauss = RNG_STATE.unpack_from(data, offset)
+            offset += RNG_STATE.size
+
+        except struct.error:
+            raise ValueError("The snapshot is cut short")
+
+        log_file = data[offset:offset + name_length].decode()
+        kinds = tuple(data[offset + name_length:]) if version > 1 else ()
+
+        if len(occupancy) != num_cells or len(log_file.encode()) != name_length:
+            raise ValueError("The snapshot is cut short")
+
+        if len(kinds) not in (0, players):
+            raise ValueError("The snapshot has kinds for the wrong seats")
+
+        return cls(players, to_move, bots, turns, seed,
+                   (rng_version, tuple(words), gauss if has_gauss else None),
+                   occupancy, log_file, kinds)
+
+
+def check_seed(seed: int) -> int:
+    """Return the seed if a snapshot can keep it, else raise ValueError."""
+
+    if not MIN_SEED <= seed <= MAX_SEED:
+        raise ValueError(f"The seed must be between {MIN_SEED} and {MAX_SEED}")
+
+    return seed
+
+
+def snapshot_file_name(log_file: str) -> str:
+    """Return the name of the snapshot file of the game of the log file."""
+
+    return os.path.splitext(log_file)[0] + SNAPSHOT_SUFFIX
+
+
+def save_snapshot(snapshot: GameSnapshot, file_name: str) -> None:
+    """Save the snapshot, replacing the file at once, so a game stopped
+    while saving keeps its previous snapshot."""
+
+    replace_file(file_name, snapshot.to_bytes())
+
+
+def load_snapshot(file_name: str) -> GameSnapshot:
+    with open(file_name, "rb") as f:
+        return GameSnapshot.from_bytes(f.read())
+
+
+def find_snapshot(log_file: str) -> Optional[GameSnapshot]:
+    """Return the snapshot of the game of the log file, or None if the
+    game has none (games from before snapshots were saved)."""
+
+    file_name = snapshot_file_name(log_file)
+    if not os.path.exists(file_name):
+        return None
+
+    return load_snapshot(file_name)
@@ -0,0 +1,225 @@
+import struct
+import threading
+from collections import deque
+from typing import List, Tuple, Optional, Union, NamedTuple, Iterator, Sequence
+
+# The most messages waiting for a spectator before it's considered too slow
+DEFAULT_QUEUE_SIZE = 256
+
+# A delta as bytes: the move number, the seat, and the start and end cells
+DELTA = struct.Struct("<IBBB")
+
+
+class Delta(NamedTuple):
+    """A move applied to the board: the ped of the player at the seat
+    moved from the start cell to the end cell. A turn of a few hops is a
+    delta for every hop."""
+
+    move: int  # The number of the move, counting from 1
+    seat: int
+    start: int
+    end: int
+
+    def to_bytes(self) -> bytes:
+        return DELTA.pack(*self)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Delta':
+        return cls(*DELTA.unpack(data))
+
+
+class Snapshot(NamedTuple):
+    """The whole position after the given number of moves, sent to a new
+    spectator, and to a spectator that fell behind instead of the deltas
+    it missed."""
+
+    move: int
+    occupancy: Tuple[int, ...]  # As returned from Board.get_occupancy
+
+
+Message = Union[Delta, Snapshot]
+
+
+class Subscription:
+    """The queue of the messages to a single spectator.
+    The spectator takes them from its own thread with get, or by iterating
+    over the subscription until the hub is closed."""
+
+    __slots__ = ("queue_size", "dropped", "_queue", "_ready", "_closed")
+
+    def __init__(self, queue_size: int, snapshot: Snapshot) -> None:
+        self.queue_size = queue_size
+
+        # The number of times the spectator fell behind, and its queue
+        # was replaced with a snapshot
+        self.dropped = 0
+
+        self._queue: deque = deque([snapshot])
+        self._ready = threading.Event()
+        self._ready.set()
+        self._closed = False
+
+    def _put(self, message: Message) -> None:
+        """Add a message (from the thread of the game)."""
+
+        self._queue.append(message)
+
+        # Setting the event takes a lock, and it's still set if the
+        # spectator hasn't waited since the last message
+        if not self._ready.is_set():
+            self._ready.set()
+
+    def _replace(self, snapshot: Snapshot) -> None:
+        """Drop the waiting messages and add a snapshot instead."""
+
+        self._queue.clear()
+        self._queue.append(snapshot)
+        self.dropped += 1
+        self._ready.set()
+
+    def _close(self) -> None:
+        self._closed = True
+        self._ready.set()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Message]:
+        """Return the next message, waiting for it up to the timeout
+        (forever if None). Returns None if there's no message in time,
+        or if the hub was closed and all the messages were taken."""
+
+        while True:
+            try:
+                return self._queue.popleft()
+
+            except IndexError:
+                pass
+
+            if self._closed:
+                return None
+
+            self._ready.clear()
+
+            # A message may have come in before the event was cleared
+            if self._queue or self._closed:
+                continue
+
+            if not self._ready.wait(timeout):
+                return None
+
+    def __iter__(self) -> Iterator[Message]:
+        while True:
+            message = self.get()
+            if message is None:
+                return
+
+            yield message
+
+
+class SpectatorHub:
+    """Sending the moves of a game to any number of spectators.
+    Publishing never waits for a spectator: every spectator has a bounded
+    queue, and when a slow spectator's queue is full, the messages it
+    didn't take are replaced with a single snapshot of the position, so
+    it catches up at once. A move costs the game an append for every
+    spectator, and a copy of the position only for one that fell behind."""
+
+    def __init__(self, occupancy: Sequence[int],
+                 queue_size: int = DEFAULT_QUEUE_SIZE) -> None:
+        self.queue_size = queue_size
+
+        self._occupancy = list(occupancy)
+        self._moves = 0
+
+        self._subscriptions: List[Subscription] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def snapshot(self) -> Snapshot:
+        """Return the current position."""
+
+        with self._lock:
+            return Snapshot(self._moves, tuple(self._occupancy))
+
+    def subscribe(self, queue_size: Optional[int] = None) -> Subscription:
+        """Add a spectator. Its first message is the current position."""
+
+        with self._lock:
+            subscription = Subscription(
+                queue_size if queue_size is not None else self.queue_size,
+                Snapshot(self._moves, tuple(self._occupancy)))
+
+            if self._closed:
+                subscription._close()
+            else:
+                self._subscriptions.append(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+        subscription._close()
+
+    def publish(self, seat: int, start: int, end: int) -> None:
+        """Send a move of the ped of the player at the seat, from the
+        start cell to the end cell, to all the spectators."""
+
+        with self._lock:
+            self._occupancy[end] = self._occupancy[start]
+            self._occupancy[start] = 0
+            self._moves += 1
+
+            delta = Delta(self._moves, seat, start, end)
+            snapshot = None
+
+            for subscription in self._subscriptions:
+                if len(subscription) < subscription.queue_size:
+                    subscription._put(delta)
+                    continue
+
+                # The spectator is too slow, it gets the position instead
+                if snapshot is None:
+                    snapshot = Snapshot(self._moves, tuple(self._occupancy))
+
+                subscription._replace(snapshot)
+
+    def close(self) -> None:
+        """End the game: the spectators get the messages left, and then
+        their subscriptions end."""
+
+        with self._lock:
+            self._closed = True
+            subscriptions, self._subscriptions = self._subscriptions, []
+
+        for subscription in subscriptions:
+            subscription._close()
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+
+class SpectatorView:
+    """The position a spectator sees, kept up to date from its messages."""
+
+    def __init__(self) -> None:
+        self.occupancy: List[int] = []
+        self.move = 0
+
+    def apply(self, message: Message) -> List[int]:
+        """Apply a message and return the cells that changed (all of them
+        for a snapshot)."""
+
+        if isinstance(message, Snapshot):
+            self.occupancy = list(message.occupancy)
+            self.move = message.move
+            return list(range(len(self.occupancy)))
+
+        self.occupancy[message.end] = self.occupancy[message.start]
+        self.occupancy[message.start] = 0
+        self.move = message.move
+
+        return [message.start, message.end]
@@ -0,0 +1,313 @@
+import argparse
+import csv
+import fnmatch
+import json
+import os
+import time
+from collections import Counter
+from multiprocessing import Pool
+from typing import List, Tuple, Dict, Optional, Any
+
+import layout
+from layout import POSSIBLE_NUM_OF_PLAYERS, PLAYER_ORDER
+from archive import read_log_turns, identify_game, header_players, NO_WINNER
+
+Coordinates = Tuple[float, float]
+
+DEFAULT_PATTERN = "game_log_*.txt"
+
+# The logs are handed to the workers in batches. After every batch the
+# statistics are saved to the checkpoint, so an import can go on from it.
+DEFAULT_BATCH_SIZE = 1000
+
+# How often the progress is printed, in seconds
+PROGRESS_INTERVAL = 2.0
+
+# The summary of a game sent back from a worker: the number of players,
+# the winner seat, the number of turns and the number of turns by the
+# number of hops in them (0 for a neighbor move)
+GameSummary = Tuple[int, int, int, Dict[int, int]]
+
+
+def find_logs(directory: str, pattern: str = DEFAULT_PATTERN) -> List[str]:
+    """Return the paths of all the log files under the directory, sorted,
+    so the order is the same every time (checkpoints rely on it)."""
+
+    logs = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for file_name in sorted(files):
+            if fnmatch.fnmatch(file_name, pattern):
+                logs.append(os.path.join(root, file_name))
+
+    return logs
+
+
+def _hops_of(path: List[Coordinates], cells: Dict[Coordinates, int],
+             neighbors: Tuple[Tuple[int, ...], ...]) -> int:
+    """Return the number of hops in the turn, 0 for a neighbor move."""
+
+    if len(path) == 2 and cells[path[1]] in neighbors[cells[path[0]]]:
+        return 0
+
+    return len(path) - 1
+
+
+def summarize_log(log_file: str) -> Optional[GameSummary]:
+    """Read a game from a log file (in a worker process) and return its
+    summary, or None if the log doesn't hold a valid game."""
+
+    positions, neighbors, _ = layout.cell_tables()
+    cells = {location: cell for cell, location in enumerate(positions)}
+
+    try:
+        turns, players = read_log_turns(log_file)
+        game = identify_game(turns, players, header_players(log_file))
+
+        if game is None:
+            return None
+
+        hops = Counter(_hops_of(path, cells, neighbors) for path in turns)
+
+    # A record without a field, or with a player or a location that can't
+    # be read, makes the whole log invalid (and mustn't stop the worker)
+    except (OSError, ValueError, KeyError, IndexError):
+        return None
+
+    _, num_players, winner, _ = game
+
+    return num_players, winner, len(turns), dict(hops)
+
+
+class LogStats:
+    """The statistics of many games, by the number of players."""
+
+    def __init__(self) -> None:
+        self.logs = 0  # The number of logs read, valid or not
+        self.skipped = 0
+
+        self.games: Counter = Counter()
+        self.finished: Counter = Counter()
+        self.turns: Counter = Counter()
+        self.hops: Counter = Counter()  # The number of turns by their hops
+
+        # The wins of every seat, by the number of players
+        self.wins: Dict[int, List[int]] = {
+            num_players: [0] * num_players for num_players in POSSIBLE_NUM_OF_PLAYERS}
+
+    def add(self, summary: Optional[GameSummary]) -> None:
+        """Add the summary of a game (None for a log that was skipped)."""
+
+        self.logs += 1
+        if summary is None:
+            self.skipped += 1
+            return
+
+        num_players, winner, num_turns, hops = summary
+
+        self.games[num_players] += 1
+        self.turns[num_players] += num_turns
+        self.hops.update(hops)
+
+        if winner != NO_WINNER:
+            self.finished[num_players] += 1
+            self.wins[num_players][winner] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the statistics as a dict that can be saved as JSON."""
+
+        by_players = {}
+        for num_players in POSSIBLE_NUM_OF_PLAYERS:
+            games = self.games[num_players]
+            finished = self.finished[num_players]
+            order = next(order for order in PLAYER_ORDER if len(order) == num_players)
+
+            by_players[str(num_players)] = {
+                "games": games,
+                "finished": finished,
+                "turns": self.turns[num_players],
+                "average_length": self.turns[num_players] / games if games else 0.0,
+                "seats": [{"seat": seat,
+                           "triangle": order[seat],
+                           "wins": wins,
+                           "win_rate": wins / finished if finished else 0.0}
+                          for seat, wins in enumerate(self.wins[num_players])]
+            }
+
+        games = sum(self.games.values())
+        turns = sum(self.turns.values())
+
+        return {"logs": self.logs,
+                "skipped": self.skipped,
+                "games": games,
+                "turns": turns,
+                "average_length": turns / games if games else 0.0,
+                "hop_chains": {str(hops): count
+                               for hops, count in sorted(self.hops.items())},
+                "players": by_players}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'LogStats':
+        """Create the statistics from the dict returned by to_dict."""
+
+        stats = cls()
+        stats.logs = data["logs"]
+        stats.skipped = data["skipped"]
+        stats.hops = Counter({int(hops): count
+                              for hops, count in data["hop_chains"].items()})
+
+        for key, players_data in data["players"].items():
+            num_players = int(key)
+            stats.games[num_players] = players_data["games"]
+            stats.finished[num_players] = players_data["finished"]
+            stats.turns[num_players] = players_data["turns"]
+            stats.wins[num_players] = [seat["wins"] for seat in players_data["seats"]]
+
+        return stats
+
+    def rows(self) -> List[Tuple[str, str, str, float]]:
+        """Return the statistics as (metric, players, key, value) rows."""
+
+        data = self.to_dict()
+        rows = [("logs", "", "", data["logs"]),
+                ("skipped", "", "", data["skipped"]),
+                ("games", "", "", data["games"]),
+                ("turns", "", "", data["turns"]),
+                ("average_length", "", "", data["average_length"])]
+
+        rows.extend(("hop_chain", "", hops, count)
+                    for hops, count in data["hop_chains"].items())
+
+        for num_players, players_data in data["players"].items():
+            for metric in ["games", "finished", "turns", "average_length"]:
+                rows.append((metric, num_players, "", players_data[metric]))
+
+            for seat in players_data["seats"]:
+                rows.append(("wins", num_players, str(seat["seat"]), seat["wins"]))
+                rows.append(("win_rate", num_players, str(seat["seat"]),
+                             seat["win_rate"]))
+
+        return rows
+
+
+def load_checkpoint(checkpoint_file: Optional[str],
+                    logs: List[str]) -> Tuple[int, LogStats]:
+    """Return the number of logs already done and their statistics, from
+    the checkpoint file if it matches the logs, or from the start."""
+
+    if checkpoint_file is None or not os.path.exists(checkpoint_file):
+        return 0, LogStats()
+
+    with open(checkpoint_file) as f:
+        checkpoint = json.load(f)
+
+    done = checkpoint["done"]
+
+    # The logs must be the same as when the checkpoint was saved
+    if done > len(logs) or (done and logs[done - 1] != checkpoint["last_log"]):
+        print("The checkpoint doesn't match the logs, starting over")
+        return 0, LogStats()
+
+    return done, LogStats.from_dict(checkpoint["stats"])
+
+
+def save_checkpoint(checkpoint_file: str, logs: List[str], done: int,
+                    stats: LogStats) -> None:
+    """Save the statistics of the logs done so far.
+    The file is replaced at once, so a crash can't leave half of it."""
+
+    temp_file = checkpoint_file + ".tmp"
+    with open(temp_file, "w") as f:
+        json.dump({"done": done,
+                   "last_log": logs[done - 1] if done else None,
+                   "stats": stats.to_dict()}, f)
+
+    os.replace(temp_file, checkpoint_file)
+
+
+def aggregate(logs: List[str], processes: Optional[int] = None,
+              batch_size: int = DEFAULT_BATCH_SIZE,
+              checkpoint_file: Optional[str] = None,
+              quiet: bool = False) -> LogStats:
+    """Read all the logs in a pool of processes and return their statistics,
+    going on from the checkpoint if there is one."""
+
+    done, stats = load_checkpoint(checkpoint_file, logs)
+    if done and not quiet:
+        print(f"Going on from the checkpoint, {done} of {len(logs)} logs done")
+
+    start = time.perf_counter()
+    last_report = start
+    done_at_start = done
+
+    with Pool(processes) as pool:
+        while done < len(logs):
+            batch = logs[done:done + batch_size]
+
+            for summary in pool.imap_unordered(summarize_log, batch,
+                                               chunksize=max(len(batch) // 64, 1)):
+                stats.add(summary)
+                done += 1
+
+                now = time.perf_counter()
+                if not quiet and now - last_report >= PROGRESS_INTERVAL:
+                    rate = (done - done_at_start) / (now - start)
+                    print(f"{done}/{len(logs)} logs  {rate:.0f} logs/s  "
+                          f"eta {(len(logs) - done) / rate:.0f}s")
+                    last_report = now
+
+            if checkpoint_file is not None:
+                save_checkpoint(checkpoint_file, logs, done, stats)
+
+    return stats
+
+
+def write_csv(stats: LogStats, csv_file: str) -> None:
+    with open(csv_file, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["metric", "players", "key", "value"])
+        writer.writerows(stats.rows())
+
+
+def main() -> None:
+    """Aggregate the statistics of a directory of logs."""
+
+    parser = argparse.ArgumentParser(
+        description="Read a directory of game logs in parallel and "
+                    "aggregate their statistics.")
+    parser.add_argument("directory")
+    parser.add_argument("--pattern", default=DEFAULT_PATTERN,
+                        help="the file name pattern of the logs")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="the number of worker processes "
+                             "(the number of CPUs by default)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="the number of logs between checkpoints")
+    parser.add_argument("--checkpoint", default=None,
+                        help="a file to save the progress to, and to go on "
+                             "from if it exists")
+    parser.add_argument("--json", default=None, help="a file to save the "
+                                                     "statistics to as JSON")
+    parser.add_argument("--csv", default=None, help="a file to save the "
+                                                    "statistics to as CSV")
+    parser.add_argument("-q", "--quiet", action="store_true")
+    args = parser.parse_args()
+
+    logs = find_logs(args.directory, args.pattern)
+    stats = aggregate(logs, args.processes, args.batch_size, args.checkpoint,
+                      args.quiet)
+
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump(stats.to_dict(), f, indent=2)
+
+    if args.csv is not None:
+        write_csv(stats, args.csv)
+
+    data = stats.to_dict()
+    print(f"{data['games']} games ({data['skipped']} logs skipped), "
+          f"{data['turns']} turns, {data['average_length']:.1f} turns per game")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+import argparse
+import functools
+import math
+import sys
+import threading
+import time
+from typing import List, Tuple, Optional, Sequence, TextIO
+
+import funcs
+import layout
+from spectator import SpectatorHub, SpectatorView, Subscription
+
+X_COORD = 0
+Y_COORD = 1
+
+ROW = 0
+COLUMN = 1
+
+# The step on the text grid (rows, columns) to the neighbor of a cell in
+# each of the six directions, clockwise from the right (y grows downward).
+# The cells of a row are two columns apart, so the rows of the star
+# interleave like they do on the board.
+DIRECTION_STEPS = [(0, 2), (1, 1), (1, -1), (0, -2), (-1, -1), (-1, 1)]
+
+# The characters of the cells
+PED_GLYPH = "●"
+EMPTY_GLYPH = "·"
+PLAIN_EMPTY_GLYPH = "."  # Without colors, a ped is the number of its color
+
+# ANSI escape sequences
+ESCAPE = "\x1b["
+RESET = ESCAPE + "0m"
+DIM = ESCAPE + "2m"
+CLEAR_SCREEN = ESCAPE + "2J"
+CLEAR_LINE = ESCAPE + "K"
+HIDE_CURSOR = ESCAPE + "?25l"
+SHOW_CURSOR = ESCAPE + "?25h"
+
+# The number of lines between the board and the status line under it
+STATUS_GAP = 1
+
+# The pause after every move when watching a game, in seconds
+DEFAULT_WATCH_DELAY = 0.1
+
+
+@functools.lru_cache(maxsize=None)
+def cell_grid() -> Tuple[Tuple[int, int], ...]:
+    """Return the place of every cell on the text grid, as (row, column)
+    counting from 0 at the top left.
+    The positions of the cells on the board are tuned by hand, so they are
+    not a clean lattice. Instead, the cells are walked through from the
+    first one, and every neighbor is placed one step from its cell, in the
+    direction of the neighbor rounded to a multiple of 60 degrees."""
+
+    positions, neighbors, _ = layout.cell_tables()
+
+    grid = {0: (0, 0)}
+    queue = [0]
+
+    while queue:
+        cell = queue.pop(0)
+        row, column = grid[cell]
+
+        for neighbor in neighbors[cell]:
+            angle = math.degrees(math.atan2(
+                positions[neighbor][Y_COORD] - positions[cell][Y_COORD],
+                positions[neighbor][X_COORD] - positions[cell][X_COORD]))
+            step_row, step_column = DIRECTION_STEPS[round(angle / 60) % 6]
+            place = (row + step_row, column + step_column)
+
+            if neighbor not in grid:
+                grid[neighbor] = place
+                queue.append(neighbor)
+
+            elif grid[neighbor] != place:
+                raise ValueError("The cells don't fit on a grid", neighbor)
+
+    if len(grid) != len(positions) or len(set(grid.values())) != len(positions):
+        raise ValueError("The cells don't fit on a grid")
+
+    top = min(row for row, _ in grid.values())
+    left = min(column for _, column in grid.values())
+
+    return tuple((grid[cell][ROW] - top, grid[cell][COLUMN] - left)
+                 for cell in range(len(positions)))
+
+
+@functools.lru_cache(maxsize=None)
+def grid_size() -> Tuple[int, int]:
+    """Return the number of rows and columns of the text grid."""
+
+    grid = cell_grid()
+    return (max(row for row, _ in grid) + 1,
+            max(column for _, column in grid) + 1)
+
+
+@functools.lru_cache(maxsize=None)
+def home_triangles() -> Tuple[int, ...]:
+    """Return the index of the triangle of every cell (the index of its
+    color), or -1 for the cells of the center."""
+
+    homes: List[int] = []
+    for triangle, positions in enumerate(layout.triangles_positions().values()):
+        homes.extend([triangle] * len(positions))
+
+    homes.extend([-1] * len(layout.center_cells_positions()))
+
+    return tuple(homes)
+
+
+@functools.lru_cache(maxsize=None)
+def color_code(color: str) -> str:
+    """Return the ANSI (24 bit) sequence of the foreground color."""
+
+    red, green, blue = funcs.convert_to_rgb(color)[:3]
+    return f"{ESCAPE}38;2;{red};{green};{blue}m"
+
+
+@functools.lru_cache(maxsize=None)
+def _cell_glyphs(color: bool) -> Tuple[Tuple[str, ...], ...]:
+    """Return the text of every cell for every occupancy value (see
+    Board.get_occupancy), with or without colors."""
+
+    names = layout.color_names()
+
+    if not color:
+        values = tuple([PLAIN_EMPTY_GLYPH] +
+                       [str(value) for value in range(1, len(names) + 1)])
+        return tuple(values for _ in home_triangles())
+
+    peds = [color_code(name) + PED_GLYPH + RESET for name in names]
+
+    glyphs = []
+    for home in home_triangles():
+
+        # An empty cell of a triangle is a dim dot of the triangle's color
+        if home == -1:
+            empty = DIM + EMPTY_GLYPH + RESET
+        else:
+            empty = DIM + color_code(names[home]) + EMPTY_GLYPH + RESET
+
+        glyphs.append(tuple([empty] + peds))
+
+    return tuple(glyphs)
+
+
+def format_position(occupancy: Sequence[int], color: bool = False) -> str:
+    """Return the position of the given occupancy (see Board.get_occupancy)
+    as lines of text, the way the star looks on the board.
+    Without colors, an empty cell is a dot and a ped is the number of its
+    color (its color index plus 1), so it can be printed anywhere, like
+    in the message of a failed check."""
+
+    rows, columns = grid_size()
+    lines = [[" "] * columns for _ in range(rows)]
+    glyphs = _cell_glyphs(color)
+
+    for cell, (row, column) in enumerate(cell_grid()):
+        lines[row][column] = glyphs[cell][occupancy[cell]]
+
+    return "\n".join("".join(line).rstrip() for line in lines)
+
+
+class TerminalRenderer:
+    """Drawing positions on an ANSI terminal, in place.
+    The first position is drawn whole; after that only the cells whose
+    ped changed are redrawn, each by moving the cursor to it, so a move
+    writes a few dozen bytes. Works over SSH, and needs no display."""
+
+    def __init__(self, stream: Optional[TextIO] = None, color: bool = True) -> None:
+        self.stream = stream if stream is not None else sys.stdout
+        self.color = color
+
+        self._glyphs = _cell_glyphs(color)
+        self._grid = cell_grid()
+
+        # The occupancy on the screen, None before the first draw
+        self._shown: Optional[List[int]] = None
+        self._status = ""
+
+    def _cursor_to(self, row: int, column: int) -> str:
+        """Return the sequence moving the cursor to a place on the grid."""
+
+        return f"{ESCAPE}{row + 1};{column + 1}H"
+
+    def _status_row(self) -> int:
+        return grid_size()[ROW] + STATUS_GAP
+
+    def draw(self, occupancy: Sequence[int], cells: Optional[Sequence[int]] = None,
+             status: Optional[str] = None) -> int:
+        """Show the position of the given occupancy, and the status line
+        under it (unchanged if None). Only the given cells (all of them by
+        default) are checked for changes. Returns the number of cells
+        redrawn."""
+
+        parts = []
+
+        if self._shown is None:
+            self._shown = list(occupancy)
+            parts.append(HIDE_CURSOR + self._cursor_to(0, 0) + CLEAR_SCREEN +
+                         format_position(occupancy, self.color))
+            redrawn = len(occupancy)
+
+        else:
+            redrawn = 0
+            for cell in (cells if cells is not None else range(len(occupancy))):
+                value = occupancy[cell]
+                if self._shown[cell] == value:
+                    continue
+
+                self._shown[cell] = value
+                parts.append(self._cursor_to(*self._grid[cell]) +
+                             self._glyphs[cell][value])
+                redrawn += 1
+
+        if status is not None and status != self._status:
+            self._status = status
+            parts.append(self._cursor_to(self._status_row(), 0) + status + CLEAR_LINE)
+
+        if parts:
+            # Leave the cursor under everything, so other output isn't mixed in
+            parts.append(self._cursor_to(self._status_row() + 1, 0))
+            self.stream.write("".join(parts))
+            self.stream.flush()
+
+        return redrawn
+
+    def close(self) -> None:
+        """Give the terminal back: show the cursor again."""
+
+        if self._shown is not None:
+            self.stream.write(RESET + SHOW_CURSOR)
+            self.stream.flush()
+
+
+def watch(subscription: Subscription, renderer: TerminalRenderer,
+          delay: float = 0.0) -> SpectatorView:
+    """Follow a game on the terminal until its hub is closed, pausing
+    after every message. Returns the view of the last position."""
+
+    view = SpectatorView()
+
+    for message in subscription:
+        changed = view.apply(message)
+        renderer.draw(view.occupancy, changed,
+                      f"move {view.move}, fell behind {subscription.dropped} times")
+
+        if delay:
+            time.sleep(delay)
+
+    return view
+
+
+def watch_bots(bots: Tuple[str, ...], seed: int,
+               renderer: TerminalRenderer, delay: float) -> None:
+    """Play a game between the given bots on a headless board and watch it."""
+
+    from board import Board
+    from tournament import play_game
+
+    board = Board(len(bots), headless=True)
+    board.place_starting_peds()
+
+    hub = SpectatorHub(board.get_occupancy())
+    subscription = hub.subscribe()
+    results = []
+
+    def play() -> None:
+        try:
+            results.append(play_game(bots, seed, spectators=hub))
+
+        finally:
+            hub.close()
+
+    game = threading.Thread(target=play, daemon=True)
+    game.start()
+
+    try:
+        watch(subscription, renderer, delay)
+
+    finally:
+        renderer.close()
+
+    game.join()
+
+    if results:
+        result = results[0]
+        outcome = ("a draw" if result.winner is None else
+                   f"won by {bots[result.winner]} (seat {result.winner + 1})")
+        print(f"{result.turns} turns, {outcome}")
+
+
+def watch_archive(archive_file: str, game_id: int,
+                  renderer: TerminalRenderer, delay: float) -> None:
+    """Replay a game of an archive on the terminal."""
+
+    from archive import GameArchive, NO_WINNER
+    from board import Board
+
+    game = GameArchive(archive_file).game(game_id)
+
+    board = Board(game.players, headless=True)
+    board.place_starting_peds()
+    occupancy = board.get_occupancy()
+
+    try:
+        renderer.draw(occupancy, status=f"game {game_id}, move 0 of {len(game)}")
+
+        for move, (start, end) in enumerate(game.moves.tolist(), 1):
+            time.sleep(delay)
+
+            occupancy[end] = occupancy[start]
+            occupancy[start] = 0
+            renderer.draw(occupancy, (start, end),
+                          f"game {game_id}, move {move} of {len(game)}")
+
+    finally:
+        renderer.close()
+
+    winner = "unfinished" if game.winner == NO_WINNER else f"won by seat {game.winner + 1}"
+    print(f"{len(game)} turns, {winner}")
+
+
+def main() -> None:
+    """Watch a game on the terminal."""
+
+    parser = argparse.ArgumentParser(
+        description="Watch games on a terminal, without a display.")
+    parser.add_argument("--plain", action="store_true",
+                        help="no colors: peds are the numbers of their colors")
+    parser.add_argument("-d", "--delay", type=float, default=DEFAULT_WATCH_DELAY,
+                        help="the pause after every move, in seconds")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    bots_parser = subparsers.add_parser("bots", help="watch bots play a new game")
+    bots_parser.add_argument("bots", nargs="+",
+                             help="the bots by seat (2, 3, 4 or 6 of them)")
+    bots_parser.add_argument("--seed", type=int, default=0)
+
+    archive_parser = subparsers.add_parser("archive",
+                                           help="replay a game of an archive")
+    archive_parser.add_argument("archive")
+    archive_parser.add_argument("game", type=int, help="the id of the game")
+    args = parser.parse_args()
+
+    renderer = TerminalRenderer(color=not args.plain)
+
+    if args.command == "bots":
+        watch_bots(tuple(args.bots), args.seed, renderer, args.delay)
+    else:
+        watch_archive(args.archive, args.game, renderer, args.delay)
+
+
+if __name__ == "__main__":
+    main()
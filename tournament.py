@@ -0,0 +1,431 @@
+import argparse
+import functools
+import itertools
+import json
+import math
+import os
+import random
+import time
+from multiprocessing import Pool
+from typing import List, Tuple, Dict, Optional, Callable, NamedTuple, Any
+
+from board import Board
+from book import (BookBot, LookupTable, BOOK_MAGIC, ENDGAME_MAGIC,
+                  DEFAULT_BOOK_FILE, DEFAULT_ENDGAME_FILE)
+from layout import POSSIBLE_NUM_OF_PLAYERS, REPETITION_LIMIT
+from players import Bot, GreedyBot
+from spectator import SpectatorHub
+
+# A game that goes on for this many turns (of all the players) is a draw,
+# because weak bots can shuffle their peds forever
+DEFAULT_MAX_TURNS = 600
+
+DEFAULT_GAMES = 2  # The number of games of every seating of a pairing
+DEFAULT_BOOTSTRAP = 200  # The number of resamples for the confidence intervals
+
+# The ratings are on the Elo scale, centered at this rating
+MEAN_RATING = 1500
+ELO_SCALE = 400
+
+# Every pair of bots gets this many virtual drawn games, so a bot that
+# never lost (or never won) still gets a finite rating
+PRIOR_DRAWS = 1.0
+
+BotFactory = Callable[[str], Bot]
+
+# The registered bot strategies, by name
+BOTS: Dict[str, BotFactory] = {}
+
+
+def register_bot(name: str, factory: BotFactory) -> None:
+    """Register a bot strategy. The factory creates the bot of a color."""
+
+    if name in BOTS:
+        raise ValueError("A bot with this name is already registered", name)
+
+    BOTS[name] = factory
+
+
+@functools.lru_cache(maxsize=None)
+def _load_table(file_name: str, magic: bytes) -> Optional[LookupTable]:
+    """Load a table of the book bot once per process, if it was built."""
+
+    return LookupTable.load(file_name, magic) if os.path.exists(file_name) else None
+
+
+register_bot("random", Bot)
+register_bot("greedy", GreedyBot)
+register_bot("search1", lambda color: BookBot(color, depth=1))
+register_bot("search2", lambda color: BookBot(color, depth=2))
+register_bot("book", lambda color: BookBot(
+    color, _load_table(DEFAULT_BOOK_FILE, BOOK_MAGIC),
+    _load_table(DEFAULT_ENDGAME_FILE, ENDGAME_MAGIC), depth=1))
+
+
+class GameResult(NamedTuple):
+    """The outcome of a single game."""
+
+    bots: Tuple[str, ...]  # The bots by seat
+    winner: Optional[int]  # The seat of the winner, None for a draw
+    turns: int  # The number of turns made, without the passes
+    think_time: Tuple[float, ...]  # The time each seat spent choosing turns
+    moves: Tuple[int, ...]  # The number of turns each seat made
+
+
+def play_game(bots: Tuple[str, ...], seed: int,
+              max_turns: int = DEFAULT_MAX_TURNS,
+              spectators: Optional[SpectatorHub] = None) -> GameResult:
+    """Play a game between the given bots (by seat) on a headless board.
+    A bot without a legal turn passes. The game is a draw if nobody can
+    move, if a position repeats too often, or after the given number of
+    turns. The turns are published to the spectators, if given (their
+    hub must start from the starting position)."""
+
+    rng = random.Random(seed)
+
+    board = Board(len(bots), headless=True)
+    board.place_starting_peds()
+    colors = board.playable_colors()
+
+    players = [BOTS[name](color) for name, color in zip(bots, colors)]
+
+    think_time = [0.0] * len(bots)
+    moves = [0] * len(bots)
+    passes = 0
+
+    # The number of times every position came up, by its Zobrist hash
+    positions: Dict[int, int] = {}
+
+    for turn_number in range(max_turns):
+        seat = turn_number % len(bots)
+
+        start = time.perf_counter()
+        turn = players[seat].choose_turn(board, rng)
+        think_time[seat] += time.perf_counter() - start
+
+        if turn is None:
+            passes += 1
+            if passes == len(bots):
+                break
+            continue
+
+        passes = 0
+        moves[seat] += 1
+        board.relocate_ped(board.get_ped_by_location(turn[0]), turn[-1])
+
+        if spectators is not None:
+            spectators.publish(seat, board.get_cell(turn[0]), board.get_cell(turn[-1]))
+
+        if board.has_won(colors[seat]):
+            return GameResult(bots, seat, sum(moves),
+                              tuple(think_time), tuple(moves))
+
+        position = board.zobrist_hash((seat + 1) % len(bots))
+        positions[position] = positions.get(position, 0) + 1
+        if positions[position] >= REPETITION_LIMIT:
+            break
+
+    return GameResult(bots, None, sum(moves), tuple(think_time), tuple(moves))
+
+
+def _play_game(game: Tuple[Tuple[str, ...], int, int]) -> GameResult:
+    """Play a game in a worker process."""
+
+    return play_game(*game)
+
+
+def seatings(table: Tuple[str, ...]) -> List[Tuple[str, ...]]:
+    """Return the rotations of the bots around the table, so every bot
+    plays from every seat (the first seat moves first)."""
+
+    return [table[k:] + table[:k] for k in range(len(table))]
+
+
+def round_robin_tables(bots: List[str], num_players: int) -> List[Tuple[str, ...]]:
+    """Return every group of the given number of different bots.
+    If there are fewer bots than seats, the bots take more than one seat."""
+
+    if len(bots) < num_players:
+        return [tuple(bots[i % len(bots)] for i in range(num_players))]
+
+    return list(itertools.combinations(bots, num_players))
+
+
+def swiss_tables(bots: List[str], num_players: int, scores: Dict[str, float],
+                 met: Dict[str, set]) -> List[Tuple[str, ...]]:
+    """Return the tables of a round of a Swiss tournament: bots with close
+    scores play together, and bots that met already are kept apart when
+    possible. Bots that don't fill a table sit out the round."""
+
+    ranked = sorted(bots, key=lambda name: (-scores[name], name))
+    tables = []
+
+    while len(ranked) >= num_players:
+        table = [ranked.pop(0)]
+
+        while len(table) < num_players:
+            fresh = [name for name in ranked
+                     if not any(name in met[other] for other in table)]
+            name = fresh[0] if fresh else ranked[0]
+
+            ranked.remove(name)
+            table.append(name)
+
+        tables.append(tuple(table))
+
+    return tables
+
+
+def pairwise_scores(results: List[GameResult]) -> Dict[Tuple[str, str], float]:
+    """Return the score of every bot against every other bot, counting a
+    game of many players as a game between every pair of its players:
+    the winner beats everyone, and everybody else draws."""
+
+    scores: Dict[Tuple[str, str], float] = {}
+
+    for result in results:
+        for i, j in itertools.combinations(range(len(result.bots)), 2):
+            a, b = result.bots[i], result.bots[j]
+            if a == b:
+                continue
+
+            if result.winner == i:
+                score = 1.0
+            elif result.winner == j:
+                score = 0.0
+            else:
+                score = 0.5
+
+            scores[a, b] = scores.get((a, b), 0.0) + score
+            scores[b, a] = scores.get((b, a), 0.0) + 1.0 - score
+
+    return scores
+
+
+def fit_ratings(bots: List[str], results: List[GameResult],
+                iterations: int = 200) -> Dict[str, float]:
+    """Return the Elo ratings that fit the results best (the maximum
+    likelihood of a Bradley-Terry model, found with its MM iterations)."""
+
+    scores = pairwise_scores(results)
+
+    # Every pair of bots gets a few drawn games, so the ratings are finite
+    for a, b in itertools.permutations(bots, 2):
+        scores[a, b] = scores.get((a, b), 0.0) + PRIOR_DRAWS / 2
+
+    games = {(a, b): scores[a, b] + scores[b, a]
+             for a, b in itertools.permutations(bots, 2)}
+
+    strength = {name: 1.0 for name in bots}
+
+    for _ in range(iterations):
+        new_strength = {}
+        for a in bots:
+            won = sum(scores[a, b] for b in bots if b != a)
+            expected = sum(games[a, b] / (strength[a] + strength[b])
+                           for b in bots if b != a)
+            new_strength[a] = won / expected if expected else 1.0
+
+        # Keep the geometric mean at 1
+        mean_log = sum(math.log(value) for value in new_strength.values()) / len(bots)
+        strength = {name: value / math.exp(mean_log)
+                    for name, value in new_strength.items()}
+
+    return {name: MEAN_RATING + ELO_SCALE * math.log10(value)
+            for name, value in strength.items()}
+
+
+def rating_intervals(bots: List[str], results: List[GameResult],
+                     resamples: int, seed: int,
+                     confidence: float = 0.95) -> Dict[str, Tuple[float, float]]:
+    """Return the confidence interval of every rating, by refitting the
+    ratings to resamples of the games (bootstrap)."""
+
+    rng = random.Random(seed)
+    samples: Dict[str, List[float]] = {name: [] for name in bots}
+
+    for _ in range(resamples):
+        resampled = [rng.choice(results) for _ in results]
+        for name, rating in fit_ratings(bots, resampled, iterations=50).items():
+            samples[name].append(rating)
+
+    tail = (1 - confidence) / 2
+    intervals = {}
+    for name, ratings in samples.items():
+        ratings.sort()
+        low = ratings[int(tail * (len(ratings) - 1))]
+        high = ratings[int(math.ceil((1 - tail) * (len(ratings) - 1)))]
+        intervals[name] = (low, high)
+
+    return intervals
+
+
+class Tournament:
+    """A tournament between registered bots, played in a pool of processes."""
+
+    def __init__(self, bots: List[str], num_players: int = 2,
+                 games: int = DEFAULT_GAMES, max_turns: int = DEFAULT_MAX_TURNS,
+                 seed: int = 0, processes: Optional[int] = None) -> None:
+
+        for name in bots:
+            if name not in BOTS:
+                raise ValueError("No such bot", name)
+
+        if num_players not in POSSIBLE_NUM_OF_PLAYERS:
+            raise ValueError("Invalid number of players", num_players)
+
+        self.bots = bots
+        self.num_players = num_players
+        self.games = games
+        self.max_turns = max_turns
+        self.seed = seed
+        self.processes = processes
+
+        self.results: List[GameResult] = []
+
+    def _play_tables(self, pool: Pool, tables: List[Tuple[str, ...]]) -> None:
+        """Play every seating of every table, the given number of times."""
+
+        games = [(seating, self.seed * 1_000_003 + len(self.results) + i,
+                  self.max_turns)
+                 for i, seating in enumerate(seating
+                                             for table in tables
+                                             for seating in seatings(table)
+                                             for _ in range(self.games))]
+
+        # In order, so the results are the same however the games are spread
+        self.results.extend(pool.imap(_play_game, games))
+
+    def run_round_robin(self) -> None:
+        with Pool(self.processes) as pool:
+            self._play_tables(pool, round_robin_tables(self.bots, self.num_players))
+
+    def run_swiss(self, rounds: int) -> None:
+        met: Dict[str, set] = {name: set() for name in self.bots}
+
+        with Pool(self.processes) as pool:
+            for _ in range(rounds):
+                tables = swiss_tables(self.bots, self.num_players,
+                                      self.points(), met)
+                for table in tables:
+                    for name in table:
+                        met[name].update(table)
+
+                self._play_tables(pool, tables)
+
+    def points(self) -> Dict[str, float]:
+        """Return the average points per game of every bot: 1 for a win,
+        and for a draw, 1 divided by the number of players."""
+
+        points = {name: 0.0 for name in self.bots}
+        played = {name: 0 for name in self.bots}
+
+        for result in self.results:
+            for seat, name in enumerate(result.bots):
+                played[name] += 1
+                if result.winner == seat:
+                    points[name] += 1.0
+                elif result.winner is None:
+                    points[name] += 1.0 / len(result.bots)
+
+        return {name: points[name] / played[name] if played[name] else 0.0
+                for name in self.bots}
+
+    def standings(self, resamples: int = DEFAULT_BOOTSTRAP) -> List[Dict[str, Any]]:
+        """Return the rating, its confidence interval, the record and the
+        thinking time per move of every bot, best first."""
+
+        ratings = fit_ratings(self.bots, self.results)
+        intervals = rating_intervals(self.bots, self.results, resamples, self.seed)
+        points = self.points()
+
+        rows = []
+        for name in self.bots:
+            games = wins = draws = moves = 0
+            think_time = 0.0
+
+            for result in self.results:
+                for seat, seat_name in enumerate(result.bots):
+                    if seat_name != name:
+                        continue
+
+                    games += 1
+                    wins += result.winner == seat
+                    draws += result.winner is None
+                    moves += result.moves[seat]
+                    think_time += result.think_time[seat]
+
+            rows.append({"bot": name,
+                         "rating": ratings[name],
+                         "low": intervals[name][0],
+                         "high": intervals[name][1],
+                         "games": games,
+                         "wins": wins,
+                         "draws": draws,
+                         "points": points[name],
+                         "ms_per_move": 1000 * think_time / moves if moves else 0.0})
+
+        rows.sort(key=lambda row: -row["rating"])
+        return rows
+
+
+def print_standings(rows: List[Dict[str, Any]]) -> None:
+    print(f"{'bot':<12}{'rating':>8}{'95% interval':>18}{'games':>7}"
+          f"{'wins':>6}{'draws':>7}{'ms/move':>10}")
+
+    for row in rows:
+        interval = f"{row['low']:.0f} - {row['high']:.0f}"
+        print(f"{row['bot']:<12}{row['rating']:>8.0f}{interval:>18}"
+              f"{row['games']:>7}{row['wins']:>6}{row['draws']:>7}"
+              f"{row['ms_per_move']:>10.2f}")
+
+
+def main() -> None:
+    """Run a tournament between bots from the command line."""
+
+    parser = argparse.ArgumentParser(
+        description="Rate Chinese Checkers bots by playing them against "
+                    "each other.")
+    parser.add_argument("-b", "--bots", nargs="+", default=list(BOTS),
+                        choices=list(BOTS))
+    parser.add_argument("-p", "--players", type=int, default=2,
+                        choices=POSSIBLE_NUM_OF_PLAYERS)
+    parser.add_argument("--swiss", type=int, default=None, metavar="ROUNDS",
+                        help="play a Swiss tournament of the given number of "
+                             "rounds, instead of a round robin")
+    parser.add_argument("-g", "--games", type=int, default=DEFAULT_GAMES,
+                        help="the number of games of every seating")
+    parser.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None,
+                        help="the number of worker processes "
+                             "(the number of CPUs by default)")
+    parser.add_argument("--bootstrap", type=int, default=DEFAULT_BOOTSTRAP,
+                        help="the number of resamples for the intervals")
+    parser.add_argument("--json", default=None,
+                        help="a file to save the standings and the games to")
+    args = parser.parse_args()
+
+    tournament = Tournament(args.bots, args.players, args.games, args.max_turns,
+                            args.seed, args.processes)
+
+    start = time.perf_counter()
+    if args.swiss is not None:
+        tournament.run_swiss(args.swiss)
+    else:
+        tournament.run_round_robin()
+    elapsed = time.perf_counter() - start
+
+    rows = tournament.standings(args.bootstrap)
+    print_standings(rows)
+    print(f"{len(tournament.results)} games in {elapsed:.1f}s")
+
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump({"standings": rows,
+                       "games": [result._asdict() for result in tournament.results]},
+                      f, indent=2)
+
+
+if __name__ == "__main__":
+    main()